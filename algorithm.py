@@ -1,10 +1,23 @@
 import math
-import json
+import heapq
 import random
 from typing import Dict, List, Literal, Tuple, Optional, Any
 
+from attribute_index import AttributeIndex
+from engines import make_engine
+from knowledge_base import KnowledgeBase, get_knowledge_base
+from likelihood import ANSWER_VALUES, LikelihoodModel
+from lookahead import BudgetExceeded, LookaheadSearch
+from metrics import GAIN_ATTRIBUTES, GAIN_CANDIDATES, span
+from opening_book import OpeningBook
+from state_codec import decode_log, decode_state, encode_log, encode_state
+from stopping import StoppingPolicy
+
 class Akinator:
-    def __init__(self, dataset_path: str, questions_path: str, dataset_type: Literal["json", "sql"] = "json"):
+    def __init__(self, dataset_path: Optional[str] = None, questions_path: Optional[str] = None, dataset_type: Literal["json", "sql"] = "json",
+                 storage: Literal["dict", "bitset"] = "dict", knowledge_base: Optional[KnowledgeBase] = None, engine: str = "python", seed: Optional[int] = None,
+                 opening_book: Optional[OpeningBook] = None, lookahead_depth: int = 0,
+                 likelihood: Optional[LikelihoodModel] = None, stopping: Optional[StoppingPolicy] = None):
         self.CERTAINTY_THRESHOLD = 0.90
         self.MIN_QUESTIONS = 5
         self.MAX_QUESTIONS = 20
@@ -13,56 +26,54 @@ class Akinator:
         self.STRONG_MATCH_MULTIPLIER = 1.35
         self.SOFT_MATCH_MULTIPLIER = 1.1
         self.SOFT_MISMATCH_MULTIPLIER = 0.5
+        # Candidates at or below this probability leave the active set (0.0 only drops the ones already zeroed)
+        self.PRUNE_THRESHOLD = 0.0
+        # Share of the mass handed back to pruned candidates when a guess is disputed (0.0 disables re-admission)
+        self.READMIT_MASS = 0.0
+        # Candidates scored by the cheap fallback selection used when the worker pool is saturated
+        self.HEURISTIC_CANDIDATES = 16
+        # Skip attributes that cannot split the candidates, and stop scoring once no attribute's support can beat the best gain
+        self.PREFILTER_ATTRIBUTES = True
+        # Questions searched ahead to minimize the expected questions to certainty (0 keeps greedy selection)
+        self.LOOKAHEAD_DEPTH = lookahead_depth
+        self.LOOKAHEAD_BEAM = 3 # Attributes expanded per searched state
+        self.LOOKAHEAD_CANDIDATES = 32 # Most likely candidates the search tracks
+        self.LOOKAHEAD_BUDGET = 0.05 # Seconds per turn before falling back to greedy selection
+        self.LOOKAHEAD_PROBABLY_RATE = 0.1 # Assumed share of "probably" answers
+        
+        # The knowledge base is shared and read-only; a game only owns the mutable state from get_state()
+        if knowledge_base is None:
+            if dataset_path is None or questions_path is None:
+                raise ValueError("Either a knowledge base or dataset and questions paths are required.")
+            knowledge_base = get_knowledge_base(dataset_path, questions_path, dataset_type, storage)
+        
+        self.kb = knowledge_base
+        self.people = self.kb.people
+        self.attrs = self.kb.attrs
+        self.people_attrs_map = self.kb.people_attrs_map
+        self.questions = self.kb.questions
+        # None selects the reference Python loops below; other engines score and update in bulk
+        self.engine = make_engine(engine, self.kb)
+        # Learned P(answer | value) replacing the fixed multipliers; games using it always take the Python path
+        self.likelihood = likelihood
+        # Per-game scratch space owned by the engine (never persisted, rebuilt on demand)
+        self._engine_state = None
+        # With a seed, question sampling is reproducible from the answer log alone
+        self.seed = seed
+        # Precomputed early questions; only consulted for seeded games
+        self.opening_book = opening_book
+        # Cost-based guess timing replacing MIN_QUESTIONS and CERTAINTY_THRESHOLD when set
+        self.stopping = stopping
+        # When set, questions are scored over the top HEURISTIC_CANDIDATES only instead of every candidate
+        self.heuristic = False
         
-        self.dataset = self._load_data(dataset_path, dataset_type)
-        if not self.dataset:
-            raise ValueError("Dataset is empty or not loaded correctly.")
-        
-        self.people = [person["name"] for person in self.dataset]
-        self.attrs = self._get_attrs()
-        self.people_attrs_map = {person["name"]: person["attributes"] for person in self.dataset}
-        self.questions = self._get_questions(questions_path)
-        
-        print(f"Building an Akinator game with {len(self.people)} people having {len(self.attrs)} traits...\n")
         self._reset()
 
-    def _load_data(self, dataset_path: str, dataset_type: Literal["json", "sql"]):
-        if dataset_type.lower() == "json":
-            try:
-                with open(dataset_path, 'r') as f:
-                    data = json.load(f)
-                return data
-            except Exception as e:
-                print(f"Error loading dataset: {e}")
-                return []
-        
-        elif dataset_type == "sql":
-            print("SQL loading not implemented.")
-            return []
-        
-        else:
-            raise ValueError("Unsupported dataset type. Use 'json' or 'sql'.")
-
-    def _get_questions(self, questions_path: str) -> Dict[str, str]:
-        try:
-            with open(questions_path, 'r') as f:
-                questions = json.load(f)
-            return questions
-        
-        except Exception as e:
-            print(f"Error loading questions: {e}")
-            return {}
-
-    def _get_attrs(self) -> List[str]:
-        attrs = set()
-        
-        for person in self.dataset:
-            attrs.update(person["attributes"].keys())
-        
-        return list(attrs)
-
     def _reset(self):
         self.probabilities = {person: 1 / len(self.people) for person in self.people}
+        self.active = list(self.people)
+        # Ordered ("answer", attr, value) and ("mistake", name) events; enough to rebuild everything else
+        self.events = []
         self.asked_attrs = set()
         self.n_questions_asked = 0
         self.RANDOMNESS = 0.5
@@ -85,21 +96,37 @@ class Akinator:
         if not n:
             n = self.TOP_N_CANDIDATES
         
-        sorted_probs = sorted(self.probabilities.items(), key=lambda x: x[1], reverse=True)
-        return sorted_probs[:n]
+        # Only survivors can make the top n, unless fewer than n are left
+        if len(self.active) >= n:
+            return heapq.nlargest(n, ((name, self.probabilities[name]) for name in self.active), key=lambda x: x[1])
+        return heapq.nlargest(n, self.probabilities.items(), key=lambda x: x[1])
 
     def _calc_info_gain_subset(self, subset_candidates: List[str], unasked_attrs: List[str]) -> Optional[str]:
+        GAIN_CANDIDATES.observe(len(subset_candidates))
+        splits = None
+        if self.PREFILTER_ATTRIBUTES:
+            # Attributes that cannot split the candidates have no gain, so they could never be picked
+            splits = self._splitting_attrs(subset_candidates, unasked_attrs)
+            unasked_attrs = [attr for attr, _, _ in splits]
+            if not unasked_attrs:
+                GAIN_ATTRIBUTES.observe(0)
+                return None
+        
+        if self.engine is not None and self.likelihood is None:
+            GAIN_ATTRIBUTES.observe(len(unasked_attrs))
+            return self.engine.calc_info_gain_subset(self, subset_candidates, unasked_attrs)
+        
         if not subset_candidates or len(subset_candidates) < 1:
             return None
         
-        subset_probs = {name: self.probabilities[name] for name in subset_candidates if name in self.probabilities and self.probabilities[name] > 1e-9}
-        subset_sum = sum(subset_probs.values())
+        subset_probs, subset_sum, subset_entropy = self._get_subset_stats(subset_candidates)
         if subset_sum < 1e-9:
             return None
         
-        norm_probs = [p / subset_sum for p in subset_probs.values()]
-        subset_entropy = self._calc_entropy(norm_probs)
+        if splits is not None and self.likelihood is None:
+            return self._calc_info_gain_bounded(subset_candidates, splits, subset_probs, subset_sum, subset_entropy)
         
+        GAIN_ATTRIBUTES.observe(len(unasked_attrs))
         best_attr = None
         max_gain = -1.0
         
@@ -107,30 +134,10 @@ class Akinator:
             if attr in self.asked_attrs:    # Double check if attr is already asked
                 continue
             
-            people_with_yes_prob = []
-            people_with_no_prob = []
-            sum_yes = 0.0
-            sum_no = 0.0
-            
-            for person in subset_candidates:
-                value = self.people_attrs_map[person].get(attr, 0)
-                prob = subset_probs.get(person, 0)
-                
-                if value == 1:
-                    people_with_yes_prob.append(prob)
-                    sum_yes += prob
-                elif value == 0:
-                    people_with_no_prob.append(prob)
-                    sum_no += prob
-            
-            weight_yes = sum_yes / subset_sum if subset_sum > 1e-9 else 0
-            weight_no = sum_no / subset_sum if subset_sum > 1e-9 else 0
-            
-            entropy_yes = self._calc_entropy(people_with_yes_prob)
-            entropy_no = self._calc_entropy(people_with_no_prob)
-            
-            conditional_entropy = weight_yes * entropy_yes + weight_no * entropy_no
-            info_gain = subset_entropy - conditional_entropy
+            if self.likelihood is not None:
+                info_gain = self._calc_attr_expected_gain(attr, subset_candidates, subset_probs, subset_sum, subset_entropy)
+            else:
+                info_gain = self._calc_attr_info_gain(attr, subset_candidates, subset_probs, subset_sum, subset_entropy)
             
             if info_gain > max_gain:
                 max_gain = info_gain
@@ -141,27 +148,162 @@ class Akinator:
         
         return None
 
+    def _splitting_attrs(self, subset_candidates: List[str], unasked_attrs: List[str]) -> List[Tuple[str, int, bool]]:
+        """AttributeIndex.splits of the unasked attributes over the candidates that still carry probability."""
+        live = [name for name in subset_candidates if self.probabilities.get(name, 0) > 1e-9]
+        attrs = [attr for attr in unasked_attrs if attr not in self.asked_attrs]
+        return self.kb.derived("attribute_index", AttributeIndex).splits(live, attrs)
+
+    def _calc_info_gain_bounded(self, subset_candidates: List[str], splits: List[Tuple[str, int, bool]], subset_probs: Dict[str, float],
+                                subset_sum: float, subset_entropy: float) -> Optional[str]:
+        """The serial loop's pick, scoring attributes by decreasing support bound until no bound can reach the best gain.
+
+        The bounds assume normalized probabilities: _calc_entropy leaves a lone candidate's p unnormalized, and
+        only with p <= 1 does that term lower (never raise) the serial loop's gain below the bound.
+        """
+        n = len(subset_probs)
+        max_share = max(subset_probs.values()) / subset_sum
+        bounds = [math.inf if fractional else AttributeIndex.support_bound(k, n, max_share) for _, k, fractional in splits]
+        
+        gains: Dict[str, float] = {}
+        best_gain = -1.0
+        for i in sorted(range(len(splits)), key=lambda i: -bounds[i]):
+            # The margin covers float error, so attributes tying the best gain are still scored
+            if bounds[i] + 1e-9 < best_gain:
+                break
+            attr = splits[i][0]
+            gains[attr] = self._calc_attr_info_gain(attr, subset_candidates, subset_probs, subset_sum, subset_entropy)
+            best_gain = max(best_gain, gains[attr])
+        GAIN_ATTRIBUTES.observe(len(gains))
+        
+        # Like the serial loop, the first attribute in order with the highest gain wins
+        best_attr = None
+        max_gain = -1.0
+        for attr, _, _ in splits:
+            if attr in gains and gains[attr] > max_gain:
+                max_gain = gains[attr]
+                best_attr = attr
+        return best_attr if max_gain > 1e-9 else None
+
+    def _get_subset_stats(self, subset_candidates: List[str]) -> Tuple[Dict[str, float], float, float]:
+        subset_probs = {name: self.probabilities[name] for name in subset_candidates if name in self.probabilities and self.probabilities[name] > 1e-9}
+        subset_sum = sum(subset_probs.values())
+        if subset_sum < 1e-9:
+            return subset_probs, subset_sum, 0.0
+        
+        norm_probs = [p / subset_sum for p in subset_probs.values()]
+        return subset_probs, subset_sum, self._calc_entropy(norm_probs)
+
+    def _calc_attr_info_gain(self, attr: str, subset_candidates: List[str], subset_probs: Dict[str, float], subset_sum: float, subset_entropy: float) -> float:
+        people_with_yes_prob = []
+        people_with_no_prob = []
+        sum_yes = 0.0
+        sum_no = 0.0
+        
+        for person in subset_candidates:
+            value = self.people_attrs_map[person].get(attr, 0)
+            prob = subset_probs.get(person, 0)
+            
+            if value == 1:
+                people_with_yes_prob.append(prob)
+                sum_yes += prob
+            elif value == 0:
+                people_with_no_prob.append(prob)
+                sum_no += prob
+        
+        weight_yes = sum_yes / subset_sum if subset_sum > 1e-9 else 0
+        weight_no = sum_no / subset_sum if subset_sum > 1e-9 else 0
+        
+        entropy_yes = self._calc_entropy(people_with_yes_prob)
+        entropy_no = self._calc_entropy(people_with_no_prob)
+        
+        conditional_entropy = weight_yes * entropy_yes + weight_no * entropy_no
+        return subset_entropy - conditional_entropy
+
+    def _calc_attr_expected_gain(self, attr: str, subset_candidates: List[str], subset_probs: Dict[str, float], subset_sum: float, subset_entropy: float) -> float:
+        """Expected information gain over all four answers, weighted by the likelihood model."""
+        no_row, yes_row = self.likelihood.table(attr)
+        weighted = []
+        for person in subset_candidates:
+            value = min(max(self.people_attrs_map[person].get(attr, 0), 0.0), 1.0)
+            weighted.append((subset_probs.get(person, 0) / subset_sum, value))
+        
+        expected_entropy = 0.0
+        for i in range(len(ANSWER_VALUES)):
+            joint = [prob * ((1 - value) * no_row[i] + value * yes_row[i]) for prob, value in weighted]
+            answer_prob = sum(joint)
+            if answer_prob > 1e-12:
+                expected_entropy += answer_prob * self._calc_entropy(joint)
+        
+        return subset_entropy - expected_entropy
+
     def _calc_info_gain_focused(self, top_n_names: List[str], unasked_attrs: List[str]) -> Optional[str]:
         return self._calc_info_gain_subset(top_n_names, unasked_attrs)
 
     def _calc_info_gain_general(self, unasked_attrs: List[str]) -> Optional[str]:
-        active_names = [name for name, prob in self.probabilities.items() if prob > 1e-9]
+        active_names = self._get_active_names()
         return self._calc_info_gain_subset(active_names, unasked_attrs)
 
+    def _calc_lookahead(self, unasked_attrs: List[str]) -> Optional[str]:
+        search = LookaheadSearch(self, self.LOOKAHEAD_DEPTH, self.LOOKAHEAD_BEAM, self.LOOKAHEAD_BUDGET,
+                                 self.LOOKAHEAD_CANDIDATES, self.LOOKAHEAD_PROBABLY_RATE)
+        try:
+            return search.best_question(unasked_attrs)
+        except BudgetExceeded:
+            return None
+
     def _get_current_guess(self) -> Tuple[Optional[str], float]:
         if not self.probabilities:
             return None, 0.0
         
-        sorted_probs = sorted(self.probabilities.items(), key=lambda x: x[1], reverse=True)
-        if not sorted_probs:
-            return None, 0.0
-        
-        best_guess, best_prob = sorted_probs[0]
+        # max() keeps the first of equal probabilities, like a stable descending sort
+        candidates = self.active if self.active else self.probabilities
+        best_guess = max(candidates, key=self.probabilities.__getitem__)
         
-        return best_guess, best_prob
+        return best_guess, self.probabilities[best_guess]
+
+    def _get_active_names(self) -> List[str]:
+        return [name for name in self.active if self.probabilities[name] > 1e-9]
+
+    def _prune_candidates(self):
+        """Drops candidates at or below PRUNE_THRESHOLD from the active set so later turns skip them."""
+        active = []
+        for name in self.active:
+            if self.probabilities[name] > self.PRUNE_THRESHOLD:
+                active.append(name)
+            else:
+                self.probabilities[name] = 0.0
+        self.active = active
+
+    def _readmit_pruned(self):
+        """Hands READMIT_MASS back to pruned candidates, in case an earlier answer wrongly ruled them out."""
+        active = set(self.active)
+        pruned = [name for name in self.probabilities if name not in active]
+        if not pruned or self.READMIT_MASS <= 0:
+            return
+        
+        share = self.READMIT_MASS / len(pruned)
+        for name in self.active:
+            self.probabilities[name] *= 1 - self.READMIT_MASS
+        for name in pruned:
+            self.probabilities[name] = share
+        self.active = list(self.probabilities)
 
     def _update_probs(self, attr: str, answer: float) -> bool:
-        for person in list(self.probabilities.keys()):
+        if self.likelihood is not None:
+            updated = self._update_likelihood_probs(attr, answer)
+        elif self.engine is not None:
+            updated = self.engine.update_probs(self, attr, answer)
+        else:
+            updated = self._update_active_probs(attr, answer)
+        
+        if updated:
+            self._prune_candidates()
+        return updated
+
+    def _update_active_probs(self, attr: str, answer: float) -> bool:
+        # Pruned candidates hold 0.0, which no multiplier or normalization can change
+        for person in self.active:
             value = self.people_attrs_map[person].get(attr, 0)
             
             # Valid for when answer is [0, 1] because attribute is also going to be [0, 1]
@@ -179,11 +321,22 @@ class Akinator:
             elif abs(value - answer) > 0.5:
                 self.probabilities[person] *= self.SOFT_MISMATCH_MULTIPLIER
         
-        current_sum = sum(self.probabilities.values())
+        return self._normalize_active_probs()
+
+    def _update_likelihood_probs(self, attr: str, answer: float) -> bool:
+        # Bayes' rule: each candidate is weighted by how likely this answer is given its attribute value
+        for person in self.active:
+            value = self.people_attrs_map[person].get(attr, 0)
+            self.probabilities[person] *= self.likelihood.likelihood(attr, value, answer)
+        
+        return self._normalize_active_probs()
+
+    def _normalize_active_probs(self) -> bool:
+        current_sum = sum(self.probabilities[name] for name in self.active)
         if current_sum < 1e-9:  return False
         
         # Normalize probabilities
-        for name in self.probabilities:
+        for name in self.active:
             if self.probabilities.get(name, 0) > 1e-9:
                 self.probabilities[name] /= current_sum
             else:
@@ -191,42 +344,76 @@ class Akinator:
         
         return True
 
-    def select_next_question(self) -> Optional[str]:
+    def _update_randomness(self):
         if self.RETRY:
             self.RANDOMNESS = 0.0
         elif self.n_questions_asked > self.MIN_QUESTIONS and not self.RETRY:
             self.RANDOMNESS = 0.1
+
+    def _get_rng(self):
+        if self.seed is None:
+            return random
+        seed = self.seed
+        if self.opening_book is not None and len(self.events) < self.opening_book.depth:
+            # Openings are played from the book's fixed set of variants so they can be looked up
+            seed = self.opening_book.variant(seed)
+        # Seeded per turn so replaying the log never has to re-run earlier question selections
+        return random.Random(f"{seed}:{len(self.events)}")
+
+    def select_next_question(self) -> Optional[str]:
+        with span("select_question"):
+            next_attr, unasked_attrs = self._prepare_question()
+            
+            # If no attribute is found from focused information gain, use general information gain
+            if not next_attr and unasked_attrs:
+                next_attr = self._calc_info_gain_general(unasked_attrs) or unasked_attrs[0]
+        
+        return next_attr
+
+    def _prepare_question(self) -> Tuple[Optional[str], Optional[List[str]]]:
+        """Runs question selection up to general information gain.
+        
+        Returns (attribute, None) when the question is already settled, or (None, unasked_attrs)
+        when the sampled attributes still have to be scored over all active candidates.
+        """
+        self._update_randomness()
+        
+        if self.opening_book is not None and self.seed is not None:
+            book_attr = self.opening_book.lookup(self.events, self.seed)
+            if book_attr is not None and book_attr not in self.asked_attrs:
+                return book_attr, None
         
         unasked_attrs = [attr for attr in self.attrs if attr not in self.asked_attrs]
         if not unasked_attrs:
-            return None
+            return None, None
         
         if self.RANDOMNESS > 0 and len(unasked_attrs) > 1:
             sample_size = max(1, int((1 - self.RANDOMNESS) * len(unasked_attrs)))
             sample_size = min(sample_size, len(unasked_attrs))
             if sample_size < len(unasked_attrs):
-                unasked_attrs = random.sample(unasked_attrs, sample_size)
+                unasked_attrs = self._get_rng().sample(unasked_attrs, sample_size)
         
-        active_names = [name for name, prob in self.probabilities.items() if prob > 1e-9]
-        if not active_names:
-            return None
+        if not self._get_active_names():
+            return None, None
         
         next_attr = None
-        if self.n_questions_asked >= self.MIN_QUESTIONS:
+        if self.LOOKAHEAD_DEPTH > 0 and not self.heuristic:
+            next_attr = self._calc_lookahead(unasked_attrs)
+        
+        if not next_attr and self.n_questions_asked >= self.MIN_QUESTIONS:
             top_n_names = [name for name, prob in self._get_top_candidates() if prob > 1e-9]
 
             if len(top_n_names) > 1:
                 # Use focused information gain
                 next_attr = self._calc_info_gain_focused(top_n_names, unasked_attrs)
 
-        # If no attribute is found from focused information gain, use general information gain
-        if not next_attr:
-            next_attr = self._calc_info_gain_general(unasked_attrs)
-        
-        if not next_attr and unasked_attrs:
-            next_attr = unasked_attrs[0]
+        if not next_attr and self.heuristic:
+            top_k_names = [name for name, prob in self._get_top_candidates(self.HEURISTIC_CANDIDATES) if prob > 1e-9]
+            next_attr = self._calc_info_gain_subset(top_k_names, unasked_attrs) or unasked_attrs[0]
         
-        return next_attr
+        if next_attr:
+            return next_attr, None
+        return None, unasked_attrs
 
     def get_question_text(self, attribute_key: str) -> str:
         q_text = self.questions.get(attribute_key, f"Is the person {attribute_key.replace('_', ' ')}?")
@@ -263,23 +450,78 @@ class Akinator:
         if attribute_key in self.asked_attrs:
             return {"status": "error", "message": "Attribute already asked."}
         
-        self.asked_attrs.add(attribute_key)
-        self.n_questions_asked += 1
-        self.RETRY = False
+        with span("update_probs"):
+            updated = self._apply_answer(attribute_key, answer_numeric)
+        response = self._answer_outcome(updated)
+        if response is not None:
+            return response
+        
+        return self._question_response(self.select_next_question())
+
+    @staticmethod
+    def process_answers(games: List["Akinator"], answers: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """process_answer for many games at once, each appearing at most once.
+        
+        Games sharing an engine get their probability updates and general information gain computed
+        as one stacked operation; the responses are the ones process_answer would have returned.
+        """
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(games)
+        by_engine: Dict[Any, List[int]] = {}
+        for i, (game, (attribute_key, answer_numeric)) in enumerate(zip(games, answers)):
+            if attribute_key in game.asked_attrs:
+                responses[i] = {"status": "error", "message": "Attribute already asked."}
+            elif game.engine is None or game.likelihood is not None:
+                responses[i] = game.process_answer(attribute_key, answer_numeric)
+            else:
+                game._record_answer(attribute_key, answer_numeric)
+                by_engine.setdefault(game.engine, []).append(i)
+        
+        for engine, indexes in by_engine.items():
+            with span("update_probs"):
+                updated = engine.update_probs_sessions([games[i] for i in indexes], [answers[i] for i in indexes])
+                for i, game_updated in zip(indexes, updated):
+                    if game_updated:
+                        games[i]._prune_candidates()
+            
+            scoring, unasked_lists, scored_lists = [], [], []
+            with span("select_question"):
+                for i, game_updated in zip(indexes, updated):
+                    game = games[i]
+                    responses[i] = game._answer_outcome(game_updated)
+                    if responses[i] is not None:
+                        continue
+                    
+                    next_attr, unasked_attrs = game._prepare_question()
+                    if not next_attr and unasked_attrs:
+                        scoring.append(i)
+                        unasked_lists.append(unasked_attrs)
+                        active_names = game._get_active_names()
+                        if game.PREFILTER_ATTRIBUTES:
+                            unasked_attrs = [attr for attr, _, _ in game._splitting_attrs(active_names, unasked_attrs)]
+                        scored_lists.append(unasked_attrs)
+                        GAIN_CANDIDATES.observe(len(active_names))
+                        GAIN_ATTRIBUTES.observe(len(unasked_attrs))
+                    else:
+                        responses[i] = game._question_response(next_attr)
+                
+                next_attrs = engine.calc_info_gain_sessions([games[i] for i in scoring], scored_lists)
+            for i, next_attr, unasked_attrs in zip(scoring, next_attrs, unasked_lists):
+                responses[i] = games[i]._question_response(next_attr or unasked_attrs[0])
         
-        if not self._update_probs(attribute_key, answer_numeric):
+        return responses
+
+    def _answer_outcome(self, updated: bool) -> Optional[Dict[str, Any]]:
+        """The response of an answered turn that ends in a guess or a failure, or None to keep asking."""
+        if not updated:
             return {"status": "failure", "message": "You beat me! I couldn't guess.", "guess": None, "certainty": 0.0}
         
         current_guess_name, current_certainty = self._get_current_guess()
-        remaining_candidates_count = sum(1 for p in self.probabilities.values() if p > 1e-9)
-        
-        if self.n_questions_asked >= self.MIN_QUESTIONS:
-            if current_certainty >= self.CERTAINTY_THRESHOLD or (remaining_candidates_count == 1 and current_certainty > 0.1):
-                return {
-                    "status": "make_guess",
-                    "guess": current_guess_name,
-                    "certainty": current_certainty,
-                }
+        if self._should_guess():
+            return {
+                "status": "make_guess",
+                "guess": current_guess_name,
+                "certainty": current_certainty,
+            }
         
         if self.n_questions_asked >= len(self.attrs) or self.n_questions_asked >= self.MAX_QUESTIONS:
             return {
@@ -289,8 +531,22 @@ class Akinator:
                 "certainty": current_certainty,
             }
         
-        next_attribute = self.select_next_question()
-        
+        return None
+
+    def _should_guess(self) -> bool:
+        """Whether the game should guess its leading candidate now instead of asking another question."""
+        if self.stopping is not None:
+            top = self._get_top_candidates(2)
+            entropy = self._calc_entropy([self.probabilities[name] for name in self.active])
+            return self.stopping.should_guess(top, entropy, self.n_questions_asked)
+        
+        if self.n_questions_asked < self.MIN_QUESTIONS:
+            return False
+        _, current_certainty = self._get_current_guess()
+        remaining_candidates_count = len(self._get_active_names())
+        return current_certainty >= self.CERTAINTY_THRESHOLD or (remaining_candidates_count == 1 and current_certainty > 0.1)
+
+    def _question_response(self, next_attribute: Optional[str]) -> Dict[str, Any]:
         if next_attribute:
             return {
                 "status": "playing",
@@ -299,6 +555,7 @@ class Akinator:
                 "questions_asked": self.n_questions_asked,
             }
         else:
+            current_guess_name, current_certainty = self._get_current_guess()
             return {
                 "status": "failure",
                 "message": "You beat me! I couldn't guess.",
@@ -307,39 +564,41 @@ class Akinator:
             }
 
     def process_mistaken_guess(self, wrong_guess_name: str) -> Dict[str, Any]:
+        if not self._apply_mistaken_guess(wrong_guess_name):
+            return {"status": "failure", "message": "You beat me! I couldn't guess.", "guess": None, "certainty": 0.0}
+        
+        return self._question_response(self.select_next_question())
+
+    def _apply_answer(self, attribute_key: str, answer_numeric: float) -> bool:
+        self._record_answer(attribute_key, answer_numeric)
+        return self._update_probs(attribute_key, answer_numeric)
+
+    def _record_answer(self, attribute_key: str, answer_numeric: float):
+        self.events.append(("answer", attribute_key, answer_numeric))
+        self.asked_attrs.add(attribute_key)
+        self.n_questions_asked += 1
+        self.RETRY = False
+
+    def _apply_mistaken_guess(self, wrong_guess_name: str) -> bool:
+        self.events.append(("mistake", wrong_guess_name))
         if wrong_guess_name in self.probabilities:
             self.probabilities[wrong_guess_name] *= 0.01
-            current_sum = sum(p for p in self.probabilities.values() if p > 1e-9)
+            self._readmit_pruned()
+            current_sum = sum(self.probabilities[name] for name in self.active if self.probabilities[name] > 1e-9)
         
             if current_sum > 1e-9:
-                for name in self.probabilities:
+                for name in self.active:
                     if self.probabilities[name] > 1e-9:
                         self.probabilities[name] /= current_sum
                     else:
                         self.probabilities[name] = 0.0
+                self._prune_candidates()
         
             else:
-                return {"status": "failure", "message": "You beat me! I couldn't guess.", "guess": None, "certainty": 0.0}
+                return False
         
         self.RETRY = True
-        next_attribute = self.select_next_question()
-        
-        if next_attribute:
-            return {
-                "status": "playing",
-                "question_text": self.get_question_text(next_attribute),
-                "attribute_key": next_attribute,
-                "questions_asked": self.n_questions_asked,
-            }
-        
-        else:
-            current_guess_name, current_certainty = self._get_current_guess()
-            return {
-                "status": "failure",
-                "message": "You beat me! I couldn't guess.",
-                "guess": current_guess_name,
-                "certainty": current_certainty,
-            }
+        return True
 
     # --- State Management for Database Persistence ---
     def get_state(self) -> Dict[str, Any]:
@@ -350,16 +609,85 @@ class Akinator:
             "n_questions_asked": self.n_questions_asked,
             "RANDOMNESS": self.RANDOMNESS,
             "RETRY": self.RETRY,
+            "events": self.events,
+            "seed": self.seed,
         }
 
     def _load_state(self, state: Dict[str, Any]):
         """Restores the dynamic game state from a dictionary."""
         self.probabilities = state.get("probabilities", {})
+        self.active = list(self.probabilities)
+        self._prune_candidates()
         self.asked_attrs = set(state.get("asked_attrs", [])) # Convert list back to set
         self.n_questions_asked = state.get("n_questions_asked", 0)
         self.RANDOMNESS = state.get("RANDOMNESS", 0.5) # Default if not in state
         self.RETRY = state.get("RETRY", False) # Default if not in state
-        print(f"Game state loaded. Questions asked: {self.n_questions_asked}, Retry: {self.RETRY}")
+        self.events = [tuple(event) for event in state.get("events", [])]
+        self.seed = state.get("seed", self.seed)
+
+    def encode_state(self, compress: bool = True, precision: Literal["float32", "float64"] = "float32") -> bytes:
+        """Serializes the dynamic game state to the compact binary format of state_codec."""
+        return encode_state(self.get_state(), self.kb, compress=compress, precision=precision)
+
+    def decode_state(self, blob: bytes):
+        """Restores the dynamic game state from a blob produced by encode_state()."""
+        self._load_state(decode_state(blob, self.kb))
+
+    def replay(self, events: List[Tuple], seed: Optional[int] = None):
+        """Rebuilds the game state by re-applying a logged sequence of answers and mistaken guesses.
+
+        Runs of consecutive answers go through the engine in one batch, and question selection is
+        not re-run: only the randomness schedule it would have left behind is reproduced.
+        """
+        self._reset()
+        self.seed = seed
+        
+        i = 0
+        while i < len(events):
+            if events[i][0] == "mistake":
+                self._apply_mistaken_guess(events[i][1])
+                self._update_randomness()
+                i += 1
+                continue
+            
+            run = []
+            while i < len(events) and events[i][0] == "answer":
+                run.append((events[i][1], events[i][2]))
+                i += 1
+            self._apply_answers(run)
+
+    def _apply_answers(self, answers: List[Tuple[str, float]]):
+        if self.engine is None or self.likelihood is not None:
+            for attr, answer in answers:
+                self._apply_answer(attr, answer)
+                self._update_randomness()
+            return
+        
+        for attr, answer in answers:
+            self.events.append(("answer", attr, answer))
+            self.asked_attrs.add(attr)
+        self.engine.update_probs_batch(self, answers)
+        self._prune_candidates()
+        self.n_questions_asked += len(answers)
+        self.RETRY = False
+        if answers:
+            self._update_randomness()
+
+    def log_complete(self) -> bool:
+        """Whether events hold every answer of the game; states restored from legacy formats carry no or partial logs."""
+        return sum(1 for event in self.events if event[0] == "answer") == self.n_questions_asked
+
+    def encode_log(self) -> bytes:
+        """Serializes the game as its answer log and seed, the smallest state that replay() can rebuild."""
+        if not self.log_complete():
+            # A short log would replay to a different game
+            raise ValueError(f"Answer log is incomplete: {self.n_questions_asked} questions asked but not all answers were logged.")
+        return encode_log(self.events, self.seed, self.kb)
+
+    def decode_log(self, blob: bytes):
+        """Restores the game state by replaying a blob produced by encode_log()."""
+        events, seed = decode_log(blob, self.kb)
+        self.replay(events, seed)
 
     # Function for standalone testing in CLI
     def play(self):
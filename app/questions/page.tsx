@@ -59,7 +59,8 @@ function QuestionsContent() {
                 body: JSON.stringify({
                     session_id: sessionId,
                     attribute_key: currentAttributeKey,
-                    answer: answerString // Send the string answer, e.g., "Yes", "No"
+                    answer: answerString, // Send the string answer, e.g., "Yes", "No"
+                    question_number: questionsAskedCount // Lets the backend answer retries of this question from its last response
                 }),
             });
 
@@ -0,0 +1,77 @@
+import math
+from typing import Dict, List, Sequence, Tuple
+
+from bitsets import bits_to_rows, rows_to_bits
+from knowledge_base import KnowledgeBase
+
+# Up to this many candidates, splits are counted from the candidates' own attribute lists; beyond it,
+# from the attribute columns
+PER_PERSON_MAX_CANDIDATES = 512
+
+
+def binary_entropy(w: float) -> float:
+    if w <= 0.0 or w >= 1.0:
+        return 0.0
+    return -w * math.log2(w) - (1 - w) * math.log2(1 - w)
+
+
+class AttributeIndex:
+    """Inverted index between attributes and the people holding them, for skipping questions that cannot split.
+
+    An attribute splits a set of candidates only if some but not all of them have it as 1, or if any
+    of them holds a fractional value for it (those count on neither side of the split). Every other
+    attribute has zero information gain, so splits() drops it without scoring. For a 0/1 attribute the
+    gain is the binary entropy of the probability mass answering yes, so support_bound() caps the gain
+    of an attribute held by k of n candidates without touching its rows.
+    """
+
+    def __init__(self, kb: KnowledgeBase):
+        bitsets = kb.attribute_bitsets()
+        self.n_people = len(kb.people)
+        self.attr_index = kb.attr_index
+        self.person_index = kb.person_index
+        self.yes = bitsets.yes
+        self.fractional_bits = bitsets.fractional_bits
+        # Per person: the attribute columns they hold as 1, and the ones they hold a fractional value for
+        self.person_yes: List[List[int]] = [[] for _ in kb.people]
+        self.person_fractional: List[List[int]] = [[] for _ in kb.people]
+        for col in range(len(kb.attrs)):
+            for row in bits_to_rows(self.yes[col], self.n_people):
+                self.person_yes[row].append(col)
+            if self.fractional_bits[col]:
+                for row in bits_to_rows(self.fractional_bits[col], self.n_people):
+                    self.person_fractional[row].append(col)
+
+    def splits(self, candidates: Sequence[str], attrs: Sequence[str]) -> List[Tuple[str, int, bool]]:
+        """(attribute, candidates holding it as 1, any fractional value) for the attrs, in order, that split the candidates."""
+        rows = [self.person_index[name] for name in candidates]
+        n = len(rows)
+        if n <= PER_PERSON_MAX_CANDIDATES:
+            yes_counts: Dict[int, int] = {}
+            fractional = set()
+            for row in rows:
+                for col in self.person_yes[row]:
+                    yes_counts[col] = yes_counts.get(col, 0) + 1
+                fractional.update(self.person_fractional[row])
+            result = []
+            for attr in attrs:
+                col = self.attr_index[attr]
+                k = yes_counts.get(col, 0)
+                if col in fractional or 0 < k < n:
+                    result.append((attr, k, col in fractional))
+            return result
+
+        live = rows_to_bits(rows, self.n_people)
+        result = []
+        for attr in attrs:
+            col = self.attr_index[attr]
+            k = (self.yes[col] & live).bit_count()
+            has_fractional = bool(self.fractional_bits[col] & live)
+            if has_fractional or 0 < k < n:
+                result.append((attr, k, has_fractional))
+        return result
+
+    @staticmethod
+    def support_bound(k: int, n: int, max_share: float) -> float:
+        """Upper bound of the gain of a 0/1 attribute held by k of n candidates, none holding more than max_share of the mass."""
+        return binary_entropy(min(0.5, min(k, n - k) * max_share))
@@ -0,0 +1,122 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+_NONZERO_BYTE = re.compile(b"[^\x00]")
+
+
+def rows_to_bits(rows: Iterable[int], n_rows: int) -> int:
+    """Packs row indices into an int bitset in O(n_rows) instead of O(n_rows^2) shifts."""
+    buf = bytearray((n_rows + 7) // 8)
+    for row in rows:
+        buf[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buf, "little")
+
+
+def bits_to_rows(bits: int, n_rows: int) -> List[int]:
+    """Unpacks an int bitset into sorted row indices."""
+    rows = []
+    # Zero bytes are skipped at C speed, so sparse columns cost little more than their set bits
+    for match in _NONZERO_BYTE.finditer(bits.to_bytes((n_rows + 7) // 8, "little")):
+        byte, base = match.group()[0], match.start() << 3
+        for bit in range(8):
+            if byte >> bit & 1:
+                rows.append(base + bit)
+    return rows
+
+
+def set_row(row: int, person_attrs: Mapping[str, float], attr_index: Mapping[str, int], yes_bufs: List[bytearray],
+            known_bufs: List[bytearray], fractional: List[Optional[Dict[int, float]]]):
+    """Writes one person's values into the column byte buffers of AttributeBitsets.from_buffers."""
+    byte, bit = row >> 3, 1 << (row & 7)
+    for attr, value in person_attrs.items():
+        col = attr_index[attr]
+        known_bufs[col][byte] |= bit
+        if value == 1:
+            yes_bufs[col][byte] |= bit
+        elif value != 0:
+            if fractional[col] is None:
+                fractional[col] = {}
+            fractional[col][row] = value
+
+
+class AttributeBitsets:
+    """Column store of attributes: one bitset over people per attribute.
+
+    `yes[col]` holds people whose value is 1 and `known[col]` people that have any value at all
+    (the null/unknown mask). The rare fractional values live in a sparse {row: value} map per column.
+    """
+    __slots__ = ("n_people", "attrs", "attr_index", "yes", "known", "fractional", "fractional_bits")
+
+    def __init__(self, n_people: int, attrs: Sequence[str], attr_index: Mapping[str, int]):
+        self.n_people = n_people
+        self.attrs = attrs
+        self.attr_index = attr_index
+        self.yes: List[int] = [0] * len(attrs)
+        self.known: List[int] = [0] * len(attrs)
+        self.fractional: List[Optional[Dict[int, float]]] = [None] * len(attrs)
+        self.fractional_bits: List[int] = [0] * len(attrs)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping[str, float]], n_people: int, attrs: Sequence[str], attr_index: Mapping[str, int]) -> "AttributeBitsets":
+        n_bytes = (n_people + 7) // 8
+        yes_bufs = [bytearray(n_bytes) for _ in attrs]
+        known_bufs = [bytearray(n_bytes) for _ in attrs]
+        fractional: List[Optional[Dict[int, float]]] = [None] * len(attrs)
+
+        for row, person_attrs in enumerate(rows):
+            set_row(row, person_attrs, attr_index, yes_bufs, known_bufs, fractional)
+        return cls.from_buffers(n_people, attrs, attr_index, yes_bufs, known_bufs, fractional)
+
+    @classmethod
+    def from_buffers(cls, n_people: int, attrs: Sequence[str], attr_index: Mapping[str, int], yes_bufs: List[bytearray],
+                     known_bufs: List[bytearray], fractional: List[Optional[Dict[int, float]]]) -> "AttributeBitsets":
+        """Packs per-column little-endian byte buffers (as filled by set_row); the buffers are released as they go."""
+        bitsets = cls(n_people, attrs, attr_index)
+        for col in range(len(attrs)):
+            bitsets.yes[col] = int.from_bytes(yes_bufs[col], "little")
+            bitsets.known[col] = int.from_bytes(known_bufs[col], "little")
+            yes_bufs[col] = known_bufs[col] = None
+            if fractional[col]:
+                bitsets.fractional[col] = fractional[col]
+                bitsets.fractional_bits[col] = rows_to_bits(fractional[col], n_people)
+        return bitsets
+
+    def value(self, row: int, col: int) -> Optional[float]:
+        """Returns the stored value, or None when the person has no value for the attribute."""
+        bit = 1 << row
+        if not self.known[col] & bit:
+            return None
+        if self.yes[col] & bit:
+            return 1
+        fractional = self.fractional[col]
+        if fractional is not None and row in fractional:
+            return fractional[row]
+        return 0
+
+    def row(self, row: int) -> "BitsetRow":
+        return BitsetRow(self, row)
+
+
+class BitsetRow(Mapping):
+    """Read-only {attribute: value} view of one person, so dict-based code keeps working on bitset storage."""
+    __slots__ = ("_bitsets", "_row")
+
+    def __init__(self, bitsets: AttributeBitsets, row: int):
+        self._bitsets = bitsets
+        self._row = row
+
+    def __getitem__(self, attr: str) -> float:
+        col = self._bitsets.attr_index.get(attr)
+        value = None if col is None else self._bitsets.value(self._row, col)
+        if value is None:
+            raise KeyError(attr)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        bit = 1 << self._row
+        for col, known in enumerate(self._bitsets.known):
+            if known & bit:
+                yield self._bitsets.attrs[col]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
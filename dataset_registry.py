@@ -0,0 +1,116 @@
+import threading
+import dataclasses
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Literal, Mapping, NamedTuple, Optional, Tuple
+
+from knowledge_base import KnowledgeBase, evict_knowledge_base, get_knowledge_base
+
+
+class DatasetSpec(NamedTuple):
+    """Where one dataset of a multi-dataset deployment lives; the fields mirror the single-dataset settings."""
+    dataset_path: str
+    questions_path: str
+    dataset_type: str = "json"
+    artifact_path: Optional[str] = None
+    opening_book_path: Optional[str] = None
+    likelihood_path: Optional[str] = None
+
+
+class UnknownDataset(KeyError):
+    """No dataset is configured under this id."""
+
+
+class DatasetRegistry:
+    """Knowledge bases of several datasets served side by side, loaded on first use.
+
+    At most `max_loaded` datasets stay in memory; the least recently used one is evicted (with the
+    shared cache entry behind it) when another has to be loaded. Each loaded base is stamped with its
+    dataset id, so encoded game states name the dataset they were played on.
+
+    When a dataset's files change, the previous base is retired rather than dropped: up to
+    `retain_versions` retired versions per dataset stay findable by version, so games started before
+    the reload keep playing on the data they started with. Retired versions live in this process only
+    and are dropped with their dataset when it is evicted.
+    """
+
+    def __init__(self, specs: Mapping[str, DatasetSpec], storage: Literal["dict", "bitset"] = "dict", max_loaded: int = 4,
+                 retain_versions: int = 2):
+        if not specs:
+            raise ValueError("At least one dataset must be configured.")
+        self.specs = dict(specs)
+        self.storage = storage
+        self.max_loaded = max(1, max_loaded)
+        self.retain_versions = retain_versions
+        self.metrics: Dict[str, int] = {"loads": 0, "reloads": 0, "evictions": 0}
+        # dataset id -> (base from the shared cache, the same base stamped with the id), most recently used last
+        self._loaded: "OrderedDict[str, Tuple[KnowledgeBase, KnowledgeBase]]" = OrderedDict()
+        self._retired: Dict[str, Deque[KnowledgeBase]] = {}
+        self._lock = threading.RLock()
+
+    def spec(self, dataset_id: str) -> DatasetSpec:
+        try:
+            return self.specs[dataset_id]
+        except KeyError:
+            raise UnknownDataset(dataset_id) from None
+
+    def get(self, dataset_id: str) -> KnowledgeBase:
+        """The current knowledge base of a dataset, loading (or reloading after a file change) as needed."""
+        spec = self.spec(dataset_id)
+        base = get_knowledge_base(spec.dataset_path, spec.questions_path, spec.dataset_type, self.storage, spec.artifact_path)
+        with self._lock:
+            entry = self._loaded.get(dataset_id)
+            if entry is not None and entry[0] is base:
+                self._loaded.move_to_end(dataset_id)
+                return entry[1]
+
+            kb = dataclasses.replace(base, dataset_id=dataset_id)
+            if entry is None:
+                self.metrics["loads"] += 1
+            else:
+                self.metrics["reloads"] += 1
+                self._retire(dataset_id, entry[1])
+            self._loaded[dataset_id] = (base, kb)
+            self._loaded.move_to_end(dataset_id)
+            while len(self._loaded) > self.max_loaded:
+                self._evict(next(iter(self._loaded)))
+            return kb
+
+    def find(self, dataset_id: str, version: str) -> Optional[KnowledgeBase]:
+        """The knowledge base of `dataset_id` at `version`, current or retired; None if it is no longer held."""
+        kb = self.get(dataset_id)
+        if kb.version == version:
+            return kb
+        with self._lock:
+            for retired in self._retired.get(dataset_id, ()):
+                if retired.version == version:
+                    return retired
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.metrics,
+                "configured": len(self.specs),
+                "loaded": len(self._loaded),
+                "retired_versions": sum(len(versions) for versions in self._retired.values()),
+                "datasets": {dataset_id: kb.version for dataset_id, (_, kb) in self._loaded.items()},
+            }
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    def _retire(self, dataset_id: str, kb: KnowledgeBase):
+        if self.retain_versions <= 0:
+            return
+        versions = self._retired.setdefault(dataset_id, deque(maxlen=self.retain_versions))
+        if all(retired.version != kb.version for retired in versions):
+            versions.append(kb)
+
+    def _evict(self, dataset_id: str):
+        self._loaded.pop(dataset_id, None)
+        self._retired.pop(dataset_id, None)
+        spec = self.specs[dataset_id]
+        evict_knowledge_base(spec.dataset_path, spec.questions_path, spec.dataset_type, self.storage, spec.artifact_path)
+        self.metrics["evictions"] += 1
+        print(f"ℹ️ Evicted dataset '{dataset_id}' to stay within {self.max_loaded} loaded datasets.")
@@ -0,0 +1,190 @@
+import os
+import re
+import sys
+import json
+import mmap
+import codecs
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from bitsets import AttributeBitsets, rows_to_bits
+
+# Bytes read from the dataset file at a time; the parse window holds about one chunk plus one record
+CHUNK_SIZE = 1 << 20
+# Characters between two progress lines
+PROGRESS_EVERY = 100000
+
+ARTIFACT_MAGIC = b"WDKBART1"
+ARTIFACT_FORMAT_VERSION = 1
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class _Window:
+    """Sliding text window over a UTF-8 file; consumed text is dropped whenever more is read."""
+
+    def __init__(self, f, digest, chunk_size: int):
+        self.f = f
+        self.digest = digest
+        self.chunk_size = chunk_size
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        raw = self.f.read(self.chunk_size)
+        if self.digest is not None:
+            self.digest.update(raw)
+        self.bytes_read += len(raw)
+        self.eof = not raw
+        self.buf = self.buf[self.pos:] + self.text.decode(raw, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or "" at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def record(self) -> Dict[str, Any]:
+        if self.peek() != "{":
+            raise ValueError(f"Expected a character object at byte ~{self.bytes_read}")
+        while True:
+            try:
+                value, self.pos = self.json.raw_decode(self.buf, self.pos)
+                return value
+            except json.JSONDecodeError:
+                # The object runs past the window
+                if not self.fill():
+                    raise
+
+
+def iter_records(path: str, digest=None, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yields the character records of a JSON array or NDJSON file one at a time.
+
+    Only the current window of the file is held in memory, never the whole document. `digest` sees
+    every byte of the file, so it hashes exactly like reading the file in one go.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        window = _Window(f, digest, chunk_size)
+        count = 0
+        first = window.peek()
+        if first == "[":
+            window.pos += 1
+            if window.peek() == "]":
+                window.pos += 1
+            else:
+                while True:
+                    yield window.record()
+                    count += 1
+                    if count % PROGRESS_EVERY == 0:
+                        print(f"Parsed {count} characters ({window.bytes_read * 100 // max(size, 1)}% of {path})...")
+                    separator = window.peek()
+                    window.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError(f"Expected ',' or ']' between characters at byte ~{window.bytes_read}")
+        elif first == "{":
+            # NDJSON: one character object per line
+            while window.peek():
+                yield window.record()
+                count += 1
+                if count % PROGRESS_EVERY == 0:
+                    print(f"Parsed {count} characters ({window.bytes_read * 100 // max(size, 1)}% of {path})...")
+        elif first:
+            raise ValueError("Dataset must be a JSON array or NDJSON of character objects.")
+
+        if window.peek():
+            raise ValueError(f"Unexpected data after the characters at byte ~{window.bytes_read}")
+
+
+def save_artifact(path: str, people: Sequence[str], bitsets: AttributeBitsets, version: str, source: Any):
+    """Writes a preprocessed bitset knowledge base that load_artifact() reads back without parsing the dataset.
+
+    Layout: magic, 8-byte header length, JSON header (people, attributes, fractional values, the
+    dataset version and the `source` signature it was built from), then the yes and known column
+    bitsets as little-endian byte strings, 8-byte aligned.
+    """
+    n_bytes = (len(people) + 7) // 8
+    header = json.dumps({
+        "format": ARTIFACT_FORMAT_VERSION,
+        "version": version,
+        "source": source,
+        "people": list(people),
+        "attrs": list(bitsets.attrs),
+        "fractional": [[col, sorted(values.items())] for col, values in enumerate(bitsets.fractional) if values],
+    }).encode()
+    padding = -(len(ARTIFACT_MAGIC) + 8 + len(header)) % 8
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(ARTIFACT_MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        f.write(bytes(padding))
+        for column in bitsets.yes + bitsets.known:
+            f.write(column.to_bytes(n_bytes, "little"))
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path: str, source: Any) -> Optional[Tuple[List[str], AttributeBitsets, str]]:
+    """Returns (people, bitsets, version) from an artifact built from `source`, or None if it is missing or stale.
+
+    The file is memory-mapped only while reading; the columns are copied into Python ints.
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                if view[:len(ARTIFACT_MAGIC)] != ARTIFACT_MAGIC:
+                    return None
+                offset = len(ARTIFACT_MAGIC) + 8
+                header_len = int.from_bytes(view[len(ARTIFACT_MAGIC):offset], "little")
+                header = json.loads(bytes(view[offset:offset + header_len]))
+                if header["format"] != ARTIFACT_FORMAT_VERSION or header["source"] != json.loads(json.dumps(source)):
+                    return None
+                offset += header_len
+                offset += -offset % 8
+
+                people, attrs = header["people"], tuple(sys.intern(attr) for attr in header["attrs"])
+                bitsets = AttributeBitsets(len(people), attrs, {attr: i for i, attr in enumerate(attrs)})
+                n_bytes = (len(people) + 7) // 8
+                for columns in (bitsets.yes, bitsets.known):
+                    for col in range(len(attrs)):
+                        columns[col] = int.from_bytes(view[offset:offset + n_bytes], "little")
+                        offset += n_bytes
+                for col, values in header["fractional"]:
+                    bitsets.fractional[col] = {row: value for row, value in values}
+                    bitsets.fractional_bits[col] = rows_to_bits(bitsets.fractional[col], len(people))
+                return people, bitsets, header["version"]
+            finally:
+                view.release()
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable dataset artifact {path}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from knowledge_base import get_knowledge_base
+
+    parser = argparse.ArgumentParser(description="Preprocess a dataset into a knowledge base artifact.")
+    parser.add_argument("--dataset", default="data/characters_data.json")
+    parser.add_argument("--questions", default="data/questions.json")
+    parser.add_argument("--artifact", default="data/characters_data.kb")
+    args = parser.parse_args()
+
+    kb = get_knowledge_base(args.dataset, args.questions, storage="bitset", artifact_path=args.artifact)
+    print(f"Artifact {args.artifact} holds knowledge base {kb.version}.")
@@ -0,0 +1,728 @@
+import os
+import math
+import weakref
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+# numpy is only needed for the vectorized engines, so it is imported when the first one is built
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("The 'numpy' engine requires numpy to be installed.") from None
+        np = numpy
+
+from bitsets import bits_to_rows, rows_to_bits
+from knowledge_base import KnowledgeBase
+
+if TYPE_CHECKING:
+    from algorithm import Akinator
+
+# Gains closer than this are treated as ties and re-scored with the serial loop
+GAIN_TIE_TOLERANCE = 1e-12
+# Upper bound on the number of matrix cells materialized at once while scoring
+CHUNK_CELLS = 1 << 22
+
+
+def _entropy(probs: "np.ndarray") -> float:
+    """Vector version of Akinator._calc_entropy."""
+    total = probs.sum()
+    if probs.size == 0 or total < 1e-9:
+        return 0.0
+    if abs(total - 1.0) > 1e-9 and probs.size > 1:
+        probs = probs / total
+    probs = probs[probs > 1e-9]
+    return float(-(probs * np.log2(probs)).sum())
+
+
+def _column_entropy(probs: "np.ndarray", mask: "np.ndarray") -> "np.ndarray":
+    """Akinator._calc_entropy applied to every column of mask, where each column selects a group of probs."""
+    weighted = np.where(mask, probs[:, None], 0.0)
+    counts = mask.sum(axis=0)
+    sums = weighted.sum(axis=0)
+
+    normalize = (np.abs(sums - 1.0) > 1e-9) & (counts > 1)
+    scale = np.where(normalize & (sums > 0), sums, 1.0)
+    scaled = weighted / scale
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(scaled > 1e-9, scaled * np.log2(scaled), 0.0)
+
+    entropy = -terms.sum(axis=0)
+    entropy[(counts == 0) | (sums < 1e-9)] = 0.0
+    return entropy
+
+
+def _rescore(game: "Akinator", subset_candidates: List[str], attrs: List[str]) -> Optional[str]:
+    """Picks among near-tied attributes with the reference Python scoring, in the serial loop's order."""
+    subset_probs, subset_sum, subset_entropy = game._get_subset_stats(subset_candidates)
+    best_attr = None
+    max_gain = -1.0
+    for attr in attrs:
+        info_gain = game._calc_attr_info_gain(attr, subset_candidates, subset_probs, subset_sum, subset_entropy)
+        if info_gain > max_gain:
+            max_gain = info_gain
+            best_attr = attr
+    return best_attr if max_gain > 1e-9 else None
+
+
+def _pick_best(game: "Akinator", subset_candidates: List[str], attrs: List[str], gains: List[float]) -> Optional[str]:
+    max_gain = max(gains, default=-1.0)
+    if max_gain <= 1e-9 - GAIN_TIE_TOLERANCE:
+        return None
+
+    tied = [attr for attr, gain in zip(attrs, gains) if gain >= max_gain - GAIN_TIE_TOLERANCE]
+    if len(tied) == 1 and max_gain > 1e-9 + GAIN_TIE_TOLERANCE:
+        return tied[0]
+    return _rescore(game, subset_candidates, tied)
+
+
+class Engine:
+    """Base for the alternative engines. Subclasses implement calc_info_gain_subset and update_probs."""
+    name = ""
+
+    def calc_info_gain_subset(self, game: "Akinator", subset_candidates: List[str], unasked_attrs: List[str]) -> Optional[str]:
+        raise NotImplementedError
+
+    def update_probs(self, game: "Akinator", attr: str, answer: float) -> bool:
+        raise NotImplementedError
+
+    def update_probs_batch(self, game: "Akinator", answers: List[Tuple[str, float]]) -> bool:
+        """Applies a run of answers as consecutive turns would, including pruning between them."""
+        updated = True
+        for attr, answer in answers:
+            updated = game._update_probs(attr, answer)
+        return updated
+
+    def update_probs_sessions(self, games: List["Akinator"], answers: List[Tuple[str, float]]) -> List[bool]:
+        """update_probs for one answer in each of many games (pruning is left to the games)."""
+        return [self.update_probs(game, attr, answer) for game, (attr, answer) in zip(games, answers)]
+
+    def calc_info_gain_sessions(self, games: List["Akinator"], unasked_lists: List[List[str]]) -> List[Optional[str]]:
+        """General information gain (over each game's active candidates) for many games."""
+        return [self.calc_info_gain_subset(game, game._get_active_names(), unasked_attrs)
+                for game, unasked_attrs in zip(games, unasked_lists)]
+
+
+def _multipliers(game: "Akinator", values: "np.ndarray", answers) -> "np.ndarray":
+    """The multiplier Akinator._update_probs applies for each attribute value, broadcast against answers."""
+    return _select_multipliers(values, answers, game.STRONG_MATCH_MULTIPLIER, game.STRONG_MISMATCH_MULTIPLIER,
+                               game.SOFT_MATCH_MULTIPLIER, game.SOFT_MISMATCH_MULTIPLIER)
+
+
+def _select_multipliers(values: "np.ndarray", answers, strong_match, strong_mismatch, soft_match, soft_mismatch) -> "np.ndarray":
+    diff = np.abs(values - answers)
+    return np.select(
+        [values == answers, diff == 1, diff < 0.5, diff > 0.5],
+        [strong_match, strong_mismatch, soft_match, soft_mismatch],
+        default=1.0,
+    )
+
+
+def _matrix_gains(matrix: "np.ndarray", rows: "np.ndarray", probs: "np.ndarray", subset_sum: float, subset_entropy: float,
+                  columns: "np.ndarray") -> "np.ndarray":
+    """Information gain of each column for the candidates in rows, scored CHUNK_CELLS cells at a time."""
+    values = matrix[rows]
+    gains = np.empty(len(columns), dtype=np.float64)
+    step = max(1, CHUNK_CELLS // max(1, len(rows)))
+
+    for start in range(0, len(columns), step):
+        block = values[:, columns[start:start + step]]
+        yes_mask = block == 1
+        no_mask = block == 0
+
+        weight_yes = np.where(yes_mask, probs[:, None], 0.0).sum(axis=0) / subset_sum
+        weight_no = np.where(no_mask, probs[:, None], 0.0).sum(axis=0) / subset_sum
+        conditional_entropy = weight_yes * _column_entropy(probs, yes_mask) + weight_no * _column_entropy(probs, no_mask)
+        gains[start:start + step] = subset_entropy - conditional_entropy
+    return gains
+
+
+class NumpyEngine(Engine):
+    """Scores and updates candidates with a dense people x attributes matrix instead of per-person dict lookups."""
+    name = "numpy"
+    # Closed-form gains of stacked sessions closer than this to the best are re-scored per game
+    STACKED_TIE_TOLERANCE = 1e-9
+
+    def __init__(self, kb: KnowledgeBase):
+        _import_numpy()
+
+        self.kb = kb
+        self.matrix = np.zeros((len(kb.people), len(kb.attrs)), dtype=np.float64)
+        for row, person in enumerate(kb.people):
+            for attr, value in kb.people_attrs_map[person].items():
+                self.matrix[row, kb.attr_index[attr]] = value
+
+    def _rows(self, names: List[str]) -> "np.ndarray":
+        if len(names) == len(self.kb.people) and tuple(names) == self.kb.people:
+            return np.arange(len(names))
+        person_index = self.kb.person_index
+        return np.fromiter((person_index[name] for name in names), dtype=np.intp, count=len(names))
+
+    def _columns(self, attrs: List[str]) -> "np.ndarray":
+        attr_index = self.kb.attr_index
+        return np.fromiter((attr_index[attr] for attr in attrs), dtype=np.intp, count=len(attrs))
+
+    def _split_masks(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """0/1 float matrices of the "yes" (value 1) and "no" (value 0) cells, built on first use."""
+        masks = getattr(self, "_masks", None)
+        if masks is None:
+            masks = self._masks = ((self.matrix == 1).astype(np.float64), (self.matrix == 0).astype(np.float64))
+        return masks
+
+    def _stack_probs(self, games: List["Akinator"]) -> "np.ndarray":
+        people = self.kb.people
+        probs = np.zeros((len(games), len(people)), dtype=np.float64)
+        for j, game in enumerate(games):
+            if tuple(game.probabilities) == people:
+                probs[j] = np.fromiter(game.probabilities.values(), dtype=np.float64, count=len(people))
+            else:
+                probs[j] = np.fromiter((game.probabilities.get(name, 0.0) for name in people), dtype=np.float64, count=len(people))
+        return probs
+
+    def calc_info_gain_subset(self, game: "Akinator", subset_candidates: List[str], unasked_attrs: List[str]) -> Optional[str]:
+        if not subset_candidates:
+            return None
+
+        probabilities = game.probabilities
+        probs = np.fromiter((probabilities.get(name, 0.0) for name in subset_candidates), dtype=np.float64, count=len(subset_candidates))
+        probs[probs <= 1e-9] = 0.0
+        subset_sum = sum(probs.tolist())
+        if subset_sum < 1e-9:
+            return None
+
+        subset_entropy = _entropy(probs[probs > 0] / subset_sum)
+
+        attrs = [attr for attr in unasked_attrs if attr not in game.asked_attrs]
+        if not attrs:
+            return None
+
+        gains = self._gains(self._rows(subset_candidates), probs, subset_sum, subset_entropy, self._columns(attrs))
+        max_gain = gains.max()
+        if max_gain <= 1e-9 - GAIN_TIE_TOLERANCE:
+            return None
+
+        # Batched float math differs from the serial loop in the last few bits, so near-ties are
+        # re-scored with the reference Python code to pick exactly the attribute it would pick
+        tied = np.flatnonzero(gains >= max_gain - GAIN_TIE_TOLERANCE)
+        if len(tied) == 1 and max_gain > 1e-9 + GAIN_TIE_TOLERANCE:
+            return attrs[int(tied[0])]
+        return _rescore(game, subset_candidates, [attrs[i] for i in tied])
+
+    def _gains(self, rows: "np.ndarray", probs: "np.ndarray", subset_sum: float, subset_entropy: float,
+               columns: "np.ndarray") -> "np.ndarray":
+        return _matrix_gains(self.matrix, rows, probs, subset_sum, subset_entropy, columns)
+
+    def update_probs(self, game: "Akinator", attr: str, answer: float) -> bool:
+        names = list(game.probabilities.keys())
+        probs = np.fromiter(game.probabilities.values(), dtype=np.float64, count=len(names))
+        column = self.kb.attr_index.get(attr)
+        values = self.matrix[self._rows(names), column] if column is not None else np.zeros(len(names))
+        probs *= _multipliers(game, values, answer)
+
+        # Builtin sum keeps the rounding of the serial update, so both engines stay bit-identical
+        current_sum = sum(probs.tolist())
+        if current_sum < 1e-9:
+            game.probabilities = dict(zip(names, probs.tolist()))
+            return False
+
+        probs = np.where(probs > 1e-9, probs / current_sum, 0.0)
+        game.probabilities = dict(zip(names, probs.tolist()))
+        return True
+
+    def update_probs_sessions(self, games: List["Akinator"], answers: List[Tuple[str, float]]) -> List[bool]:
+        """Multiplies every game's probabilities in one games x people operation."""
+        people = self.kb.people
+        # Games restored with extra or reordered names keep the per-game path
+        stacked = [j for j, game in enumerate(games) if tuple(game.probabilities) == people]
+        results = [True] * len(games)
+        for j in sorted(set(range(len(games))) - set(stacked)):
+            results[j] = self.update_probs(games[j], *answers[j])
+        if not stacked:
+            return results
+
+        stacked_games = [games[j] for j in stacked]
+        probs = self._stack_probs(stacked_games)
+        values = np.zeros_like(probs)
+        for k, j in enumerate(stacked):
+            column = self.kb.attr_index.get(answers[j][0])
+            if column is not None:
+                values[k] = self.matrix[:, column]
+
+        constants = np.array([[game.STRONG_MATCH_MULTIPLIER, game.STRONG_MISMATCH_MULTIPLIER, game.SOFT_MATCH_MULTIPLIER,
+                               game.SOFT_MISMATCH_MULTIPLIER] for game in stacked_games])
+        given = np.array([answers[j][1] for j in stacked], dtype=np.float64)[:, None]
+        probs *= _select_multipliers(values, given, *(constants[:, [c]] for c in range(4)))
+
+        for k, j in enumerate(stacked):
+            row = probs[k]
+            current_sum = sum(row.tolist())
+            results[j] = current_sum >= 1e-9
+            if results[j]:
+                row = np.where(row > 1e-9, row / current_sum, 0.0)
+            games[j].probabilities = dict(zip(people, row.tolist()))
+        return results
+
+    def calc_info_gain_sessions(self, games: List["Akinator"], unasked_lists: List[List[str]]) -> List[Optional[str]]:
+        """Scores every game's sampled attributes with six games x people x attributes products.
+
+        Uses the closed form of the split entropies (sum of p, sum of p*log2(p) and counts per side),
+        then re-scores each game's near-ties exactly so the choices match calc_info_gain_subset.
+        """
+        results: List[Optional[str]] = [None] * len(games)
+        if not games:
+            return results
+
+        probs = self._stack_probs(games)
+        probs[probs <= 1e-9] = 0.0
+        members = (probs > 0).astype(np.float64)
+        plogp = _plogp(probs)
+        yes, no = self._split_masks()
+
+        totals = probs.sum(axis=1)
+        subset_entropy = _stats_entropy(totals, plogp.sum(axis=1), np.maximum(members.sum(axis=1), 2))
+        sum_yes, sum_no = probs @ yes, probs @ no
+        with np.errstate(divide="ignore", invalid="ignore"):
+            conditional_entropy = (sum_yes * _stats_entropy(sum_yes, plogp @ yes, members @ yes)
+                                   + sum_no * _stats_entropy(sum_no, plogp @ no, members @ no)) / np.where(totals > 0, totals, 1.0)[:, None]
+        gains = subset_entropy[:, None] - conditional_entropy
+
+        for j, (game, unasked_attrs) in enumerate(zip(games, unasked_lists)):
+            attrs = [attr for attr in unasked_attrs if attr not in game.asked_attrs]
+            if not attrs or totals[j] < 1e-9:
+                continue
+            attr_gains = gains[j, self._columns(attrs)]
+            max_gain = attr_gains.max()
+            if max_gain <= 1e-9 - self.STACKED_TIE_TOLERANCE:
+                continue
+            tied = [attrs[i] for i in np.flatnonzero(attr_gains >= max_gain - self.STACKED_TIE_TOLERANCE)]
+            results[j] = NumpyEngine.calc_info_gain_subset(self, game, game._get_active_names(), tied)
+        return results
+
+    def update_probs_batch(self, game: "Akinator", answers: List[Tuple[str, float]]) -> bool:
+        """Looks up every answered column and its multipliers in one stacked operation, then runs the turns."""
+        if not answers:
+            return True
+
+        names = list(game.probabilities.keys())
+        probs = np.fromiter(game.probabilities.values(), dtype=np.float64, count=len(names))
+        rows = self._rows(names)
+
+        values = np.zeros((len(names), len(answers)))
+        for j, (attr, _) in enumerate(answers):
+            column = self.kb.attr_index.get(attr)
+            if column is not None:
+                values[:, j] = self.matrix[rows, column]
+        multipliers = _multipliers(game, values, np.array([answer for _, answer in answers], dtype=np.float64))
+
+        updated = True
+        for j in range(len(answers)):
+            probs *= multipliers[:, j]
+            current_sum = sum(probs.tolist())
+            updated = current_sum >= 1e-9
+            if updated:
+                probs = np.where(probs > 1e-9, probs / current_sum, 0.0)
+                probs[probs <= game.PRUNE_THRESHOLD] = 0.0
+
+        game.probabilities = dict(zip(names, probs.tolist()))
+        return updated
+
+
+def _group_entropy(levels: List[float], counts: List[int]) -> float:
+    """Akinator._calc_entropy of a group holding counts[i] copies of probability levels[i]."""
+    total_count = sum(counts)
+    group_sum = sum(p * c for p, c in zip(levels, counts))
+    if not total_count or group_sum < 1e-9:
+        return 0.0
+
+    scale = group_sum if abs(group_sum - 1.0) > 1e-9 and total_count > 1 else 1.0
+    entropy = 0.0
+    for p, c in zip(levels, counts):
+        q = p / scale
+        if c and q > 1e-9:
+            entropy -= c * q * math.log2(q)
+    return entropy
+
+
+class BitsetEngine(Engine):
+    """Scores splits with AND/popcount over attribute column bitsets.
+
+    Candidates are bucketed by their (few distinct) probability values, so the yes/no mass of an
+    attribute is a handful of popcounts per bucket. People without a value count as "no" like
+    `.get(attr, 0)` does, unless `unknown_as_no` is False, in which case they sit out the split.
+    """
+    name = "bitset"
+
+    def __init__(self, kb: KnowledgeBase, unknown_as_no: bool = True):
+        self.kb = kb
+        self.bitsets = kb.attribute_bitsets()
+        self.unknown_as_no = unknown_as_no
+
+    def _levels(self, probabilities: Dict[str, float], names: List[str]):
+        person_index = self.kb.person_index
+        rows_by_level: Dict[float, List[int]] = {}
+        for name in names:
+            prob = probabilities.get(name, 0.0)
+            rows_by_level.setdefault(prob if prob > 1e-9 else 0.0, []).append(person_index[name])
+
+        n_people = self.bitsets.n_people
+        levels = list(rows_by_level)
+        level_bits = [rows_to_bits(rows, n_people) for rows in rows_by_level.values()]
+        level_sizes = [len(rows) for rows in rows_by_level.values()]
+        return levels, level_bits, level_sizes
+
+    def calc_info_gain_subset(self, game: "Akinator", subset_candidates: List[str], unasked_attrs: List[str]) -> Optional[str]:
+        if not subset_candidates:
+            return None
+
+        levels, level_bits, level_sizes = self._levels(game.probabilities, subset_candidates)
+        subset_sum = sum(p * c for p, c in zip(levels, level_sizes))
+        if subset_sum < 1e-9:
+            return None
+        subset_entropy = _group_entropy([p / subset_sum for p in levels], [c if p > 0 else 0 for p, c in zip(levels, level_sizes)])
+
+        bitsets = self.bitsets
+        attr_index = self.kb.attr_index
+        attrs = [attr for attr in unasked_attrs if attr not in game.asked_attrs]
+        gains = []
+
+        for attr in attrs:
+            col = attr_index[attr]
+            yes, frac = bitsets.yes[col], bitsets.fractional_bits[col]
+            known = None if self.unknown_as_no else bitsets.known[col]
+
+            yes_counts, no_counts = [], []
+            for bits, size in zip(level_bits, level_sizes):
+                n_yes = (bits & yes).bit_count()
+                n_frac = (bits & frac).bit_count() if frac else 0
+                n_pool = size if known is None else (bits & known).bit_count()
+                yes_counts.append(n_yes)
+                no_counts.append(n_pool - n_yes - n_frac)
+
+            weight_yes = sum(p * c for p, c in zip(levels, yes_counts)) / subset_sum
+            weight_no = sum(p * c for p, c in zip(levels, no_counts)) / subset_sum
+            conditional_entropy = weight_yes * _group_entropy(levels, yes_counts) + weight_no * _group_entropy(levels, no_counts)
+            gains.append(subset_entropy - conditional_entropy)
+
+        if self.unknown_as_no:
+            return _pick_best(game, subset_candidates, attrs, gains)
+
+        # The reference scorer would count unknowns as "no", so ties are broken by attribute order here
+        max_gain = max(gains, default=-1.0)
+        return attrs[gains.index(max_gain)] if max_gain > 1e-9 else None
+
+    def update_probs(self, game: "Akinator", attr: str, answer: float) -> bool:
+        col = self.kb.attr_index.get(attr)
+        bitsets = self.bitsets
+        multiplier_for = {}
+
+        def multiplier(value: float) -> float:
+            if value not in multiplier_for:
+                diff = abs(value - answer)
+                if value == answer:
+                    multiplier_for[value] = game.STRONG_MATCH_MULTIPLIER
+                elif diff == 1:
+                    multiplier_for[value] = game.STRONG_MISMATCH_MULTIPLIER
+                elif diff < 0.5:
+                    multiplier_for[value] = game.SOFT_MATCH_MULTIPLIER
+                elif diff > 0.5:
+                    multiplier_for[value] = game.SOFT_MISMATCH_MULTIPLIER
+                else:
+                    multiplier_for[value] = 1.0
+            return multiplier_for[value]
+
+        person_index = self.kb.person_index
+        probabilities = game.probabilities
+        if col is None:
+            rows = {}
+        else:
+            rows = dict.fromkeys(bits_to_rows(bitsets.yes[col], bitsets.n_people), 1)
+            rows.update(bitsets.fractional[col] or {})
+            if not self.unknown_as_no:
+                unknown = bits_to_rows(~bitsets.known[col] & ((1 << bitsets.n_people) - 1), bitsets.n_people)
+                rows.update(dict.fromkeys(unknown, None))
+
+        default = multiplier(0)
+        for name in probabilities:
+            value = rows.get(person_index[name], 0)
+            if value is not None:
+                probabilities[name] *= multiplier(value) if value != 0 else default
+
+        current_sum = sum(probabilities.values())
+        if current_sum < 1e-9:  return False
+
+        for name in probabilities:
+            if probabilities[name] > 1e-9:
+                probabilities[name] /= current_sum
+            else:
+                probabilities[name] = 0.0
+        return True
+
+
+class _GainStats:
+    """Per-attribute sums over the active candidates (p > 1e-9) of p, p*log2(p) and counts, for both split sides."""
+    __slots__ = ("names", "rows", "probs", "sum_yes", "plogp_yes", "count_yes", "sum_no", "plogp_no", "count_no",
+                 "total_sum", "total_plogp", "total_count")
+
+
+def _plogp(probs: "np.ndarray") -> "np.ndarray":
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(probs > 0, probs * np.log2(np.where(probs > 0, probs, 1.0)), 0.0)
+
+
+def _stats_entropy(sums: "np.ndarray", plogps: "np.ndarray", counts: "np.ndarray") -> "np.ndarray":
+    """Closed form of Akinator._calc_entropy from a group's sum, sum of p*log2(p) and size."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = np.log2(np.where(sums > 0, sums, 1.0)) - plogps / np.where(sums > 0, sums, 1.0)
+    entropy = np.where((np.abs(sums - 1.0) > 1e-9) & (counts > 1), normalized, -plogps)
+    return np.where((counts == 0) | (sums < 1e-9), 0.0, entropy)
+
+
+class IncrementalEngine(NumpyEngine):
+    """Keeps per-attribute sufficient statistics across turns instead of re-scoring every candidate.
+
+    An answer rescales candidates by one of at most four multipliers. The statistics are rescaled
+    by the most common multiplier in O(attributes) and only the rows in the other match classes
+    (plus rows entering or leaving the active set) are re-added, so a turn costs about
+    O(changed candidates x attributes). Scoring the whole active set then needs no pass over the
+    candidates; focused top-N scoring falls back to the batched NumpyEngine. Attributes within
+    INCREMENTAL_TIE_TOLERANCE of the best are re-scored exactly, so choices match the other engines.
+    The statistics live on the game and are rebuilt whenever the probabilities were changed
+    outside the engine (loaded state, mistaken guesses).
+    """
+    name = "incremental"
+    INCREMENTAL_TIE_TOLERANCE = 1e-9
+
+    # The per-game statistics already make a turn cheap, and stacking would bypass them
+    update_probs_sessions = Engine.update_probs_sessions
+    calc_info_gain_sessions = Engine.calc_info_gain_sessions
+
+    def __init__(self, kb: KnowledgeBase):
+        super().__init__(kb)
+        self.yes, self.no = self._split_masks()
+
+    def _add_rows(self, stats: _GainStats, rows: "np.ndarray", probs: "np.ndarray", sign: float = 1.0):
+        if not len(rows):
+            return
+        yes, no = self.yes[stats.rows[rows]], self.no[stats.rows[rows]]
+        plogp = _plogp(probs)
+        stats.sum_yes += sign * (probs @ yes)
+        stats.plogp_yes += sign * (plogp @ yes)
+        stats.count_yes += sign * yes.sum(axis=0)
+        stats.sum_no += sign * (probs @ no)
+        stats.plogp_no += sign * (plogp @ no)
+        stats.count_no += sign * no.sum(axis=0)
+        stats.total_sum += sign * probs.sum()
+        stats.total_plogp += sign * plogp.sum()
+        stats.total_count += sign * len(rows)
+
+    def _build_stats(self, names: tuple, probs: "np.ndarray") -> _GainStats:
+        stats = _GainStats()
+        stats.names = names
+        stats.rows = self._rows(list(names))
+        stats.probs = probs
+        n_attrs = len(self.kb.attrs)
+        stats.sum_yes, stats.plogp_yes, stats.count_yes = np.zeros(n_attrs), np.zeros(n_attrs), np.zeros(n_attrs)
+        stats.sum_no, stats.plogp_no, stats.count_no = np.zeros(n_attrs), np.zeros(n_attrs), np.zeros(n_attrs)
+        stats.total_sum = stats.total_plogp = stats.total_count = 0.0
+
+        active = np.flatnonzero(probs > 1e-9)
+        self._add_rows(stats, active, probs[active])
+        return stats
+
+    def _stats(self, game: "Akinator") -> _GainStats:
+        names = tuple(game.probabilities)
+        probs = np.fromiter(game.probabilities.values(), dtype=np.float64, count=len(names))
+        stats = game._engine_state
+        if not isinstance(stats, _GainStats) or stats.names != names or not np.array_equal(stats.probs, probs):
+            stats = self._build_stats(names, probs)
+            game._engine_state = stats
+        return stats
+
+    def calc_info_gain_subset(self, game: "Akinator", subset_candidates: List[str], unasked_attrs: List[str]) -> Optional[str]:
+        stats = self._stats(game)
+        # Subsets are always drawn from the active candidates, so equal size means the whole active set
+        if not subset_candidates or len(subset_candidates) != stats.total_count:
+            return super().calc_info_gain_subset(game, subset_candidates, unasked_attrs)
+
+        attrs = [attr for attr in unasked_attrs if attr not in game.asked_attrs]
+        if not attrs or stats.total_sum < 1e-9:
+            return None
+
+        columns = self._columns(attrs)
+        total = np.array([stats.total_sum])
+        subset_entropy = _stats_entropy(total, np.array([stats.total_plogp]), np.array([max(stats.total_count, 2)]))[0]
+        entropy_yes = _stats_entropy(stats.sum_yes[columns], stats.plogp_yes[columns], stats.count_yes[columns])
+        entropy_no = _stats_entropy(stats.sum_no[columns], stats.plogp_no[columns], stats.count_no[columns])
+        gains = subset_entropy - (stats.sum_yes[columns] / total * entropy_yes + stats.sum_no[columns] / total * entropy_no)
+
+        max_gain = gains.max()
+        if max_gain <= 1e-9 - self.INCREMENTAL_TIE_TOLERANCE:
+            return None
+        tied = [attrs[i] for i in np.flatnonzero(gains >= max_gain - self.INCREMENTAL_TIE_TOLERANCE)]
+        return super().calc_info_gain_subset(game, subset_candidates, tied)
+
+    def update_probs(self, game: "Akinator", attr: str, answer: float) -> bool:
+        stats = self._stats(game)
+        old_probs = stats.probs
+        column = self.kb.attr_index.get(attr)
+        values = self.matrix[stats.rows, column] if column is not None else np.zeros(len(stats.rows))
+        multipliers = _multipliers(game, values, answer)
+        scaled = old_probs * multipliers
+        current_sum = sum(scaled.tolist())
+        if current_sum < 1e-9:
+            game.probabilities = dict(zip(stats.names, scaled.tolist()))
+            game._engine_state = None
+            return False
+        new_probs = np.where(scaled > 1e-9, scaled / current_sum, 0.0)
+
+        # Rescale everything by the most common multiplier, then patch the rows of the other match classes
+        active_old = old_probs > 1e-9
+        classes, class_sizes = np.unique(multipliers[active_old], return_counts=True)
+        base = float(classes[np.argmax(class_sizes)]) if len(classes) else 1.0
+        log_base = math.log2(base)
+        stats.plogp_yes = base * stats.plogp_yes + base * log_base * stats.sum_yes
+        stats.plogp_no = base * stats.plogp_no + base * log_base * stats.sum_no
+        stats.total_plogp = base * stats.total_plogp + base * log_base * stats.total_sum
+        stats.sum_yes *= base
+        stats.sum_no *= base
+        stats.total_sum *= base
+
+        changed = np.flatnonzero(active_old & (multipliers != base))
+        self._add_rows(stats, changed, old_probs[changed] * base, sign=-1.0)
+        self._add_rows(stats, changed, scaled[changed])
+
+        # Normalize: sum(p/Z) = S/Z and sum((p/Z) log2(p/Z)) = (T - S log2 Z) / Z
+        log_sum = math.log2(current_sum)
+        stats.plogp_yes = (stats.plogp_yes - log_sum * stats.sum_yes) / current_sum
+        stats.plogp_no = (stats.plogp_no - log_sum * stats.sum_no) / current_sum
+        stats.total_plogp = (stats.total_plogp - log_sum * stats.total_sum) / current_sum
+        stats.sum_yes /= current_sum
+        stats.sum_no /= current_sum
+        stats.total_sum /= current_sum
+
+        active_new = new_probs > 1e-9
+        leaving = np.flatnonzero(active_old & ~active_new)
+        entering = np.flatnonzero(~active_old & active_new)
+        self._add_rows(stats, leaving, scaled[leaving] / current_sum, sign=-1.0)
+        self._add_rows(stats, entering, new_probs[entering])
+
+        stats.probs = new_probs
+        game.probabilities = dict(zip(stats.names, new_probs.tolist()))
+        return True
+
+
+# Worker-side views of ParallelEngine's shared segments: matrix segment name -> (segments, matrix, probs, rows)
+_SHARED_VIEWS: Dict[str, Tuple] = {}
+
+
+def _attach_shared(matrix_name: str, buffers_name: str, shape: Tuple[int, int]):
+    _import_numpy()
+    segments = (SharedMemory(name=matrix_name), SharedMemory(name=buffers_name))
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=segments[0].buf)
+    probs = np.ndarray((shape[0],), dtype=np.float64, buffer=segments[1].buf)
+    rows = np.ndarray((shape[0],), dtype=np.intp, buffer=segments[1].buf, offset=shape[0] * 8)
+    _SHARED_VIEWS[matrix_name] = (segments, matrix, probs, rows)
+
+
+def _shard_gains(matrix_name: str, n_rows: int, subset_sum: float, subset_entropy: float, columns: "np.ndarray") -> "np.ndarray":
+    _, matrix, probs, rows = _SHARED_VIEWS[matrix_name]
+    return _matrix_gains(matrix, rows[:n_rows], probs[:n_rows], subset_sum, subset_entropy, columns)
+
+
+def _release_shared(segments: List[SharedMemory], executors: List[ProcessPoolExecutor]):
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+    for segment in segments:
+        try:
+            segment.close()
+        except BufferError:  # Still viewed by a live array at interpreter exit
+            pass
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ParallelEngine(NumpyEngine):
+    """NumpyEngine that shards the attribute columns of large scoring calls across worker processes.
+
+    The attribute matrix lives in shared memory, and each call writes the candidate rows and
+    probabilities to a second shared segment, so a shard only ships its column indices. Shard
+    results are concatenated in attribute order before the usual near-tie re-scoring, so the
+    choice is the one the serial loop makes. Calls under PARALLEL_MIN_CELLS (candidates x
+    attributes) stay in-process, where the pickling round trip would cost more than it saves.
+    """
+    name = "parallel"
+    PARALLEL_MIN_CELLS = 1 << 20
+
+    def __init__(self, kb: KnowledgeBase, workers: Optional[int] = None):
+        super().__init__(kb)
+        # Cores this process may actually run on, which can be fewer than os.cpu_count() in containers
+        self.workers = workers or (len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1)
+        n_people = len(kb.people)
+
+        self._matrix_segment = SharedMemory(create=True, size=max(1, self.matrix.nbytes))
+        shared_matrix = np.ndarray(self.matrix.shape, dtype=np.float64, buffer=self._matrix_segment.buf)
+        shared_matrix[:] = self.matrix
+        self.matrix = shared_matrix
+
+        self._buffers_segment = SharedMemory(create=True, size=max(1, n_people * 16))
+        self._probs = np.ndarray((n_people,), dtype=np.float64, buffer=self._buffers_segment.buf)
+        self._shared_rows = np.ndarray((n_people,), dtype=np.intp, buffer=self._buffers_segment.buf, offset=n_people * 8)
+
+        # Games share the engine, and the probability segment holds one call at a time
+        self._lock = threading.Lock()
+        self._executors: List[ProcessPoolExecutor] = []
+        weakref.finalize(self, _release_shared, [self._matrix_segment, self._buffers_segment], self._executors)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if not self._executors:
+            self._executors.append(ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_attach_shared,
+                initargs=(self._matrix_segment.name, self._buffers_segment.name, self.matrix.shape),
+            ))
+        return self._executors[0]
+
+    def _gains(self, rows: "np.ndarray", probs: "np.ndarray", subset_sum: float, subset_entropy: float,
+               columns: "np.ndarray") -> "np.ndarray":
+        if self.workers <= 1 or len(rows) * len(columns) < self.PARALLEL_MIN_CELLS:
+            return super()._gains(rows, probs, subset_sum, subset_entropy, columns)
+
+        shards = [shard for shard in np.array_split(columns, self.workers) if len(shard)]
+        with self._lock:
+            self._shared_rows[:len(rows)] = rows
+            self._probs[:len(rows)] = probs
+            executor = self._executor()
+            futures = [executor.submit(_shard_gains, self._matrix_segment.name, len(rows), subset_sum, subset_entropy, shard)
+                       for shard in shards]
+            return np.concatenate([future.result() for future in futures])
+
+
+ENGINES: Dict[str, Optional[type]] = {
+    "python": None,
+    "numpy": NumpyEngine,
+    "bitset": BitsetEngine,
+    "incremental": IncrementalEngine,
+    "parallel": ParallelEngine,
+}
+
+
+def make_engine(name: str, kb: KnowledgeBase):
+    """Returns the shared engine instance for a knowledge base, or None for the reference Python loops."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}'. Use one of {sorted(ENGINES)}.")
+
+    engine_cls = ENGINES[name]
+    if engine_cls is None:
+        return None
+    return kb.derived(("engine", name), engine_cls)
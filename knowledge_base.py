@@ -0,0 +1,363 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Literal, Mapping, Optional, Tuple
+
+from bitsets import AttributeBitsets, set_row
+from dataset_stream import iter_records, load_artifact, save_artifact
+
+# Default of how often the background refresher checks SQL catalogs for changed characters, in seconds
+SQL_REFRESH_INTERVAL = 30.0
+
+
+@dataclass(frozen=True)
+class KnowledgeBase:
+    """Immutable dataset, question table and derived indexes shared by every game.
+
+    `dataset_id` names the dataset in deployments serving several (see dataset_registry.py); it is
+    written into encoded game states next to `version`.
+    """
+    people: Tuple[str, ...]
+    attrs: Tuple[str, ...]
+    people_attrs_map: Mapping[str, Mapping[str, float]]
+    questions: Mapping[str, str]
+    person_index: Mapping[str, int]
+    attr_index: Mapping[str, int]
+    version: str
+    bitsets: Optional[AttributeBitsets] = field(default=None, repr=False, compare=False)
+    dataset_id: str = field(default="", compare=False)
+    _derived: Dict[Hashable, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _derived_lock: Any = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+
+    def derived(self, key: Hashable, build: Callable[["KnowledgeBase"], Any]) -> Any:
+        """Returns a lazily built index over this knowledge base, computed at most once per process."""
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = build(self)
+                    self._derived[key] = value
+        return value
+
+    def attribute_bitsets(self) -> AttributeBitsets:
+        """Column bitsets of the attributes; built on first use unless the base was loaded with bitset storage."""
+        if self.bitsets is not None:
+            return self.bitsets
+        return self.derived("bitsets", lambda kb: AttributeBitsets.from_rows(
+            (kb.people_attrs_map[person] for person in kb.people), len(kb.people), kb.attrs, kb.attr_index
+        ))
+
+    @classmethod
+    def from_records(cls, dataset: List[Dict], questions: Dict[str, str], version: str = "",
+                     storage: Literal["dict", "bitset"] = "dict") -> "KnowledgeBase":
+        if not version:
+            digest = hashlib.sha1(json.dumps([dataset, questions], sort_keys=True).encode())
+            version = digest.hexdigest()[:12]
+
+        builder = KnowledgeBaseBuilder(storage)
+        for person in dataset:
+            builder.add(person["name"], person["attributes"])
+        return builder.build(questions, version)
+
+    @classmethod
+    def from_bitsets(cls, people: Iterable[str], bitsets: AttributeBitsets, questions: Mapping[str, str], version: str) -> "KnowledgeBase":
+        """Knowledge base with bitset storage whose per-person maps are views over `bitsets`."""
+        people = tuple(people)
+        return cls(
+            people=people,
+            attrs=tuple(bitsets.attrs),
+            people_attrs_map=MappingProxyType({name: bitsets.row(row) for row, name in enumerate(people)}),
+            questions=MappingProxyType(dict(questions)),
+            person_index=MappingProxyType({name: i for i, name in enumerate(people)}),
+            attr_index=MappingProxyType(dict(bitsets.attr_index)),
+            version=version,
+            bitsets=bitsets,
+        )
+
+    @classmethod
+    def from_files(cls, dataset_path: str, questions_path: str, dataset_type: Literal["json", "sql"] = "json",
+                   storage: Literal["dict", "bitset"] = "dict", artifact_path: Optional[str] = None) -> "KnowledgeBase":
+        """Loads a JSON array or NDJSON dataset (or the SQL catalog at dataset_path) in a single streaming pass.
+
+        With bitset storage and an `artifact_path`, the preprocessed artifact is loaded instead when it
+        was built from the current files, and (re)written after parsing otherwise.
+        """
+        if dataset_type == "sql":
+            # Imported here because sql_dataset builds on this module
+            from sql_dataset import SqlCatalog, run_sync
+            questions = _load_questions(questions_path, hashlib.sha1())
+            kb, _ = run_sync(SqlCatalog(dataset_path).load(questions, storage))
+            return kb
+
+        if dataset_type.lower() != "json":
+            raise ValueError("Unsupported dataset type. Use 'json' or 'sql'.")
+        if artifact_path and storage != "bitset":
+            print("Dataset artifacts hold bitset storage; ignoring the artifact for dict storage.")
+            artifact_path = None
+
+        source = _stat_signature(dataset_path, questions_path)
+        artifact = load_artifact(artifact_path, source) if artifact_path else None
+        if artifact is not None:
+            people, bitsets, version = artifact
+            kb = cls.from_bitsets(people, bitsets, _load_questions(questions_path, hashlib.sha1()), version)
+            print(f"Loaded knowledge base {kb.version} from {artifact_path} with {len(kb.people)} people having {len(kb.attrs)} traits...\n")
+            return kb
+
+        digest = hashlib.sha1()
+        builder = KnowledgeBaseBuilder(storage)
+        try:
+            for person in iter_records(dataset_path, digest):
+                builder.add(person["name"], person["attributes"])
+        except Exception as e:
+            print(f"Error loading dataset: {e}")
+            builder = KnowledgeBaseBuilder(storage)
+        questions = _load_questions(questions_path, digest)
+
+        kb = builder.build(questions, digest.hexdigest()[:12])
+        print(f"Loaded knowledge base {kb.version} with {len(kb.people)} people having {len(kb.attrs)} traits...\n")
+        if artifact_path:
+            try:
+                save_artifact(artifact_path, kb.people, kb.bitsets, kb.version, source)
+            except OSError as e:
+                print(f"Could not write dataset artifact {artifact_path}: {e}")
+        return kb
+
+
+class KnowledgeBaseBuilder:
+    """Builds a KnowledgeBase one person at a time, so loaders never hold the whole raw dataset.
+
+    Attributes are indexed in first-seen order as people arrive. With "bitset" storage each person is
+    written straight into growable column buffers and no per-person dict is kept. Attribute names are
+    interned, so people (and knowledge bases of different datasets) share one copy of each name.
+    """
+
+    def __init__(self, storage: Literal["dict", "bitset"] = "dict"):
+        if storage not in ("dict", "bitset"):
+            raise ValueError("Unsupported storage. Use 'dict' or 'bitset'.")
+        self.storage = storage
+        self.people: List[str] = []
+        self.attr_index: Dict[str, int] = {}
+        self._rows: List[Mapping[str, float]] = []
+        self._capacity = 0  # Bytes allocated per column buffer
+        self._yes: List[bytearray] = []
+        self._known: List[bytearray] = []
+        self._fractional: List[Optional[Dict[int, float]]] = []
+
+    def __len__(self) -> int:
+        return len(self.people)
+
+    def add(self, name: str, attributes: Mapping[str, float]):
+        row = len(self.people)
+        self.people.append(name)
+        for attr in attributes:
+            if attr not in self.attr_index:
+                self.attr_index[sys.intern(attr)] = len(self.attr_index)
+                if self.storage == "bitset":
+                    self._yes.append(bytearray(self._capacity))
+                    self._known.append(bytearray(self._capacity))
+                    self._fractional.append(None)
+
+        if self.storage == "dict":
+            self._rows.append(MappingProxyType({sys.intern(attr): value for attr, value in attributes.items()}))
+            return
+
+        if row >> 3 >= self._capacity:
+            # Doubling keeps the total copying linear in the number of people
+            grow = max(self._capacity, 64)
+            for buf in self._yes + self._known:
+                buf.extend(bytes(grow))
+            self._capacity += grow
+        set_row(row, attributes, self.attr_index, self._yes, self._known, self._fractional)
+
+    def build(self, questions: Mapping[str, str], version: str, sort_attrs: bool = False) -> KnowledgeBase:
+        """Freezes the people added so far; `sort_attrs` orders attributes by key instead of first appearance."""
+        if not self.people:
+            raise ValueError("Dataset is empty or not loaded correctly.")
+
+        people = tuple(self.people)
+        attrs = tuple(sorted(self.attr_index) if sort_attrs else self.attr_index)
+        attr_index = {attr: i for i, attr in enumerate(attrs)}
+        if sort_attrs and self.storage == "bitset":
+            order = [self.attr_index[attr] for attr in attrs]
+            self._yes = [self._yes[col] for col in order]
+            self._known = [self._known[col] for col in order]
+            self._fractional = [self._fractional[col] for col in order]
+
+        if self.storage == "bitset":
+            # Per-person dicts are replaced by views over the column bitsets
+            n_bytes = (len(people) + 7) // 8
+            for buf in self._yes + self._known:
+                del buf[n_bytes:]
+            bitsets = AttributeBitsets.from_buffers(len(people), attrs, attr_index, self._yes, self._known, self._fractional)
+            return KnowledgeBase.from_bitsets(people, bitsets, questions, version)
+
+        return KnowledgeBase(
+            people=people,
+            attrs=attrs,
+            people_attrs_map=MappingProxyType(dict(zip(people, self._rows))),
+            questions=MappingProxyType(dict(questions)),
+            person_index=MappingProxyType({name: i for i, name in enumerate(people)}),
+            attr_index=MappingProxyType(attr_index),
+            version=version,
+        )
+
+
+def _load_questions(questions_path: str, digest) -> Dict[str, str]:
+    try:
+        with open(questions_path, 'rb') as f:
+            raw = f.read()
+        digest.update(raw)
+        return {sys.intern(attr): text for attr, text in json.loads(raw).items()}
+
+    except Exception as e:
+        print(f"Error loading questions: {e}")
+        return {}
+
+
+def _stat_signature(*paths: str) -> Tuple:
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class KnowledgeBaseCache:
+    """Process-wide cache of knowledge bases, reloaded when the underlying files change on disk.
+
+    SQL catalogs (dataset_path is then a database URL) are loaded on first use and then only refreshed
+    by the background thread of start_sql_refresh(), which fetches the characters changed since the
+    last load and swaps the new base in; get() never waits for the database after the first load.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str, str, str, Optional[str]], Tuple[Any, KnowledgeBase]] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+
+    def get(self, dataset_path: str, questions_path: str, dataset_type: Literal["json", "sql"] = "json",
+            storage: Literal["dict", "bitset"] = "dict", artifact_path: Optional[str] = None) -> KnowledgeBase:
+        key = (dataset_path, questions_path, dataset_type, storage, artifact_path)
+        if dataset_type == "sql":
+            return self._get_sql(key)
+        signature = _stat_signature(dataset_path, questions_path)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            kb = KnowledgeBase.from_files(dataset_path, questions_path, dataset_type, storage, artifact_path)
+            self._entries[key] = (signature, kb)
+            return kb
+
+    def _get_sql(self, key: Tuple[str, str, str, str, Optional[str]]) -> KnowledgeBase:
+        # The signature is the watermark of the loaded catalog
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[1]
+
+            from sql_dataset import SqlCatalog, run_sync
+            dataset_path, questions_path, _, storage, _ = key
+            questions = _load_questions(questions_path, hashlib.sha1())
+            kb, watermark = run_sync(SqlCatalog(dataset_path).load(questions, storage))
+            print(f"Loaded knowledge base {kb.version} with {len(kb.people)} people having {len(kb.attrs)} traits...\n")
+            self._entries[key] = (watermark, kb)
+            return kb
+
+    def refresh_sql(self) -> int:
+        """Merges catalog changes into every loaded SQL base; returns how many bases were swapped for newer ones."""
+        from sql_dataset import SqlCatalog, run_sync
+
+        swapped = 0
+        with self._refresh_lock:
+            for key, entry in list(self._entries.items()):
+                if key[2] != "sql":
+                    continue
+                dataset_path, questions_path, _, storage, _ = key
+                watermark, previous = entry
+                try:
+                    questions = _load_questions(questions_path, hashlib.sha1())
+                    kb, watermark = run_sync(SqlCatalog(dataset_path).refresh(previous, watermark, questions, storage))
+                except Exception as e:
+                    # Keep serving the loaded catalog and try again after the next interval
+                    print(f"🔴 SQL catalog refresh failed: {e}")
+                    continue
+                with self._lock:
+                    # Requests keep reading the old base until this single swap; an evicted entry stays evicted
+                    if self._entries.get(key) is entry:
+                        self._entries[key] = (watermark, kb)
+                        swapped += kb is not previous
+        return swapped
+
+    def start_sql_refresh(self, interval: float = SQL_REFRESH_INTERVAL):
+        """Starts the daemon thread refreshing SQL catalogs every `interval` seconds (once per process)."""
+        if self._refresher is not None or interval <= 0:
+            return
+        self._stop_refresh.clear()
+
+        def run():
+            while not self._stop_refresh.wait(interval):
+                self.refresh_sql()
+
+        self._refresher = threading.Thread(target=run, name="sql-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop_sql_refresh(self):
+        if self._refresher is not None:
+            self._stop_refresh.set()
+            self._refresher.join()
+            self._refresher = None
+
+    def discard(self, dataset_path: str, questions_path: str, dataset_type: Literal["json", "sql"] = "json",
+                storage: Literal["dict", "bitset"] = "dict", artifact_path: Optional[str] = None):
+        """Drops the cached base for these paths; the next get() loads it again."""
+        with self._lock:
+            self._entries.pop((dataset_path, questions_path, dataset_type, storage, artifact_path), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_CACHE = KnowledgeBaseCache()
+
+
+def get_knowledge_base(dataset_path: str, questions_path: str, dataset_type: Literal["json", "sql"] = "json",
+                       storage: Literal["dict", "bitset"] = "dict", artifact_path: Optional[str] = None) -> KnowledgeBase:
+    """Returns the shared knowledge base for these paths, re-parsing only if the files changed."""
+    return _CACHE.get(dataset_path, questions_path, dataset_type, storage, artifact_path)
+
+
+def evict_knowledge_base(dataset_path: str, questions_path: str, dataset_type: Literal["json", "sql"] = "json",
+                         storage: Literal["dict", "bitset"] = "dict", artifact_path: Optional[str] = None):
+    """Forgets the shared knowledge base for these paths, so its memory is freed once no game holds it."""
+    _CACHE.discard(dataset_path, questions_path, dataset_type, storage, artifact_path)
+
+
+def start_sql_refresh(interval: float = SQL_REFRESH_INTERVAL):
+    """Refreshes the shared SQL knowledge bases in the background every `interval` seconds."""
+    _CACHE.start_sql_refresh(interval)
+
+
+def stop_sql_refresh():
+    _CACHE.stop_sql_refresh()
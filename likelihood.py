@@ -0,0 +1,175 @@
+import os
+import json
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from knowledge_base import KnowledgeBase, get_knowledge_base
+
+# The four answers process_answer receives: no, probably no, probably yes, yes
+ANSWER_VALUES = (0.0, 0.25, 0.75, 1.0)
+_ANSWER_INDEX = {answer: i for i, answer in enumerate(ANSWER_VALUES)}
+
+# P(answer | value 0) and P(answer | value 1) assumed before any game has been logged
+DEFAULT_TABLE = (
+    (0.80, 0.12, 0.05, 0.03),
+    (0.03, 0.05, 0.12, 0.80),
+)
+# No answer is ever ruled out completely, so one odd answer cannot zero the right candidate
+MIN_LIKELIHOOD = 1e-3
+
+Table = Tuple[Tuple[float, ...], Tuple[float, ...]]
+
+
+def _answer_index(answer: float) -> int:
+    index = _ANSWER_INDEX.get(answer)
+    if index is None:
+        # Raw numeric answers map to the closest of the four
+        index = min(range(len(ANSWER_VALUES)), key=lambda i: abs(ANSWER_VALUES[i] - answer))
+    return index
+
+
+def _normalize(counts: List[float]) -> Tuple[float, ...]:
+    floored = [max(count, 0.0) for count in counts]
+    total = sum(floored)
+    probs = [count / total for count in floored] if total > 0 else [1 / len(floored)] * len(floored)
+    probs = [max(p, MIN_LIKELIHOOD) for p in probs]
+    total = sum(probs)
+    return tuple(p / total for p in probs)
+
+
+class LikelihoodModel:
+    """Per-attribute answer model P(answer | attribute value), fitted from logged games.
+
+    Each attribute has one distribution over the four answers for people with value 0 and one for
+    value 1; fractional values mix the two in proportion. Attributes without logged answers use the
+    pooled table of all attributes.
+    """
+
+    def __init__(self, tables: Dict[str, Table], default: Table = DEFAULT_TABLE, dataset_version: str = "", games: int = 0):
+        self.tables = tables
+        self.default = default
+        self.dataset_version = dataset_version
+        self.games = games
+        digest = hashlib.sha1(json.dumps([sorted(tables.items()), default], sort_keys=True).encode())
+        self.version = digest.hexdigest()[:12]
+
+    def table(self, attr: str) -> Table:
+        return self.tables.get(attr, self.default)
+
+    def likelihood(self, attr: str, value: float, answer: float) -> float:
+        no_row, yes_row = self.table(attr)
+        index = _answer_index(answer)
+        yes = min(max(value, 0.0), 1.0)
+        return (1 - yes) * no_row[index] + yes * yes_row[index]
+
+    @classmethod
+    def fit(cls, outcomes: Iterable[Dict[str, Any]], kb: KnowledgeBase, prior_strength: float = 20.0) -> "LikelihoodModel":
+        """Fits the tables from {"target": name, "events": [...]} records of games whose character is known.
+
+        Counts are smoothed towards the pooled table (and that towards DEFAULT_TABLE) with
+        `prior_strength` pseudo-answers, so rarely asked attributes stay close to the average.
+        The API only logs won games, so answers from games where players misremembered their
+        character enough to lose are under-represented and the fit leans optimistic.
+        """
+        pooled = [[0.0] * len(ANSWER_VALUES), [0.0] * len(ANSWER_VALUES)]
+        per_attr: Dict[str, List[List[float]]] = {}
+        games = 0
+
+        for outcome in outcomes:
+            target_attrs = kb.people_attrs_map.get(outcome.get("target"))
+            if target_attrs is None:
+                continue
+            games += 1
+            for event in outcome.get("events", []):
+                if event[0] != "answer" or event[1] not in kb.attr_index:
+                    continue
+                _, attr, answer = event
+                yes = min(max(target_attrs.get(attr, 0), 0.0), 1.0)
+                index = _answer_index(answer)
+                counts = per_attr.setdefault(attr, [[0.0] * len(ANSWER_VALUES), [0.0] * len(ANSWER_VALUES)])
+                for row, weight in ((0, 1 - yes), (1, yes)):
+                    counts[row][index] += weight
+                    pooled[row][index] += weight
+
+        default = tuple(
+            _normalize([count + prior_strength * prior for count, prior in zip(pooled[row], DEFAULT_TABLE[row])])
+            for row in range(2)
+        )
+        tables = {
+            attr: tuple(
+                _normalize([count + prior_strength * prior for count, prior in zip(counts[row], default[row])])
+                for row in range(2)
+            )
+            for attr, counts in per_attr.items()
+        }
+        return cls(tables, default, kb.version, games)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({
+                "dataset_version": self.dataset_version,
+                "games": self.games,
+                "default": self.default,
+                "tables": self.tables,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "LikelihoodModel":
+        with open(path, 'r') as f:
+            raw = json.load(f)
+        tables = {attr: (tuple(rows[0]), tuple(rows[1])) for attr, rows in raw["tables"].items()}
+        default = (tuple(raw["default"][0]), tuple(raw["default"][1]))
+        model = cls(tables, default, raw.get("dataset_version", ""), raw.get("games", 0))
+        print(f"Loaded likelihood model {model.version} fitted on {model.games} games for {len(tables)} attributes...\n")
+        return model
+
+
+def get_likelihood_model(path: str, kb: KnowledgeBase) -> LikelihoodModel:
+    """Returns the model for this knowledge base, loaded once per knowledge base."""
+    return kb.derived(("likelihood", os.path.abspath(path)), lambda kb: LikelihoodModel.load(path))
+
+
+def read_outcomes(path: str) -> List[Dict[str, Any]]:
+    """Reads outcome records from a JSON lines file."""
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def fetch_outcomes(database_url: str, dataset_version: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Reads the outcome records the API logged to the game_outcomes table."""
+    import asyncpg
+
+    connection = await asyncpg.connect(database_url)
+    try:
+        if dataset_version:
+            rows = await connection.fetch("SELECT target, events, questions_asked FROM game_outcomes WHERE dataset_version = $1", dataset_version)
+        else:
+            rows = await connection.fetch("SELECT target, events, questions_asked FROM game_outcomes")
+    finally:
+        await connection.close()
+    return [{"target": row['target'], "events": json.loads(row['events']), "questions_asked": row['questions_asked']} for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the answer likelihood model from logged games.")
+    parser.add_argument("--dataset", default="data/characters_data.json")
+    parser.add_argument("--questions", default="data/questions.json")
+    parser.add_argument("--outcomes", default=None, help="JSON lines file of {\"target\", \"events\"} records")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"), help="Read the game_outcomes table instead")
+    parser.add_argument("--prior-strength", type=float, default=20.0)
+    parser.add_argument("--out", default="data/likelihood.json")
+    args = parser.parse_args()
+
+    kb = get_knowledge_base(args.dataset, args.questions)
+    if args.outcomes:
+        outcomes = read_outcomes(args.outcomes)
+    elif args.database_url:
+        outcomes = asyncio.run(fetch_outcomes(args.database_url, kb.version))
+    else:
+        parser.error("Either --outcomes or --database-url is required.")
+
+    model = LikelihoodModel.fit(outcomes, kb, prior_strength=args.prior_strength)
+    model.save(args.out)
+    print(f"Fitted likelihood model {model.version} on {model.games} games ({len(model.tables)} attributes) -> {args.out}")
@@ -0,0 +1,164 @@
+import math
+import time
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from algorithm import Akinator
+
+# Outcomes a question can have, as the numeric answers process_answer receives
+ANSWERS = (1.0, 0.75, 0.25, 0.0)
+
+
+class BudgetExceeded(Exception):
+    """The search ran past its time budget; the caller falls back to greedy selection."""
+
+
+def answer_likelihood(value: float, answer: float, probably_rate: float) -> float:
+    """P(answer | attribute value): players answer with the matching yes/no, softened to "probably" at probably_rate.
+
+    Fractional values are read as the chance that the honest answer is "yes".
+    """
+    yes = min(max(value, 0.0), 1.0)
+    if answer == 1.0:
+        return yes * (1 - probably_rate)
+    if answer == 0.75:
+        return yes * probably_rate
+    if answer == 0.25:
+        return (1 - yes) * probably_rate
+    return (1 - yes) * (1 - probably_rate)
+
+
+def _entropy(probs: List[float]) -> float:
+    return -sum(p * math.log2(p) for p in probs if p > 1e-9)
+
+
+class LookaheadSearch:
+    """Depth-limited search for the question that minimizes the expected number of questions to certainty.
+
+    A state is the probability vector over the game's most likely candidates. Each question branches
+    into the four answers, weighted by answer_likelihood, and the posterior of each answer uses the
+    game's own multipliers (games with a likelihood model use that model for both). States reaching
+    CERTAINTY_THRESHOLD cost nothing more, and states at the depth limit are estimated by their
+    entropy in bits. Only the `beam` attributes with the highest one-step information gain are
+    expanded at each state, and state values are memoized by active candidate set, (rounded)
+    probabilities and the attributes asked along the search path, so transposed answer orders are
+    solved once but states with different questions left never share a value.
+    """
+
+    def __init__(self, game: "Akinator", depth: int, beam: int, budget: float, max_candidates: int, probably_rate: float):
+        self.game = game
+        self.depth = depth
+        self.beam = beam
+        self.max_candidates = max_candidates
+        self.probably_rate = probably_rate
+        self.model = game.likelihood
+        self.deadline = time.perf_counter() + budget
+        self.memo: Dict[Tuple, float] = {}
+        self.nodes = 0
+        self._values: Dict[str, List[float]] = {}
+        self._multipliers: Dict[Tuple[float, float], float] = {}
+        self.names: List[str] = []
+        self.root_attrs: FrozenSet[str] = frozenset()
+
+    def best_question(self, unasked_attrs: List[str]) -> Optional[str]:
+        ranked_names = [name for name, prob in self.game._get_top_candidates(self.max_candidates) if prob > 1e-9]
+        total = sum(self.game.probabilities[name] for name in ranked_names)
+        if len(ranked_names) < 2 or total < 1e-9:
+            return None
+
+        self.names = ranked_names
+        probs = [self.game.probabilities[name] / total for name in ranked_names]
+        attrs = [attr for attr in unasked_attrs if attr not in self.game.asked_attrs]
+        self.root_attrs = frozenset(attrs)
+
+        best_attr, best_cost = None, math.inf
+        for attr in self._rank(probs, attrs):
+            cost = self._question_cost(probs, attr, attrs, self.depth)
+            if cost < best_cost - 1e-12:
+                best_attr, best_cost = attr, cost
+        return best_attr
+
+    def _values_of(self, attr: str) -> List[float]:
+        values = self._values.get(attr)
+        if values is None:
+            people_attrs_map = self.game.people_attrs_map
+            values = self._values[attr] = [people_attrs_map[name].get(attr, 0) for name in self.names]
+        return values
+
+    def _multiplier(self, value: float, answer: float) -> float:
+        """The factor Akinator._update_active_probs applies for this value and answer."""
+        key = (value, answer)
+        if key not in self._multipliers:
+            game, diff = self.game, abs(value - answer)
+            if value == answer:
+                self._multipliers[key] = game.STRONG_MATCH_MULTIPLIER
+            elif diff == 1:
+                self._multipliers[key] = game.STRONG_MISMATCH_MULTIPLIER
+            elif diff < 0.5:
+                self._multipliers[key] = game.SOFT_MATCH_MULTIPLIER
+            elif diff > 0.5:
+                self._multipliers[key] = game.SOFT_MISMATCH_MULTIPLIER
+            else:
+                self._multipliers[key] = 1.0
+        return self._multipliers[key]
+
+    def _rank(self, probs: List[float], attrs: List[str]) -> List[str]:
+        """The `beam` attributes with the highest yes/no information gain, best first (ties keep attribute order)."""
+        base = _entropy(probs)
+        gains = []
+        for i, attr in enumerate(attrs):
+            values = self._values_of(attr)
+            yes = [p for p, v in zip(probs, values) if v == 1 and p > 1e-9]
+            no = [p for p, v in zip(probs, values) if v == 0 and p > 1e-9]
+            sum_yes, sum_no = sum(yes), sum(no)
+            conditional = 0.0
+            if sum_yes > 1e-9:
+                conditional += sum_yes * _entropy([p / sum_yes for p in yes])
+            if sum_no > 1e-9:
+                conditional += sum_no * _entropy([p / sum_no for p in no])
+            gains.append((-(base - conditional), i, attr))
+        return [attr for _, _, attr in sorted(gains)[:self.beam]]
+
+    def _question_cost(self, probs: List[float], attr: str, attrs: List[str], depth: int) -> float:
+        values = self._values_of(attr)
+        remaining = [a for a in attrs if a != attr]
+        cost = 1.0
+        for answer in ANSWERS:
+            if self.model is not None:
+                joint = [p * self.model.likelihood(attr, v, answer) for p, v in zip(probs, values)]
+                answer_prob = sum(joint)
+            else:
+                answer_prob = sum(p * answer_likelihood(v, answer, self.probably_rate) for p, v in zip(probs, values))
+            if answer_prob < 1e-9:
+                continue
+
+            if self.model is not None:
+                posterior = joint
+            else:
+                posterior = [p * self._multiplier(v, answer) for p, v in zip(probs, values)]
+            total = sum(posterior)
+            if total < 1e-9:
+                continue
+            posterior = [p / total if p / total > 1e-9 else 0.0 for p in posterior]
+            cost += answer_prob * self._state_value(posterior, remaining, depth - 1)
+        return cost
+
+    def _state_value(self, probs: List[float], attrs: List[str], depth: int) -> float:
+        if max(probs) >= self.game.CERTAINTY_THRESHOLD:
+            return 0.0
+        if depth <= 0 or not attrs:
+            return _entropy(probs)
+
+        # The attributes asked since the root identify the questions still left, in a few entries
+        key = (tuple((i, round(p, 4)) for i, p in enumerate(probs) if p > 1e-9), depth, self.root_attrs.difference(attrs))
+        value = self.memo.get(key)
+        if value is not None:
+            return value
+
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise BudgetExceeded()
+
+        value = min(self._question_cost(probs, attr, attrs, depth) for attr in self._rank(probs, attrs))
+        self.memo[key] = value
+        return value
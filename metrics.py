@@ -0,0 +1,164 @@
+import os
+import time
+import zlib
+import bisect
+import cProfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds of the latency histograms, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the size histograms (candidates and attributes scored per call)
+SIZE_BUCKETS = (1, 4, 16, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Observations made inside a capture() block on this thread, shipped back from worker processes
+_capture = threading.local()
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label value."""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS, label: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series: Dict[Optional[str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label: Optional[str] = None):
+        captured = getattr(_capture, "observations", None)
+        if captured is not None:
+            captured.append((self.name, value, label))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                # Per-bucket counts, then +Inf, sum and count
+                series = self._series[label] = [0.0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {label: list(values) for label, values in self._series.items()}
+        for label, values in sorted(series.items(), key=lambda item: item[0] or ""):
+            prefix = f'{self.label}="{label}",' if self.label else ""
+            selector = f'{{{self.label}="{label}"}}' if self.label else ""
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative:g}'
+            yield f"{self.name}_sum{selector} {values[-2]:.6f}"
+            yield f"{self.name}_count{selector} {values[-1]:g}"
+
+
+class Registry:
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS, label: Optional[str] = None) -> Histogram:
+        self.histograms[name] = Histogram(name, help, buckets, label)
+        return self.histograms[name]
+
+    def render(self, gauges: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """Prometheus text exposition of every histogram, plus the numeric fields of `gauges` as whodat_<group>_<field>."""
+        lines: List[str] = []
+        for histogram in self.histograms.values():
+            lines.extend(histogram.render())
+        for group, values in (gauges or {}).items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"# TYPE whodat_{group}_{key} gauge")
+                    lines.append(f"whodat_{group}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("whodat_stage_seconds", "Time spent in each stage of a turn.", label="stage")
+REQUEST_SECONDS = REGISTRY.histogram("whodat_request_seconds", "End-to-end request latency by route.", label="route")
+GAIN_CANDIDATES = REGISTRY.histogram("whodat_info_gain_candidates", "Candidates scored per information gain call.", SIZE_BUCKETS)
+GAIN_ATTRIBUTES = REGISTRY.histogram("whodat_info_gain_attributes", "Attributes scored per information gain call.", SIZE_BUCKETS)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+@contextmanager
+def span(stage: str):
+    """Times the block into whodat_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+
+@contextmanager
+def capture():
+    """Collects the observations made on this thread inside the block, for replay() in another process."""
+    _capture.observations = observations = []
+    try:
+        yield observations
+    finally:
+        _capture.observations = None
+
+
+def replay(observations: List[Tuple[str, float, Optional[str]]]):
+    for name, value, label in observations:
+        REGISTRY.histograms[name].observe(value, label)
+
+
+class SessionProfiler:
+    """Opt-in cProfile of individual sessions' game turns.
+
+    A session is profiled if its id is listed in `session_ids` or falls in the `sample_rate` fraction of
+    ids. Each profiled turn is handed to `hook(label, profile)`, which by default dumps it to
+    `<output_dir>/<label>.prof` for pstats/snakeviz. One turn is profiled at a time; the rest run normally.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, session_ids: Iterable[str] = (), output_dir: str = "data/profiles",
+                 hook: Optional[Callable[[str, cProfile.Profile], None]] = None):
+        self.sample_rate = sample_rate
+        self.session_ids = {str(session_id) for session_id in session_ids}
+        self.output_dir = output_dir
+        self.hook = hook or self._dump
+        self.metrics: Dict[str, int] = {"profiled_turns": 0, "skipped_busy": 0}
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.session_ids)
+
+    def sampled(self, session_id: Any) -> bool:
+        if not self.enabled:
+            return False
+        if str(session_id) in self.session_ids:
+            return True
+        # Stable across processes, so every replica profiles the same sessions
+        return zlib.crc32(str(session_id).encode()) % 10000 < self.sample_rate * 10000
+
+    def run(self, label: str, fn: Callable, *args) -> Any:
+        if not self._busy.acquire(blocking=False):
+            self.metrics["skipped_busy"] += 1
+            return fn(*args)
+        try:
+            profile = cProfile.Profile()
+            result = profile.runcall(fn, *args)
+            self.metrics["profiled_turns"] += 1
+            try:
+                self.hook(label, profile)
+            except Exception as e:
+                print(f"🔴 Profile hook failed for {label}: {e}")
+            return result
+        finally:
+            self._busy.release()
+
+    def _dump(self, label: str, profile: cProfile.Profile):
+        os.makedirs(self.output_dir, exist_ok=True)
+        profile.dump_stats(os.path.join(self.output_dir, f"{label}.prof"))
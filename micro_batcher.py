@@ -0,0 +1,59 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces items submitted within `window` seconds into one call of `handler`.
+
+    The handler receives the items in arrival order and returns one result per item; an
+    Exception in place of a result is raised to that item's caller only. A batch is sent as soon
+    as it holds `max_batch` items, so the window only delays requests under light load.
+    """
+
+    def __init__(self, handler: Callable[[List[T]], Awaitable[List[Union[R, Exception]]]], window: float = 0.005,
+                 max_batch: int = 256):
+        self.handler = handler
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics: Dict[str, int] = {"batches": 0, "items": 0, "largest_batch": 0}
+        self._items: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append((item, future))
+
+        if len(self._items) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items:
+            asyncio.get_running_loop().create_task(self._run(items))
+
+    async def _run(self, items: List[Tuple[T, asyncio.Future]]):
+        self.metrics["batches"] += 1
+        self.metrics["items"] += len(items)
+        self.metrics["largest_batch"] = max(self.metrics["largest_batch"], len(items))
+        try:
+            results = await self.handler([item for item, _ in items])
+        except Exception as e:
+            results = [e] * len(items)
+
+        for (_, future), result in zip(items, results):
+            if future.done():  # The caller went away
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from knowledge_base import KnowledgeBase, get_knowledge_base
+from likelihood import LikelihoodModel
+
+BOOK_FORMAT_VERSION = 1
+ANSWERS = (0.0, 0.25, 0.75, 1.0)
+# Answer values as they appear in the JSON tree
+_ANSWER_KEYS = {0.0: "0", 0.25: "0.25", 0.75: "0.75", 1.0: "1"}
+
+
+class OpeningBook:
+    """Precomputed first questions of a game, one decision tree per randomness variant.
+
+    A node is {"q": attribute, "a": {answer: child node}}. Games whose seed maps to `variant`
+    sample their early questions exactly like the game that built that variant's tree, so
+    select_next_question() can read the answer off the tree instead of scoring every attribute.
+    """
+
+    def __init__(self, dataset_version: str, depth: int, variants: int, trees: List[Optional[Dict[str, Any]]]):
+        self.dataset_version = dataset_version
+        self.depth = depth
+        self.variants = variants
+        self.trees = trees
+
+    def variant(self, seed: int) -> int:
+        return seed % self.variants
+
+    def lookup(self, events: List[Tuple], seed: int) -> Optional[str]:
+        """Returns the book question after these events, or None once the game has left the book."""
+        if len(events) >= self.depth:
+            return None
+
+        node = self.trees[self.variant(seed)]
+        for event in events:
+            if node is None or event[0] != "answer" or event[1] != node["q"]:
+                return None
+            key = _ANSWER_KEYS.get(event[2])
+            node = node.get("a", {}).get(key) if key is not None else None
+        return node["q"] if node is not None else None
+
+    @property
+    def n_positions(self) -> int:
+        count, stack = 0, [tree for tree in self.trees if tree is not None]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.get("a", {}).values())
+        return count
+
+    @classmethod
+    def empty(cls, kb: KnowledgeBase) -> "OpeningBook":
+        return cls(kb.version, 0, 1, [None])
+
+    @classmethod
+    def build(cls, kb: KnowledgeBase, depth: int = 4, variants: int = 16, engine: str = "python",
+              likelihood: Optional[LikelihoodModel] = None) -> "OpeningBook":
+        """Plays out every answer combination of the first `depth` questions for each variant.
+
+        Games must use the same likelihood model as the build for the book to match live selection.
+        """
+        # Imported here because algorithm.py consults the book
+        from algorithm import Akinator
+
+        game = Akinator(knowledge_base=kb, engine=engine, likelihood=likelihood)
+        trees = [cls._expand(game, [], variant, depth) for variant in range(variants)]
+        return cls(kb.version, depth, variants, trees)
+
+    @classmethod
+    def _expand(cls, game, events: List[Tuple], variant: int, depth: int) -> Optional[Dict[str, Any]]:
+        # Seeds below `variants` map to themselves, so a book-less game with this seed plays the variant
+        game.replay(events, seed=variant)
+        attr = game.select_next_question()
+        if attr is None:
+            return None
+
+        node: Dict[str, Any] = {"q": attr}
+        if len(events) + 1 < depth:
+            children = {}
+            for answer in ANSWERS:
+                child = cls._expand(game, events + [("answer", attr, answer)], variant, depth)
+                if child is not None:
+                    children[_ANSWER_KEYS[answer]] = child
+            node["a"] = children
+        return node
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump({
+                "format": BOOK_FORMAT_VERSION,
+                "dataset_version": self.dataset_version,
+                "depth": self.depth,
+                "variants": self.variants,
+                "trees": self.trees,
+            }, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str, kb: KnowledgeBase) -> "OpeningBook":
+        """Loads a saved book, or an empty one if it is missing or was built for another dataset version."""
+        try:
+            with open(path, 'r') as f:
+                raw = json.load(f)
+        except Exception as e:
+            print(f"Error loading opening book: {e}")
+            return cls.empty(kb)
+
+        if raw.get("format") != BOOK_FORMAT_VERSION or raw.get("dataset_version") != kb.version:
+            print(f"Opening book {path} was built for dataset version '{raw.get('dataset_version')}', but '{kb.version}' is loaded. Ignoring it.")
+            return cls.empty(kb)
+
+        book = cls(raw["dataset_version"], raw["depth"], raw["variants"], raw["trees"])
+        print(f"Loaded opening book with {book.n_positions} positions ({book.variants} variants, depth {book.depth})...\n")
+        return book
+
+
+def get_opening_book(path: str, kb: KnowledgeBase) -> OpeningBook:
+    """Returns the book for this knowledge base, loaded once and dropped together with the base on reload."""
+    return kb.derived(("opening_book", os.path.abspath(path)), lambda kb: OpeningBook.load(path, kb))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the opening book for a dataset.")
+    parser.add_argument("--dataset", default="data/characters_data.json")
+    parser.add_argument("--questions", default="data/questions.json")
+    parser.add_argument("--storage", default="dict")
+    parser.add_argument("--engine", default="python")
+    parser.add_argument("--depth", type=int, default=4, help="Number of opening questions to precompute")
+    parser.add_argument("--variants", type=int, default=16, help="Number of seeded randomness variants")
+    parser.add_argument("--likelihood", default=None, help="Likelihood model the API runs with, if any")
+    parser.add_argument("--out", default="data/opening_book.json")
+    args = parser.parse_args()
+
+    kb = get_knowledge_base(args.dataset, args.questions, storage=args.storage)
+    start = time.perf_counter()
+    likelihood = LikelihoodModel.load(args.likelihood) if args.likelihood else None
+    book = OpeningBook.build(kb, depth=args.depth, variants=args.variants, engine=args.engine, likelihood=likelihood)
+    book.save(args.out)
+    print(f"Built opening book with {book.n_positions} positions in {time.perf_counter() - start:.1f}s -> {args.out}")
@@ -0,0 +1,177 @@
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """Bounded mapping that evicts the least recently used entry once maxsize is exceeded.
+
+    With a ttl (seconds), entries not touched for that long are treated as missing.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+            del self._entries[key]
+            self.evictions += 1
+            return default
+        self._entries[key] = (entry[0], time.monotonic())
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def pop(self, key: Hashable, default: Any = None) -> Optional[V]:
+        value = self.get(key, default)
+        self._entries.pop(key, None)
+        return value
+
+    def put(self, key: Hashable, value: V):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SessionCache(Generic[V]):
+    """In-process cache of live sessions with optional write-behind persistence.
+
+    Clean entries live in an LRU + TTL cache. Entries marked dirty are also kept in a separate
+    map until `writer` has persisted them, so eviction or expiry never drops an unsaved write.
+    `flush()` hands every dirty session to `writer` in one call (one multi-row upsert), and
+    `start()` runs it every `durability_window` seconds, which bounds how much can be lost on a crash.
+    Rows must only be deleted inside `paused()`, so a flush that picked a session up before it was
+    discarded cannot write it back after the delete.
+    """
+
+    def __init__(self, writer: Callable[[List[Tuple[Hashable, V]]], Awaitable[None]], maxsize: int = 1024,
+                 ttl: Optional[float] = None, durability_window: float = 1.0, max_dirty: int = 500):
+        self.writer = writer
+        self.durability_window = durability_window
+        self.max_dirty = max_dirty
+        self.metrics: Dict[str, int] = {"hits": 0, "misses": 0, "flushes": 0, "flushed_rows": 0, "flush_errors": 0}
+        self._cache: LRUCache[V] = LRUCache(maxsize, ttl)
+        self._dirty: Dict[Hashable, V] = {}
+        # Keys of the batch being written, and those of them discarded meanwhile (never re-queued if the write fails)
+        self._in_flight: Set[Hashable] = set()
+        self._discarded: Set[Hashable] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        value = self._cache.get(key)
+        if value is None:
+            value = self._dirty.get(key)
+            if value is not None:
+                self._cache.put(key, value)
+        self.metrics["hits" if value is not None else "misses"] += 1
+        return value
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        """Takes a clean entry out of the cache, e.g. while a request mutates it. Dirty entries stay queued."""
+        value = self._cache.pop(key)
+        self.metrics["hits" if value is not None else "misses"] += 1
+        return value
+
+    def put(self, key: Hashable, value: V, dirty: bool = False):
+        self._cache.put(key, value)
+        if dirty:
+            self._dirty[key] = value
+            if len(self._dirty) >= self.max_dirty:
+                self._wakeup.set()
+
+    def discard(self, key: Hashable):
+        self._cache.pop(key)
+        self._dirty.pop(key, None)
+        if key in self._in_flight:
+            self._discarded.add(key)
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.metrics, "size": len(self._cache), "dirty": len(self._dirty), "evictions": self._cache.evictions}
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            return await self._flush()
+
+    @asynccontextmanager
+    async def paused(self, flush_first: bool = False) -> AsyncIterator[None]:
+        """Holds off flushes for the block, once the one in progress (if any) has finished.
+
+        Deleting rows inside the block is safe against write-behind: discarded sessions are never
+        written again, and no flush that read them earlier is still running. With `flush_first`,
+        every dirty session is written before the block, so their rows look as fresh as they are.
+        """
+        async with self._flush_lock:
+            if flush_first:
+                await self._flush()
+            yield
+
+    async def _flush(self) -> int:
+        if not self._dirty:
+            return 0
+
+        batch = list(self._dirty.items())
+        self._dirty.clear()
+        self._in_flight = {key for key, _ in batch}
+        try:
+            await self.writer(batch)
+        except Exception as e:
+            # Re-queue whatever was neither dirtied again nor discarded in the meantime and retry on the next flush
+            for key, value in batch:
+                if key not in self._discarded:
+                    self._dirty.setdefault(key, value)
+            self.metrics["flush_errors"] += 1
+            print(f"🔴 Session cache flush of {len(batch)} sessions failed: {e}")
+            return 0
+        finally:
+            self._in_flight = set()
+            self._discarded = set()
+
+        self.metrics["flushes"] += 1
+        self.metrics["flushed_rows"] += len(batch)
+        return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.durability_window)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
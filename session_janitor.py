@@ -0,0 +1,83 @@
+import time
+import asyncio
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from session_cache import SessionCache
+from session_store import SessionStore
+
+
+class SessionJanitor:
+    """Background expiry of idle game sessions.
+
+    Every `interval` seconds, sessions idle for more than `ttl` seconds are deleted in batches of at
+    most `batch_size` rows (up to `max_batches` per sweep), so one sweep never holds long locks or
+    starves live requests. The store's own housekeeping (e.g. dropping expired Postgres partitions)
+    runs first, and the store size is sampled after every sweep.
+
+    With a write-behind `cache`, its dirty sessions are written before the sweep and flushes wait
+    until it ends, so a live game is never expired on a stale row nor written back after its delete.
+    """
+
+    def __init__(self, get_store: Callable[[], Awaitable[SessionStore]], ttl: float = 86400.0, interval: float = 300.0,
+                 batch_size: int = 1000, max_batches: int = 50, cache: Optional[SessionCache] = None):
+        self.get_store = get_store
+        self.cache = cache
+        self.ttl = ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.metrics: Dict[str, Any] = {
+            "sweeps": 0, "reclaimed_rows": 0, "delete_batches": 0, "errors": 0,
+            "last_sweep_ms": 0.0, "table_bytes": 0, "table_rows_estimate": 0, "partitions": 0,
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "ttl": self.ttl}
+
+    async def sweep(self) -> int:
+        """Runs one expiry pass and returns the number of rows reclaimed."""
+        start = time.perf_counter()
+        reclaimed = 0
+        try:
+            store = await self.get_store()
+            async with self.cache.paused(flush_first=True) if self.cache is not None else nullcontext():
+                reclaimed += await store.maintain(self.ttl)
+                for _ in range(self.max_batches):
+                    deleted = await store.delete_expired(self.ttl, self.batch_size)
+                    self.metrics["delete_batches"] += 1
+                    reclaimed += deleted
+                    if deleted < self.batch_size:
+                        break
+
+            size = await store.size()
+            self.metrics["table_bytes"] = size["bytes"]
+            self.metrics["table_rows_estimate"] = size["rows"]
+            self.metrics["partitions"] = size["partitions"]
+        except Exception as e:
+            self.metrics["errors"] += 1
+            print(f"🔴 Session janitor sweep failed: {e}")
+
+        self.metrics["sweeps"] += 1
+        self.metrics["reclaimed_rows"] += reclaimed
+        self.metrics["last_sweep_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return reclaimed
+
+    async def _run(self):
+        while True:
+            await self.sweep()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.ttl > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,704 @@
+import os
+import time
+import uuid
+import asyncio
+import sqlite3
+import argparse
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from metrics import observe_stage
+
+if TYPE_CHECKING:
+    import asyncpg
+
+
+class SessionRecord(NamedTuple):
+    """A stored session: its state (exactly one of JSON text or binary), a version that every write
+    increments, and the JSON of the last turn played with its response, for answering retries."""
+    state_json: Optional[str]
+    state_bin: Optional[bytes]
+    version: int = 1
+    last_turn: Optional[str] = None
+
+
+# Partitions created ahead of the current one, so inserts never land in the default partition
+PARTITIONS_AHEAD = 2
+
+
+class SessionStore:
+    """Where game sessions live between requests.
+
+    Handlers only see session ids and SessionRecords. create() and update() are conditional writes
+    that report whether they happened: create() needs the session to be absent, update() needs it
+    present and, given `expected_version`, still at that version (compare-and-swap). update_many()
+    is the batched compare-and-swap and put_many() an unconditional batched upsert. Every write
+    refreshes the session's last access time, which delete_expired() uses to reclaim idle sessions.
+    """
+
+    name = "base"
+
+    async def migrate(self):
+        """Creates or upgrades the store's tables; safe to run repeatedly. open() only migrates when the schema is behind."""
+        pass
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def get(self, session_id: uuid.UUID) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    async def get_many(self, session_ids: List[uuid.UUID]) -> Dict[uuid.UUID, SessionRecord]:
+        records = {}
+        for session_id in session_ids:
+            record = await self.get(session_id)
+            if record is not None:
+                records[session_id] = record
+        return records
+
+    async def create(self, session_id: uuid.UUID, record: SessionRecord) -> bool:
+        raise NotImplementedError
+
+    async def update(self, session_id: uuid.UUID, record: SessionRecord, expected_version: Optional[int] = None) -> bool:
+        raise NotImplementedError
+
+    async def update_many(self, items: List[Tuple[uuid.UUID, SessionRecord, int]]) -> Set[uuid.UUID]:
+        """Compare-and-swap of many (session, record, expected version); returns the sessions written."""
+        written = set()
+        for session_id, record, expected_version in items:
+            if await self.update(session_id, record, expected_version):
+                written.add(session_id)
+        return written
+
+    async def put_many(self, items: List[Tuple[uuid.UUID, SessionRecord]]):
+        raise NotImplementedError
+
+    async def delete(self, session_id: uuid.UUID) -> bool:
+        raise NotImplementedError
+
+    async def log_outcome(self, dataset_version: str, target: str, events_json: str, questions_asked: Optional[int] = None):
+        """Records a won game for likelihood.py; `questions_asked` lets readers check that the events cover the whole game."""
+        raise NotImplementedError
+
+    async def delete_expired(self, ttl: float, limit: int) -> int:
+        """Deletes up to `limit` sessions idle for more than `ttl` seconds, oldest first."""
+        raise NotImplementedError
+
+    async def maintain(self, ttl: float) -> int:
+        """Backend housekeeping before a janitor sweep; returns the rows it reclaimed."""
+        return 0
+
+    async def size(self) -> Dict[str, int]:
+        """{"bytes", "rows", "partitions"}, estimated where counting would be expensive."""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in a dict; for benchmarks, tests and single-process deployments that can lose games on restart."""
+
+    name = "memory"
+
+    def __init__(self):
+        # Ordered by last access, oldest first
+        self._sessions: "OrderedDict[uuid.UUID, Tuple[SessionRecord, float]]" = OrderedDict()
+        self.outcomes: List[Tuple[str, str, str, Optional[int]]] = []
+
+    def _write(self, session_id: uuid.UUID, record: SessionRecord):
+        self._sessions[session_id] = (record, time.time())
+        self._sessions.move_to_end(session_id)
+
+    async def get(self, session_id: uuid.UUID) -> Optional[SessionRecord]:
+        entry = self._sessions.get(session_id)
+        return entry[0] if entry is not None else None
+
+    async def create(self, session_id: uuid.UUID, record: SessionRecord) -> bool:
+        if session_id in self._sessions:
+            return False
+        self._write(session_id, record)
+        return True
+
+    async def update(self, session_id: uuid.UUID, record: SessionRecord, expected_version: Optional[int] = None) -> bool:
+        entry = self._sessions.get(session_id)
+        if entry is None or (expected_version is not None and entry[0].version != expected_version):
+            return False
+        self._write(session_id, record)
+        return True
+
+    async def put_many(self, items: List[Tuple[uuid.UUID, SessionRecord]]):
+        for session_id, record in items:
+            self._write(session_id, record)
+
+    async def delete(self, session_id: uuid.UUID) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    async def log_outcome(self, dataset_version: str, target: str, events_json: str, questions_asked: Optional[int] = None):
+        self.outcomes.append((dataset_version, target, events_json, questions_asked))
+
+    async def delete_expired(self, ttl: float, limit: int) -> int:
+        cutoff = time.time() - ttl
+        deleted = 0
+        while self._sessions and deleted < limit:
+            session_id, (_, last_accessed) = next(iter(self._sessions.items()))
+            if last_accessed >= cutoff:
+                break
+            del self._sessions[session_id]
+            deleted += 1
+        return deleted
+
+    async def size(self) -> Dict[str, int]:
+        state_bytes = sum(len(record.state_json or "") + len(record.state_bin or b"") for record, _ in self._sessions.values())
+        return {"bytes": state_bytes, "rows": len(self._sessions), "partitions": 0}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in an embedded SQLite file, for single-node deployments without Postgres.
+
+    All statements run on one background thread, so the event loop never waits on disk.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "data/sessions.db", auto_migrate: bool = True):
+        self.path = path
+        self.auto_migrate = auto_migrate
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        if self._db is not None:
+            return
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="sqlite-sessions")
+        await self._run(self._open)
+
+    async def migrate(self):
+        db = sqlite3.connect(self.path)
+        try:
+            self._migrate(db)
+        finally:
+            db.close()
+
+    def _open(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+        """)
+        if not self._schema_current(self._db):
+            if not self.auto_migrate:
+                raise RuntimeError(f"Session tables in {self.path} are missing or outdated; run `python session_store.py --migrate` first.")
+            print(f"ℹ️ Migrating the session tables in {self.path}.")
+            self._migrate(self._db)
+
+    @staticmethod
+    def _schema_current(db: sqlite3.Connection) -> bool:
+        sessions = {row[1] for row in db.execute("PRAGMA table_info(game_sessions)")}
+        outcomes = {row[1] for row in db.execute("PRAGMA table_info(game_outcomes)")}
+        return {"akinator_state_bin", "version", "last_turn"} <= sessions and {"target", "questions_asked"} <= outcomes
+
+    @staticmethod
+    def _migrate(db: sqlite3.Connection):
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS game_sessions (
+                session_id TEXT PRIMARY KEY,
+                akinator_state TEXT,
+                akinator_state_bin BLOB,
+                last_accessed REAL NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1,
+                last_turn TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_last_accessed ON game_sessions (last_accessed);
+            CREATE TABLE IF NOT EXISTS game_outcomes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dataset_version TEXT NOT NULL,
+                target TEXT NOT NULL,
+                events TEXT NOT NULL,
+                questions_asked INTEGER,
+                finished_at REAL NOT NULL
+            );
+        """)
+        columns = {row[1] for row in db.execute("PRAGMA table_info(game_sessions)")}
+        if "version" not in columns:
+            db.executescript("""
+                ALTER TABLE game_sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+                ALTER TABLE game_sessions ADD COLUMN last_turn TEXT;
+            """)
+        if "questions_asked" not in {row[1] for row in db.execute("PRAGMA table_info(game_outcomes)")}:
+            db.execute("ALTER TABLE game_outcomes ADD COLUMN questions_asked INTEGER")
+
+    async def close(self):
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def get(self, session_id: uuid.UUID) -> Optional[SessionRecord]:
+        records = await self.get_many([session_id])
+        return records.get(session_id)
+
+    async def get_many(self, session_ids: List[uuid.UUID]) -> Dict[uuid.UUID, SessionRecord]:
+        return await self._run(self._get_many, session_ids)
+
+    def _get_many(self, session_ids: List[uuid.UUID]) -> Dict[uuid.UUID, SessionRecord]:
+        by_key = {str(session_id): session_id for session_id in session_ids}
+        keys = list(by_key)
+        records = {}
+        # Stays below SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT session_id, akinator_state, akinator_state_bin, version, last_turn FROM game_sessions WHERE session_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for key, *record in rows:
+                records[by_key[key]] = SessionRecord(*record)
+        return records
+
+    async def create(self, session_id: uuid.UUID, record: SessionRecord) -> bool:
+        return await self._run(self._write, """
+            INSERT OR IGNORE INTO game_sessions (session_id, akinator_state, akinator_state_bin, version, last_turn, last_accessed)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (str(session_id), *record, time.time()))
+
+    async def update(self, session_id: uuid.UUID, record: SessionRecord, expected_version: Optional[int] = None) -> bool:
+        written = await self.update_many([(session_id, record, expected_version)])
+        return session_id in written
+
+    async def update_many(self, items: List[Tuple[uuid.UUID, SessionRecord, Optional[int]]]) -> Set[uuid.UUID]:
+        return await self._run(self._update_many, items, time.time())
+
+    def _update_many(self, items: List[Tuple[uuid.UUID, SessionRecord, Optional[int]]], now: float) -> Set[uuid.UUID]:
+        written = set()
+        with self._db:
+            for session_id, record, expected_version in items:
+                cursor = self._db.execute(
+                    """
+                    UPDATE game_sessions SET akinator_state = ?, akinator_state_bin = ?, version = ?, last_turn = ?, last_accessed = ?
+                    WHERE session_id = ? AND (? IS NULL OR version = ?)
+                    """,
+                    (*record, now, str(session_id), expected_version, expected_version)
+                )
+                if cursor.rowcount > 0:
+                    written.add(session_id)
+        return written
+
+    def _write(self, sql: str, params: Tuple) -> bool:
+        with self._db:
+            return self._db.execute(sql, params).rowcount > 0
+
+    async def put_many(self, items: List[Tuple[uuid.UUID, SessionRecord]]):
+        now = time.time()
+        await self._run(self._put_many, [(str(session_id), *record, now) for session_id, record in items])
+
+    def _put_many(self, rows: List[Tuple]):
+        with self._db:
+            self._db.executemany(
+                """
+                INSERT INTO game_sessions (session_id, akinator_state, akinator_state_bin, version, last_turn, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET akinator_state = excluded.akinator_state,
+                    akinator_state_bin = excluded.akinator_state_bin, version = excluded.version,
+                    last_turn = excluded.last_turn, last_accessed = excluded.last_accessed
+                """,
+                rows
+            )
+
+    async def delete(self, session_id: uuid.UUID) -> bool:
+        return await self._run(self._write, "DELETE FROM game_sessions WHERE session_id = ?", (str(session_id),))
+
+    async def log_outcome(self, dataset_version: str, target: str, events_json: str, questions_asked: Optional[int] = None):
+        await self._run(self._write, "INSERT INTO game_outcomes (dataset_version, target, events, questions_asked, finished_at) VALUES (?, ?, ?, ?, ?)",
+                        (dataset_version, target, events_json, questions_asked, time.time()))
+
+    async def delete_expired(self, ttl: float, limit: int) -> int:
+        return await self._run(self._delete_expired, time.time() - ttl, limit)
+
+    def _delete_expired(self, cutoff: float, limit: int) -> int:
+        with self._db:
+            return self._db.execute(
+                """
+                DELETE FROM game_sessions WHERE session_id IN (
+                    SELECT session_id FROM game_sessions WHERE last_accessed < ? ORDER BY last_accessed LIMIT ?
+                )
+                """,
+                (cutoff, limit)
+            ).rowcount
+
+    async def size(self) -> Dict[str, int]:
+        return await self._run(self._size)
+
+    def _size(self) -> Dict[str, int]:
+        page_count = self._db.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        rows = self._db.execute("SELECT COUNT(*) FROM game_sessions").fetchone()[0]
+        return {"bytes": page_count * page_size, "rows": rows, "partitions": 0}
+
+
+class PostgresSessionStore(SessionStore):
+    """Sessions in the game_sessions table of Postgres, shared by every API replica.
+
+    With `partitioned`, a new game_sessions table is range partitioned on last_accessed in blocks of
+    `partition_hours`; maintain() creates upcoming partitions and drops whole partitions that are past
+    the ttl, so delete_expired() only has to clean up the partition at the cutoff.
+    """
+
+    name = "postgres"
+
+    UPSERT_SESSIONS = """
+        INSERT INTO game_sessions (session_id, akinator_state, akinator_state_bin, version, last_turn, last_accessed)
+        SELECT s.session_id, s.akinator_state, s.akinator_state_bin, s.version, s.last_turn, NOW()
+        FROM unnest($1::uuid[], $2::jsonb[], $3::bytea[], $4::bigint[], $5::jsonb[])
+            AS s(session_id, akinator_state, akinator_state_bin, version, last_turn)
+        ON CONFLICT (session_id) DO UPDATE SET akinator_state = EXCLUDED.akinator_state,
+            akinator_state_bin = EXCLUDED.akinator_state_bin, version = EXCLUDED.version,
+            last_turn = EXCLUDED.last_turn, last_accessed = EXCLUDED.last_accessed
+    """
+    # A partitioned table has no unique index on session_id alone, so ON CONFLICT cannot be used;
+    # write-behind only writes sessions owned by this process, so update-then-insert is safe
+    UPSERT_PARTITIONED_SESSIONS = """
+        WITH s AS (
+            SELECT * FROM unnest($1::uuid[], $2::jsonb[], $3::bytea[], $4::bigint[], $5::jsonb[])
+                AS s(session_id, akinator_state, akinator_state_bin, version, last_turn)
+        ), updated AS (
+            UPDATE game_sessions g SET akinator_state = s.akinator_state, akinator_state_bin = s.akinator_state_bin,
+                version = s.version, last_turn = s.last_turn, last_accessed = NOW()
+            FROM s WHERE g.session_id = s.session_id
+            RETURNING g.session_id
+        )
+        INSERT INTO game_sessions (session_id, akinator_state, akinator_state_bin, version, last_turn, last_accessed)
+        SELECT s.session_id, s.akinator_state, s.akinator_state_bin, s.version, s.last_turn, NOW()
+        FROM s WHERE s.session_id NOT IN (SELECT session_id FROM updated)
+    """
+    # Compare-and-swap: only rows still at their expected version are written
+    UPDATE_SESSIONS_IF_VERSION = """
+        UPDATE game_sessions g SET akinator_state = s.akinator_state, akinator_state_bin = s.akinator_state_bin,
+            version = s.version, last_turn = s.last_turn, last_accessed = NOW()
+        FROM unnest($1::uuid[], $2::jsonb[], $3::bytea[], $4::bigint[], $5::jsonb[], $6::bigint[])
+            AS s(session_id, akinator_state, akinator_state_bin, version, last_turn, expected_version)
+        WHERE g.session_id = s.session_id AND (s.expected_version IS NULL OR g.version = s.expected_version)
+        RETURNING g.session_id
+    """
+
+    def __init__(self, database_url: str, partitioned: bool = False, partition_hours: int = 24, auto_migrate: bool = True):
+        self.database_url = database_url
+        self.partitioned = partitioned
+        self.partition_hours = partition_hours
+        self.auto_migrate = auto_migrate
+        self.pool: Optional["asyncpg.Pool"] = None
+
+    @asynccontextmanager
+    async def _connection(self):
+        """A pooled connection; the wait for it is recorded as the "db_acquire" stage."""
+        start = time.perf_counter()
+        async with self.pool.acquire() as connection:
+            observe_stage("db_acquire", time.perf_counter() - start)
+            yield connection
+
+    async def open(self):
+        if self.pool is not None:
+            return
+        import asyncpg
+
+        pool = await asyncpg.create_pool(self.database_url)
+        try:
+            async with pool.acquire() as connection:
+                if not await self._schema_current(connection):
+                    if not self.auto_migrate:
+                        raise RuntimeError("Session tables are missing or outdated; run `python session_store.py --migrate` first.")
+                    print("ℹ️ Migrating the session tables.")
+                    await self._migrate(connection)
+
+                relkind = await connection.fetchval("SELECT relkind FROM pg_class WHERE oid = 'game_sessions'::regclass")
+                if self.partitioned and relkind != "p":
+                    print("🔴 game_sessions exists without partitions; expiring it with batched deletes only.")
+                    self.partitioned = False
+                if self.partitioned and self.auto_migrate:
+                    await self._create_partitions(connection)
+                elif self.partitioned:
+                    # No DDL without auto_migrate; rows land in the default partition until --migrate or the janitor adds them
+                    missing = await self._missing_partitions(connection)
+                    if missing:
+                        print(f"🔴 Upcoming session partitions are missing ({', '.join(missing)}); run `python session_store.py --migrate` or let the janitor create them.")
+        except BaseException:
+            await pool.close()
+            raise
+        self.pool = pool
+
+    async def migrate(self):
+        import asyncpg
+
+        connection = await asyncpg.connect(self.database_url)
+        try:
+            await self._migrate(connection)
+        finally:
+            await connection.close()
+
+    @staticmethod
+    async def _schema_current(connection: "asyncpg.Connection") -> bool:
+        """One catalog query instead of the DDL: whether the columns of the latest migration exist."""
+        found = await connection.fetchval("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND ((table_name = 'game_sessions' AND column_name IN ('akinator_state_bin', 'version', 'last_turn'))
+                   OR (table_name = 'game_outcomes' AND column_name IN ('target', 'questions_asked')))
+        """)
+        return found == 5
+
+    async def _migrate(self, connection: "asyncpg.Connection"):
+        # Create tables if they don't exist
+        if self.partitioned:
+            await connection.execute("""
+                CREATE TABLE IF NOT EXISTS game_sessions (
+                    session_id UUID NOT NULL,
+                    akinator_state JSONB,
+                    akinator_state_bin BYTEA,
+                    version BIGINT NOT NULL DEFAULT 1,
+                    last_turn JSONB,
+                    last_accessed TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+                    PRIMARY KEY (session_id, last_accessed)
+                ) PARTITION BY RANGE (last_accessed);
+                CREATE TABLE IF NOT EXISTS game_sessions_default PARTITION OF game_sessions DEFAULT;
+            """)
+
+        await connection.execute("""
+            CREATE TABLE IF NOT EXISTS game_sessions (
+                session_id UUID PRIMARY KEY,
+                akinator_state JSONB NOT NULL,
+                last_accessed TIMESTAMPTZ DEFAULT NOW() NOT NULL
+            );
+        """)
+
+        await connection.execute("""
+            CREATE INDEX IF NOT EXISTS idx_last_accessed ON game_sessions (last_accessed);
+        """)
+
+        # Answers of won games, labelled with the confirmed character
+        await connection.execute("""
+            CREATE TABLE IF NOT EXISTS game_outcomes (
+                id BIGSERIAL PRIMARY KEY,
+                dataset_version TEXT NOT NULL,
+                target TEXT NOT NULL,
+                events JSONB NOT NULL,
+                finished_at TIMESTAMPTZ DEFAULT NOW() NOT NULL
+            );
+        """)
+
+        # Compact binary state; legacy rows keep their JSONB state until their next write
+        await connection.execute("""
+            ALTER TABLE game_sessions ADD COLUMN IF NOT EXISTS akinator_state_bin BYTEA;
+            ALTER TABLE game_sessions ALTER COLUMN akinator_state DROP NOT NULL;
+        """)
+
+        # Optimistic concurrency: writes compare-and-swap on version; last_turn answers retried requests
+        await connection.execute("""
+            ALTER TABLE game_sessions ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 1;
+            ALTER TABLE game_sessions ADD COLUMN IF NOT EXISTS last_turn JSONB;
+        """)
+
+        # Questions the game asked, so readers can skip outcomes whose events do not cover the whole game
+        await connection.execute("""
+            ALTER TABLE game_outcomes ADD COLUMN IF NOT EXISTS questions_asked INTEGER;
+        """)
+
+        # Upcoming partitions; the janitor keeps creating them from here on
+        if self.partitioned and await connection.fetchval("SELECT relkind FROM pg_class WHERE oid = 'game_sessions'::regclass") == "p":
+            await self._create_partitions(connection)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def get(self, session_id: uuid.UUID) -> Optional[SessionRecord]:
+        async with self._connection() as connection:
+            row = await connection.fetchrow(
+                "SELECT akinator_state, akinator_state_bin, version, last_turn FROM game_sessions WHERE session_id = $1", session_id
+            )
+        return SessionRecord(row['akinator_state'], row['akinator_state_bin'], row['version'], row['last_turn']) if row else None
+
+    async def get_many(self, session_ids: List[uuid.UUID]) -> Dict[uuid.UUID, SessionRecord]:
+        async with self._connection() as connection:
+            rows = await connection.fetch(
+                "SELECT session_id, akinator_state, akinator_state_bin, version, last_turn FROM game_sessions WHERE session_id = ANY($1::uuid[])",
+                session_ids
+            )
+        return {row['session_id']: SessionRecord(row['akinator_state'], row['akinator_state_bin'], row['version'], row['last_turn']) for row in rows}
+
+    async def create(self, session_id: uuid.UUID, record: SessionRecord) -> bool:
+        async with self._connection() as connection:
+            status = await connection.execute(
+                """
+                INSERT INTO game_sessions (session_id, akinator_state, akinator_state_bin, version, last_turn, last_accessed)
+                VALUES ($1, $2, $3, $4, $5, NOW())
+                ON CONFLICT DO NOTHING
+                """,
+                session_id, *record
+            )
+        return status.split()[-1] != "0"
+
+    async def update(self, session_id: uuid.UUID, record: SessionRecord, expected_version: Optional[int] = None) -> bool:
+        async with self._connection() as connection:
+            status = await connection.execute(
+                """
+                UPDATE game_sessions SET akinator_state = $1, akinator_state_bin = $2, version = $3, last_turn = $4, last_accessed = NOW()
+                WHERE session_id = $5 AND ($6::bigint IS NULL OR version = $6)
+                """,
+                *record, session_id, expected_version
+            )
+        return status.split()[-1] != "0"
+
+    async def update_many(self, items: List[Tuple[uuid.UUID, SessionRecord, Optional[int]]]) -> Set[uuid.UUID]:
+        if not items:
+            return set()
+        columns = [list(column) for column in zip(*((session_id, *record, expected) for session_id, record, expected in items))]
+        async with self._connection() as connection:
+            rows = await connection.fetch(self.UPDATE_SESSIONS_IF_VERSION, *columns)
+        return {row['session_id'] for row in rows}
+
+    async def put_many(self, items: List[Tuple[uuid.UUID, SessionRecord]]):
+        columns = [list(column) for column in zip(*((session_id, *record) for session_id, record in items))]
+        async with self._connection() as connection:
+            await connection.execute(self.UPSERT_PARTITIONED_SESSIONS if self.partitioned else self.UPSERT_SESSIONS, *columns)
+
+    async def delete(self, session_id: uuid.UUID) -> bool:
+        async with self._connection() as connection:
+            status = await connection.execute("DELETE FROM game_sessions WHERE session_id = $1", session_id)
+        return status.split()[-1] != "0"
+
+    async def log_outcome(self, dataset_version: str, target: str, events_json: str, questions_asked: Optional[int] = None):
+        async with self._connection() as connection:
+            await connection.execute(
+                "INSERT INTO game_outcomes (dataset_version, target, events, questions_asked) VALUES ($1, $2, $3, $4)",
+                dataset_version, target, events_json, questions_asked
+            )
+
+    async def delete_expired(self, ttl: float, limit: int) -> int:
+        # Walks idx_last_accessed and skips rows locked by live requests (or another replica's janitor)
+        async with self._connection() as connection:
+            status = await connection.execute(
+                """
+                DELETE FROM game_sessions WHERE (session_id, last_accessed) IN (
+                    SELECT session_id, last_accessed FROM game_sessions
+                    WHERE last_accessed < NOW() - make_interval(secs => $1)
+                    ORDER BY last_accessed
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                ttl, limit
+            )
+        return int(status.split()[-1])
+
+    async def maintain(self, ttl: float) -> int:
+        if not self.partitioned:
+            return 0
+        async with self._connection() as connection:
+            await self._create_partitions(connection)
+            return await self._drop_partitions(connection, ttl)
+
+    def _partition_starts(self, now: datetime) -> List[datetime]:
+        block = timedelta(hours=self.partition_hours)
+        epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+        current = epoch + block * ((now - epoch) // block)
+        return [current + block * i for i in range(PARTITIONS_AHEAD + 1)]
+
+    @staticmethod
+    def _partition_name(start: datetime) -> str:
+        return f"game_sessions_p{start:%Y%m%d%H}"
+
+    async def _missing_partitions(self, connection: "asyncpg.Connection") -> List[str]:
+        """Names of the upcoming partitions that do not exist yet; a catalog read only."""
+        names = [self._partition_name(start) for start in self._partition_starts(datetime.now(timezone.utc))]
+        existing = await connection.fetch(
+            """
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'game_sessions'::regclass AND c.relname = ANY($1::text[])
+            """,
+            names
+        )
+        found = {row["relname"] for row in existing}
+        return [name for name in names if name not in found]
+
+    async def _create_partitions(self, connection: "asyncpg.Connection"):
+        import asyncpg
+
+        block = timedelta(hours=self.partition_hours)
+        for start in self._partition_starts(datetime.now(timezone.utc)):
+            name = self._partition_name(start)
+            try:
+                await connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF game_sessions "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{(start + block).isoformat()}')"
+                )
+            except asyncpg.PostgresError as e:
+                # E.g. rows for this range already went to the default partition; they expire by batched deletes
+                print(f"🔴 Could not create session partition {name}: {e}")
+
+    async def _drop_partitions(self, connection: "asyncpg.Connection", ttl: float) -> int:
+        """Drops every partition whose upper bound is past the ttl; returns the (estimated) rows they held."""
+        expired = await connection.fetch(
+            """
+            SELECT c.relname, GREATEST(c.reltuples, 0)::bigint AS rows FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'game_sessions'::regclass
+              AND (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \\(''([^'']+)''\\)'))[1]::timestamptz
+                  <= NOW() - make_interval(secs => $1)
+            """,
+            ttl
+        )
+        reclaimed = 0
+        for row in expired:
+            await connection.execute(f'DROP TABLE IF EXISTS "{row["relname"]}"')
+            reclaimed += row["rows"]
+        return reclaimed
+
+    async def size(self) -> Dict[str, int]:
+        async with self._connection() as connection:
+            row = await connection.fetchrow(
+                """
+                SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0)::bigint AS bytes,
+                       COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint AS rows,
+                       COUNT(*) FILTER (WHERE c.relispartition) AS partitions
+                FROM pg_class c
+                WHERE c.oid = 'game_sessions'::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'game_sessions'::regclass)
+                """
+            )
+        return {"bytes": row["bytes"], "rows": row["rows"], "partitions": row["partitions"]}
+
+
+def create_session_store(name: str, database_url: str = "", sqlite_path: str = "data/sessions.db",
+                         partitioned: bool = False, partition_hours: int = 24, auto_migrate: bool = True) -> SessionStore:
+    if name == "memory":
+        return MemorySessionStore()
+    if name == "sqlite":
+        return SQLiteSessionStore(sqlite_path, auto_migrate=auto_migrate)
+    if name == "postgres":
+        return PostgresSessionStore(database_url, partitioned=partitioned, partition_hours=partition_hours, auto_migrate=auto_migrate)
+    raise ValueError(f"Unknown session store '{name}'. Use 'memory', 'sqlite' or 'postgres'.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or upgrade the session tables, once per deploy instead of at every startup.")
+    parser.add_argument("--migrate", action="store_true", required=True)
+    parser.add_argument("--store", default="postgres", help="'postgres' or 'sqlite'")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL", ""))
+    parser.add_argument("--sqlite-path", default="data/sessions.db")
+    parser.add_argument("--partitioned", action="store_true", help="Create a new game_sessions table range partitioned on last_accessed")
+    parser.add_argument("--partition-hours", type=int, default=24)
+    args = parser.parse_args()
+
+    store = create_session_store(args.store, database_url=args.database_url, sqlite_path=args.sqlite_path,
+                                 partitioned=args.partitioned, partition_hours=args.partition_hours)
+    start = time.perf_counter()
+    asyncio.run(store.migrate())
+    print(f"✅ Migrated the {store.name} session tables in {time.perf_counter() - start:.2f}s.")
@@ -0,0 +1,203 @@
+import sys
+import json
+import math
+import time
+import random
+import argparse
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from algorithm import Akinator
+from knowledge_base import KnowledgeBase, get_knowledge_base
+from likelihood import get_likelihood_model
+from opening_book import get_opening_book
+from stopping import get_stopping_policy
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def noisy_answer(value: float, rng: random.Random, probably_rate: float, wrong_rate: float) -> float:
+    """The answer a player gives for a stored value, flipped to the opposite or softened to "probably" at the given rates."""
+    truth = 1.0 if value >= 0.5 else 0.0
+    roll = rng.random()
+    if roll < wrong_rate:
+        return 1.0 - truth
+    if roll < wrong_rate + probably_rate:
+        return 0.75 if truth else 0.25
+    return truth
+
+
+class SelfPlay:
+    """Plays headless games against characters of the knowledge base through the same calls the API makes."""
+
+    def __init__(self, kb: KnowledgeBase, engine: str = "python", probably_rate: float = 0.0, wrong_rate: float = 0.0,
+                 seed: int = 0, max_turns: int = 100, opening_book=None, lookahead_depth: int = 0,
+                 likelihood=None, stopping=None):
+        self.kb = kb
+        self.engine = engine
+        self.probably_rate = probably_rate
+        self.wrong_rate = wrong_rate
+        self.seed = seed
+        self.max_turns = max_turns
+        self.opening_book = opening_book
+        self.lookahead_depth = lookahead_depth
+        self.likelihood = likelihood
+        self.stopping = stopping
+        self.latencies: Dict[str, List[float]] = {"start_game": [], "process_answer": [], "process_mistaken_guess": []}
+
+    def _timed(self, name: str, call, *args) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response = call(*args)
+        self.latencies[name].append(time.perf_counter() - start)
+        return response
+
+    def play(self, target: str, rng: random.Random) -> Dict[str, Any]:
+        game = Akinator(knowledge_base=self.kb, engine=self.engine, seed=rng.getrandbits(32), opening_book=self.opening_book,
+                        lookahead_depth=self.lookahead_depth, likelihood=self.likelihood, stopping=self.stopping)
+        target_attrs = self.kb.people_attrs_map[target]
+
+        response = self._timed("start_game", game.start_game)
+        wrong_guesses = 0
+        for _ in range(self.max_turns):
+            status = response["status"]
+            if status == "playing":
+                answer = noisy_answer(target_attrs.get(response["attribute_key"], 0), rng, self.probably_rate, self.wrong_rate)
+                response = self._timed("process_answer", game.process_answer, response["attribute_key"], answer)
+            elif status == "make_guess" and response["guess"] == target:
+                return {"target": target, "won": True, "questions": game.n_questions_asked, "wrong_guesses": wrong_guesses,
+                        "events": game.events}
+            elif status == "make_guess":
+                wrong_guesses += 1
+                response = self._timed("process_mistaken_guess", game.process_mistaken_guess, response["guess"])
+            else:
+                break
+
+        return {"target": target, "won": False, "questions": game.n_questions_asked, "wrong_guesses": wrong_guesses,
+                "events": game.events}
+
+    def run(self, rounds: int = 1, characters: Optional[int] = None) -> Dict[str, Any]:
+        rng = random.Random(self.seed)
+        targets = list(self.kb.people[:characters] if characters else self.kb.people)
+
+        start = time.perf_counter()
+        self.games = [self.play(target, rng) for _ in range(rounds) for target in targets]
+        elapsed = time.perf_counter() - start
+        return self.report(self.games, elapsed)
+
+    def write_outcomes(self, path: str):
+        """Writes the played games as {"target", "events", "questions_asked"} lines, the training input of likelihood.py."""
+        with open(path, 'w') as f:
+            for game in self.games:
+                f.write(json.dumps({"target": game["target"], "events": game["events"], "questions_asked": game["questions"]}) + "\n")
+
+    def report(self, games: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        won = [game for game in games if game["won"]]
+        questions = [game["questions"] for game in won]
+        turns = [t for name in ("process_answer", "process_mistaken_guess") for t in self.latencies[name]]
+
+        def latency(values: List[float]) -> Dict[str, float]:
+            return {"count": len(values), "p50_ms": percentile(values, 50) * 1000, "p99_ms": percentile(values, 99) * 1000}
+
+        return {
+            "config": {
+                "dataset_version": self.kb.version,
+                "people": len(self.kb.people),
+                "attributes": len(self.kb.attrs),
+                "engine": self.engine,
+                "probably_rate": self.probably_rate,
+                "wrong_rate": self.wrong_rate,
+                "seed": self.seed,
+                "opening_book": self.opening_book is not None,
+                "lookahead_depth": self.lookahead_depth,
+                "likelihood": self.likelihood.version if self.likelihood is not None else None,
+            },
+            "games": len(games),
+            "accuracy": len(won) / len(games) if games else 0.0,
+            "wrong_guesses_per_game": sum(game["wrong_guesses"] for game in games) / len(games) if games else 0.0,
+            "questions_to_guess": {
+                "mean": sum(questions) / len(questions) if questions else 0.0,
+                "p50": percentile(questions, 50),
+                "p90": percentile(questions, 90),
+                "max": max(questions, default=0),
+                "histogram": {str(n): count for n, count in sorted(Counter(questions).items())},
+            },
+            "latency": {
+                "turn": latency(turns),
+                **{name: latency(values) for name, values in self.latencies.items()},
+            },
+            "elapsed_s": elapsed,
+        }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_accuracy_drop: float, max_latency_increase: float) -> List[str]:
+    """Returns the regressions of report against baseline; empty when it is within the allowed margins."""
+    regressions = []
+    accuracy_drop = baseline["accuracy"] - report["accuracy"]
+    if accuracy_drop > max_accuracy_drop:
+        regressions.append(f"accuracy dropped from {baseline['accuracy']:.3f} to {report['accuracy']:.3f}")
+
+    for pct in ("p50_ms", "p99_ms"):
+        before, after = baseline["latency"]["turn"][pct], report["latency"]["turn"][pct]
+        if before > 0 and after > before * (1 + max_latency_increase):
+            regressions.append(f"turn latency {pct} rose from {before:.3f}ms to {after:.3f}ms")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the guessing engine with headless self-play.")
+    parser.add_argument("--dataset", default="data/characters_data.json")
+    parser.add_argument("--questions", default="data/questions.json")
+    parser.add_argument("--storage", default="dict")
+    parser.add_argument("--engine", default="python")
+    parser.add_argument("--opening-book", default=None, help="Path of an opening book built with opening_book.py")
+    parser.add_argument("--lookahead-depth", type=int, default=0)
+    parser.add_argument("--likelihood", default=None, help="Path of a likelihood model fitted with likelihood.py")
+    parser.add_argument("--stopping-policy", default=None, help="Path of a stopping policy saved by stopping.py")
+    parser.add_argument("--outcomes-out", default=None, help="Also write the played games for fitting likelihood.py")
+    parser.add_argument("--rounds", type=int, default=1, help="Games played against each character")
+    parser.add_argument("--characters", type=int, default=None, help="Only play against the first N characters")
+    parser.add_argument("--probably-rate", type=float, default=0.1, help="Share of answers softened to probably / probably not")
+    parser.add_argument("--wrong-rate", type=float, default=0.05, help="Share of answers flipped to the wrong answer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON report to check for regressions")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.02)
+    parser.add_argument("--max-latency-increase", type=float, default=0.25, help="Allowed relative rise of turn latency")
+    args = parser.parse_args()
+
+    kb = get_knowledge_base(args.dataset, args.questions, storage=args.storage)
+    book = get_opening_book(args.opening_book, kb) if args.opening_book else None
+    likelihood = get_likelihood_model(args.likelihood, kb) if args.likelihood else None
+    stopping = get_stopping_policy(args.stopping_policy, kb) if args.stopping_policy else None
+    simulator = SelfPlay(kb, engine=args.engine, probably_rate=args.probably_rate, wrong_rate=args.wrong_rate,
+                         seed=args.seed, opening_book=book, lookahead_depth=args.lookahead_depth,
+                         likelihood=likelihood, stopping=stopping)
+    report = simulator.run(rounds=args.rounds, characters=args.characters)
+    if args.outcomes_out:
+        simulator.write_outcomes(args.outcomes_out)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        turn = report["latency"]["turn"]
+        print(f"{report['games']} games: accuracy {report['accuracy']:.3f}, "
+              f"{report['questions_to_guess']['mean']:.1f} questions per win, "
+              f"turn p50 {turn['p50_ms']:.3f}ms p99 {turn['p99_ms']:.3f}ms -> {args.out}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.max_accuracy_drop, args.max_latency_increase)
+        for regression in regressions:
+            print(f"🔴 Regression: {regression}")
+        sys.exit(1 if regressions else 0)
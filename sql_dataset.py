@@ -0,0 +1,312 @@
+import sys
+import json
+import asyncio
+import bisect
+import hashlib
+import argparse
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Dict, List, Literal, Mapping, Optional, Tuple
+
+import asyncpg
+
+from bitsets import AttributeBitsets, rows_to_bits
+from knowledge_base import KnowledgeBase, KnowledgeBaseBuilder
+
+# The catalog schema the loader reads. Every edit of a character (its attributes included) must bump
+# characters.updated_at; removals set `deleted` so incremental refreshes see them.
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS characters (
+        name TEXT PRIMARY KEY,
+        updated_at TIMESTAMPTZ DEFAULT NOW() NOT NULL,
+        deleted BOOLEAN DEFAULT FALSE NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_characters_updated_at ON characters (updated_at);
+    CREATE TABLE IF NOT EXISTS character_attributes (
+        character_name TEXT NOT NULL REFERENCES characters (name) ON DELETE CASCADE,
+        attribute TEXT NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (character_name, attribute)
+    );
+"""
+
+# Rows per round trip of the server-side cursor
+FETCH_SIZE = 5000
+# Changes are re-read this far behind the watermark, so transactions that commit late with an older
+# updated_at are not missed; re-applying a character is idempotent
+WATERMARK_OVERLAP = timedelta(seconds=5)
+# Beyond this many runs of unchanged people moved by different offsets (i.e. many scattered inserts and
+# deletes), a bitset refresh rebuilds the columns from the rows instead of shifting the previous ones
+PATCH_MAX_BLOCKS = 64
+
+
+class SqlCatalog:
+    """Character catalog in Postgres, read into a KnowledgeBase without materializing the raw rows.
+
+    People stream over a server-side cursor in name order, one character's attribute rows at a time,
+    straight into a KnowledgeBaseBuilder. refresh() only fetches characters whose updated_at is past
+    the previous load's watermark and patches them into the previous knowledge base: unchanged people
+    keep their rows (dict storage) or have their bits moved over whole runs (bitset storage), so a
+    refresh costs the changed people plus one pass over the names, not the whole catalog. Both paths yield
+    people sorted by name and attributes sorted by key, so every process builds the same base (and
+    version) from the same catalog, however it got there.
+    """
+
+    def __init__(self, database_url: str, fetch_size: int = FETCH_SIZE):
+        self.database_url = database_url
+        self.fetch_size = fetch_size
+
+    async def _stream(self, connection: asyncpg.Connection, since: Optional[datetime]) -> AsyncIterator[Tuple[str, bool, Dict[str, float]]]:
+        """Yields (name, deleted, attributes) for characters updated after `since` (all when None).
+
+        Names come in byte order, which is the order Python sorts them in, so refresh() can merge.
+        """
+        query = """
+            SELECT c.name, c.deleted, a.attribute, a.value
+            FROM characters c LEFT JOIN character_attributes a ON a.character_name = c.name
+            WHERE $1::timestamptz IS NULL OR c.updated_at > $1
+            ORDER BY c.name COLLATE "C"
+        """
+        current, deleted, attributes = None, False, {}
+        async with connection.transaction():
+            async for row in connection.cursor(query, since, prefetch=self.fetch_size):
+                if row['name'] != current:
+                    if current is not None:
+                        yield current, deleted, attributes
+                    current, deleted, attributes = row['name'], row['deleted'], {}
+                if row['attribute'] is not None:
+                    value = row['value']
+                    attributes[row['attribute']] = int(value) if value in (0, 1) else value
+        if current is not None:
+            yield current, deleted, attributes
+
+    async def _summary(self, connection: asyncpg.Connection) -> Tuple[int, Optional[datetime]]:
+        row = await connection.fetchrow("SELECT COUNT(*) FILTER (WHERE NOT deleted) AS live, MAX(updated_at) AS watermark FROM characters")
+        return row['live'], row['watermark']
+
+    @staticmethod
+    def _version(count: int, watermark: Optional[datetime], questions: Dict[str, str]) -> str:
+        digest = hashlib.sha1(f"{count}|{watermark.isoformat() if watermark else ''}|".encode())
+        digest.update(json.dumps(questions, sort_keys=True).encode())
+        return digest.hexdigest()[:12]
+
+    async def load(self, questions: Dict[str, str], storage: Literal["dict", "bitset"] = "dict") -> Tuple[KnowledgeBase, Optional[datetime]]:
+        connection = await asyncpg.connect(self.database_url)
+        try:
+            count, watermark = await self._summary(connection)
+            builder = KnowledgeBaseBuilder(storage)
+            async for name, deleted, attributes in self._stream(connection, None):
+                if not deleted:
+                    builder.add(name, attributes)
+                    if len(builder) % 100000 == 0:
+                        print(f"Loaded {len(builder)} characters from SQL...")
+        finally:
+            await connection.close()
+        return builder.build(questions, self._version(count, watermark, questions), sort_attrs=True), watermark
+
+    async def refresh(self, previous: KnowledgeBase, watermark: Optional[datetime], questions: Dict[str, str],
+                      storage: Literal["dict", "bitset"] = "dict") -> Tuple[KnowledgeBase, Optional[datetime]]:
+        """Returns `previous` if nothing changed, otherwise `previous` with the changed characters patched in."""
+        connection = await asyncpg.connect(self.database_url)
+        try:
+            count, new_watermark = await self._summary(connection)
+            if new_watermark == watermark and count == len(previous.people) and dict(previous.questions) == questions:
+                return previous, watermark
+
+            since = watermark - WATERMARK_OVERLAP if watermark is not None else None
+            changes = {name: (None if deleted else attributes) async for name, deleted, attributes in self._stream(connection, since)}
+        finally:
+            await connection.close()
+
+        people, patched, blocks = _merge(previous.people, changes)
+        if len(people) != count or not people:
+            # Hard deletes, or a change committed behind the overlap window: start over
+            print(f"SQL catalog has {count} characters but the refresh produced {len(people)}; reloading it fully.")
+            return await self.load(questions, storage)
+
+        version = self._version(count, new_watermark, questions)
+        if storage == "dict":
+            kb = _patch_rows(previous, people, patched, changes, questions, version)
+        elif previous.bitsets is not None and len(blocks) <= PATCH_MAX_BLOCKS:
+            kb = _patch_bitsets(previous.bitsets, people, patched, blocks, questions, version)
+        else:
+            builder = KnowledgeBaseBuilder(storage)
+            for row, name in enumerate(people):
+                builder.add(name, patched[row] if row in patched else previous.people_attrs_map[name])
+            kb = builder.build(questions, version, sort_attrs=True)
+        print(f"Refreshed {len(changes)} characters from SQL.")
+        return kb, new_watermark
+
+    async def import_records(self, dataset: List[Dict[str, Any]]):
+        """Copies JSON dataset records into the catalog tables, replacing characters with the same name."""
+        connection = await asyncpg.connect(self.database_url)
+        try:
+            await connection.execute(SCHEMA)
+            async with connection.transaction():
+                names = [person["name"] for person in dataset]
+                await connection.execute("DELETE FROM characters WHERE name = ANY($1::text[])", names)
+                await connection.copy_records_to_table("characters", records=[(name,) for name in names], columns=["name"])
+                await connection.copy_records_to_table(
+                    "character_attributes",
+                    records=((person["name"], attr, float(value)) for person in dataset for attr, value in person["attributes"].items()),
+                    columns=["character_name", "attribute", "value"],
+                )
+        finally:
+            await connection.close()
+
+
+def _merge(previous: Tuple[str, ...], changes: Dict[str, Optional[Dict[str, float]]]) -> Tuple[List[str], Dict[int, Dict[str, float]], List[List[int]]]:
+    """Merges the changed characters (None for deleted ones) into the sorted previous people.
+
+    Returns the new people, the attributes of changed and added people by their new row, and the
+    unchanged people as [old_start, new_start, old_end) blocks of rows that moved by the same offset.
+    """
+    changed = sorted(changes)
+    people: List[str] = []
+    patched: Dict[int, Dict[str, float]] = {}
+    blocks: List[List[int]] = []
+
+    def take(name: str):
+        if changes[name] is not None:
+            patched[len(people)] = changes[name]
+            people.append(name)
+
+    i = 0
+    for old_row, name in enumerate(previous):
+        while i < len(changed) and changed[i] < name:
+            take(changed[i])
+            i += 1
+        if i < len(changed) and changed[i] == name:
+            take(name)
+            i += 1
+            continue
+        if blocks and old_row - blocks[-1][0] == len(people) - blocks[-1][1]:
+            blocks[-1][2] = old_row + 1
+        else:
+            blocks.append([old_row, len(people), old_row + 1])
+        people.append(name)
+    for name in changed[i:]:
+        take(name)
+    return people, patched, blocks
+
+
+def _patch_rows(previous: KnowledgeBase, people: List[str], patched: Dict[int, Dict[str, float]],
+                changes: Mapping[str, Optional[Dict[str, float]]], questions: Mapping[str, str], version: str) -> KnowledgeBase:
+    """Dict storage: unchanged people share their row with `previous`; only changed and added ones get a new row."""
+    rows = [
+        MappingProxyType({sys.intern(attr): value for attr, value in patched[row].items()}) if row in patched
+        else previous.people_attrs_map[name]
+        for row, name in enumerate(people)
+    ]
+    attrs = set(previous.attrs)
+    for attributes in patched.values():
+        attrs.update(attributes)
+    # An attribute can only disappear if a changed or deleted person held it; keep it if anyone still does
+    for attr in {attr for name in changes if name in previous.person_index for attr in previous.people_attrs_map[name]} - {
+            attr for attributes in patched.values() for attr in attributes}:
+        if not any(attr in row for row in rows):
+            attrs.discard(attr)
+
+    attrs = tuple(sorted(sys.intern(attr) for attr in attrs))
+    people = tuple(people)
+    return KnowledgeBase(
+        people=people,
+        attrs=attrs,
+        people_attrs_map=MappingProxyType(dict(zip(people, rows))),
+        questions=MappingProxyType(dict(questions)),
+        person_index=MappingProxyType({name: i for i, name in enumerate(people)}),
+        attr_index=MappingProxyType({attr: i for i, attr in enumerate(attrs)}),
+        version=version,
+    )
+
+
+def _patch_bitsets(previous: AttributeBitsets, people: List[str], patched: Dict[int, Dict[str, float]], blocks: List[List[int]],
+                   questions: Mapping[str, str], version: str) -> KnowledgeBase:
+    """Bitset storage: moves each previous column over the blocks of unchanged rows, then writes the patched rows."""
+    n_people = len(people)
+    keep = ((1 << n_people) - 1) ^ rows_to_bits(patched, n_people)
+
+    def move(bits: int) -> int:
+        moved = 0
+        for old_start, new_start, old_end in blocks:
+            moved |= ((bits >> old_start) & ((1 << (old_end - old_start)) - 1)) << new_start
+        return moved & keep
+
+    starts = [block[0] for block in blocks]
+    yes: Dict[str, int] = {}
+    known: Dict[str, int] = {}
+    fractional: Dict[str, Dict[int, float]] = {}
+    for col, attr in enumerate(previous.attrs):
+        known[attr] = move(previous.known[col])
+        yes[attr] = move(previous.yes[col])
+        for old_row, value in (previous.fractional[col] or {}).items():
+            i = bisect.bisect_right(starts, old_row) - 1
+            if i >= 0 and old_row < blocks[i][2]:
+                row = old_row - blocks[i][0] + blocks[i][1]
+                if row not in patched:
+                    fractional.setdefault(attr, {})[row] = value
+
+    yes_rows: Dict[str, List[int]] = defaultdict(list)
+    known_rows: Dict[str, List[int]] = defaultdict(list)
+    for row, attributes in patched.items():
+        for attr, value in attributes.items():
+            attr = sys.intern(attr)
+            known_rows[attr].append(row)
+            if value == 1:
+                yes_rows[attr].append(row)
+            elif value != 0:
+                fractional.setdefault(attr, {})[row] = value
+    for attr, rows in known_rows.items():
+        known[attr] = known.get(attr, 0) | rows_to_bits(rows, n_people)
+    for attr, rows in yes_rows.items():
+        yes[attr] = yes.get(attr, 0) | rows_to_bits(rows, n_people)
+
+    # Attributes nobody holds any more are dropped, as a full load would never have seen them
+    attrs = tuple(sorted(attr for attr, bits in known.items() if bits))
+    bitsets = AttributeBitsets(n_people, attrs, {attr: i for i, attr in enumerate(attrs)})
+    for col, attr in enumerate(attrs):
+        bitsets.yes[col] = yes.get(attr, 0)
+        bitsets.known[col] = known[attr]
+        if fractional.get(attr):
+            bitsets.fractional[col] = fractional[attr]
+            bitsets.fractional_bits[col] = rows_to_bits(fractional[attr], n_people)
+    return KnowledgeBase.from_bitsets(people, bitsets, questions, version)
+
+
+def run_sync(coroutine):
+    """Runs a loader coroutine to completion, also from a thread that already runs an event loop."""
+    result: Dict[str, Any] = {}
+
+    def target():
+        try:
+            result["value"] = asyncio.run(coroutine)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target, name="sql-catalog")
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the SQL character catalog.")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--import-json", default=None, help="Copy a characters_data.json file into the catalog tables")
+    parser.add_argument("--questions", default="data/questions.json")
+    args = parser.parse_args()
+
+    catalog = SqlCatalog(args.database_url)
+    if args.import_json:
+        with open(args.import_json, 'r') as f:
+            records = json.load(f)
+        asyncio.run(catalog.import_records(records))
+        print(f"Imported {len(records)} characters into the SQL catalog.")
+
+    with open(args.questions, 'r') as f:
+        kb, watermark = asyncio.run(catalog.load(json.load(f)))
+    print(f"SQL catalog {kb.version}: {len(kb.people)} characters, {len(kb.attrs)} traits, updated up to {watermark}")
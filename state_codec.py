@@ -0,0 +1,300 @@
+import sys
+import zlib
+import struct
+from array import array
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from knowledge_base import KnowledgeBase
+
+MAGIC = b"AKS"
+# Version 2 appends the seed and the answer log to the payload; version 1 blobs still decode, without them
+FORMAT_VERSION = 2
+
+FLAG_ZLIB = 1
+FLAG_FLOAT64 = 2
+FLAG_RETRY = 4
+# Set in either format when the dataset id follows the dataset version (blobs from before datasets had ids lack it)
+FLAG_DATASET_ID = 8
+FLAG_STATE_SEED = 16
+
+# magic, format version, flags, questions asked, RANDOMNESS, people, attributes, dataset version length
+_HEADER = struct.Struct("<3sBBHdIIB")
+
+
+class StateVersionMismatch(ValueError):
+    """The state was encoded against a different dataset version than the loaded knowledge base."""
+
+
+def encode_state(state: Dict[str, Any], kb: KnowledgeBase, compress: bool = True,
+                 precision: Literal["float32", "float64"] = "float32") -> bytes:
+    """Packs a get_state() dict into a compact blob aligned to the knowledge base's person and attribute order.
+
+    Probabilities become a float array indexed like kb.people and asked attributes a bitmask over
+    kb.attrs, stamped with kb.version (and kb.dataset_id) so the indexes are never applied to a different dataset.
+    The seed and the events follow in the answer log's encoding, so seeded sampling and the log survive a round trip.
+    """
+    flags = 0
+    probabilities = state.get("probabilities", {})
+    probs = array("d" if precision == "float64" else "f", bytes(len(kb.people) * (8 if precision == "float64" else 4)))
+    for name, prob in probabilities.items():
+        row = kb.person_index.get(name)
+        if row is not None:
+            probs[row] = prob
+
+    asked = bytearray((len(kb.attrs) + 7) // 8)
+    for attr in state.get("asked_attrs", []):
+        col = kb.attr_index.get(attr)
+        if col is not None:
+            asked[col >> 3] |= 1 << (col & 7)
+
+    if precision == "float64":
+        flags |= FLAG_FLOAT64
+    if state.get("RETRY", False):
+        flags |= FLAG_RETRY
+    dataset_id = _dataset_id_bytes(kb)
+    if dataset_id:
+        flags |= FLAG_DATASET_ID
+    seed = state.get("seed")
+    if seed is not None:
+        flags |= FLAG_STATE_SEED
+
+    if sys.byteorder == "big":
+        probs.byteswap()
+    tail = bytearray()
+    if seed is not None:
+        tail += _seed_bytes(seed)
+    _write_events(tail, state.get("events", []), kb)
+    payload = probs.tobytes() + bytes(asked) + bytes(tail)
+    if compress:
+        flags |= FLAG_ZLIB
+        payload = zlib.compress(payload)
+
+    version = kb.version.encode("ascii")
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, flags, state.get("n_questions_asked", 0), state.get("RANDOMNESS", 0.5),
+                          len(kb.people), len(kb.attrs), len(version))
+    return header + version + dataset_id + payload
+
+
+def decode_state(blob: bytes, kb: KnowledgeBase) -> Dict[str, Any]:
+    """Inverse of encode_state, returning a dict that Akinator._load_state accepts."""
+    blob = bytes(blob)
+    if len(blob) < _HEADER.size:
+        raise ValueError("State blob is truncated.")
+
+    magic, format_version, flags, n_questions_asked, randomness, n_people, n_attrs, version_len = _HEADER.unpack_from(blob)
+    if magic != MAGIC or format_version not in (1, FORMAT_VERSION):
+        raise ValueError(f"Unsupported state format: {magic!r} v{format_version}.")
+
+    offset = _HEADER.size
+    version = blob[offset:offset + version_len].decode("ascii")
+    if version != kb.version or n_people != len(kb.people) or n_attrs != len(kb.attrs):
+        raise StateVersionMismatch(f"State was encoded for dataset version '{version}', but '{kb.version}' is loaded.")
+    offset += version_len
+    if flags & FLAG_DATASET_ID:
+        _, offset = _read_name(blob, offset)
+
+    payload = blob[offset:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+
+    probs = array("d" if flags & FLAG_FLOAT64 else "f")
+    probs_size = n_people * probs.itemsize
+    probs.frombytes(payload[:probs_size])
+    if sys.byteorder == "big":
+        probs.byteswap()
+    asked_size = (n_attrs + 7) // 8
+    asked = payload[probs_size:probs_size + asked_size]
+
+    state = {
+        "probabilities": dict(zip(kb.people, probs.tolist())),
+        "asked_attrs": [attr for col, attr in enumerate(kb.attrs) if asked[col >> 3] >> (col & 7) & 1],
+        "n_questions_asked": n_questions_asked,
+        "RANDOMNESS": randomness,
+        "RETRY": bool(flags & FLAG_RETRY),
+    }
+    if format_version >= 2:
+        offset = probs_size + asked_size
+        seed = None
+        if flags & FLAG_STATE_SEED:
+            seed = _SEED.unpack_from(payload, offset)[0]
+            offset += _SEED.size
+        state["events"] = _read_events(payload, offset, kb)
+        state["seed"] = seed
+    return state
+
+
+LOG_MAGIC = b"AKL"
+LOG_FORMAT_VERSION = 1
+FLAG_SEED = 1
+
+# magic, format version, flags, seed, people, attributes, dataset version length
+_LOG_HEADER = struct.Struct("<3sBBQIIB")
+_ANSWER_CODES = {0.0: 0, 0.25: 1, 0.75: 2, 1.0: 3}
+_ANSWER_VALUES = {code: value for value, code in _ANSWER_CODES.items()}
+TAG_RAW_ANSWER = 4
+TAG_MISTAKE = 5
+TAG_NAMED_ANSWER = 6
+TAG_NAMED_MISTAKE = 7
+_FLOAT = struct.Struct("<d")
+_SEED = struct.Struct("<Q")
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(blob: bytes, offset: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = blob[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _write_name(out: bytearray, name: str):
+    raw = name.encode("utf-8")
+    _write_varint(out, len(raw))
+    out += raw
+
+
+def _read_name(blob: bytes, offset: int) -> Tuple[str, int]:
+    length, offset = _read_varint(blob, offset)
+    return blob[offset:offset + length].decode("utf-8"), offset + length
+
+
+def is_log(blob: bytes) -> bool:
+    return bytes(blob[:len(LOG_MAGIC)]) == LOG_MAGIC
+
+
+def _dataset_id_bytes(kb: KnowledgeBase) -> bytes:
+    if not kb.dataset_id:
+        return b""
+    out = bytearray()
+    _write_name(out, kb.dataset_id)
+    return bytes(out)
+
+
+def read_dataset(blob: bytes) -> Tuple[Optional[str], str]:
+    """(dataset id, dataset version) a state or answer log blob was written for; the id is None for blobs without one."""
+    blob = bytes(blob)
+    header = _LOG_HEADER if is_log(blob) else _HEADER
+    if len(blob) < header.size:
+        raise ValueError("State blob is truncated.")
+    fields = header.unpack_from(blob)
+    flags, version_len = fields[2], fields[-1]
+    offset = header.size + version_len
+    version = blob[header.size:offset].decode("ascii")
+    dataset_id = _read_name(blob, offset)[0] if flags & FLAG_DATASET_ID else None
+    return dataset_id, version
+
+
+def _seed_bytes(seed: int) -> bytes:
+    if not 0 <= seed < 1 << 64:
+        raise ValueError("Seed must fit in an unsigned 64-bit integer.")
+    return _SEED.pack(seed)
+
+
+def _write_events(out: bytearray, events: List[Tuple], kb: KnowledgeBase):
+    for event in events:
+        if event[0] == "answer":
+            _, attr, answer = event
+            col = kb.attr_index.get(attr)
+            code = _ANSWER_CODES.get(answer)
+            if col is None:
+                out.append(TAG_NAMED_ANSWER)
+                _write_name(out, attr)
+                out += _FLOAT.pack(answer)
+            elif code is None:
+                out.append(TAG_RAW_ANSWER)
+                _write_varint(out, col)
+                out += _FLOAT.pack(answer)
+            else:
+                out.append(code)
+                _write_varint(out, col)
+        elif event[0] == "mistake":
+            row = kb.person_index.get(event[1])
+            if row is None:
+                out.append(TAG_NAMED_MISTAKE)
+                _write_name(out, event[1])
+            else:
+                out.append(TAG_MISTAKE)
+                _write_varint(out, row)
+        else:
+            raise ValueError(f"Unknown event type '{event[0]}'.")
+
+
+def _read_events(blob: bytes, offset: int, kb: KnowledgeBase) -> List[Tuple]:
+    events = []
+    while offset < len(blob):
+        tag = blob[offset]
+        offset += 1
+        if tag in _ANSWER_VALUES or tag == TAG_RAW_ANSWER:
+            col, offset = _read_varint(blob, offset)
+            if tag == TAG_RAW_ANSWER:
+                answer = _FLOAT.unpack_from(blob, offset)[0]
+                offset += _FLOAT.size
+            else:
+                answer = _ANSWER_VALUES[tag]
+            events.append(("answer", kb.attrs[col], answer))
+        elif tag == TAG_NAMED_ANSWER:
+            attr, offset = _read_name(blob, offset)
+            events.append(("answer", attr, _FLOAT.unpack_from(blob, offset)[0]))
+            offset += _FLOAT.size
+        elif tag == TAG_MISTAKE:
+            row, offset = _read_varint(blob, offset)
+            events.append(("mistake", kb.people[row]))
+        elif tag == TAG_NAMED_MISTAKE:
+            name, offset = _read_name(blob, offset)
+            events.append(("mistake", name))
+        else:
+            raise ValueError(f"Unknown answer log tag {tag}.")
+    return events
+
+
+def encode_log(events: List[Tuple], seed: Optional[int], kb: KnowledgeBase) -> bytes:
+    """Packs an answer log into a few bytes per event: a tag (which also carries the answer) and a varint index.
+
+    Attributes and people that are not in the knowledge base are stored by name so replay stays faithful.
+    """
+    flags = 0
+    if seed is not None:
+        _seed_bytes(seed)
+        flags |= FLAG_SEED
+    dataset_id = _dataset_id_bytes(kb)
+    if dataset_id:
+        flags |= FLAG_DATASET_ID
+
+    out = bytearray()
+    _write_events(out, events, kb)
+
+    version = kb.version.encode("ascii")
+    header = _LOG_HEADER.pack(LOG_MAGIC, LOG_FORMAT_VERSION, flags, seed or 0, len(kb.people), len(kb.attrs), len(version))
+    return header + version + dataset_id + bytes(out)
+
+
+def decode_log(blob: bytes, kb: KnowledgeBase) -> Tuple[List[Tuple], Optional[int]]:
+    """Inverse of encode_log, returning (events, seed)."""
+    blob = bytes(blob)
+    if len(blob) < _LOG_HEADER.size:
+        raise ValueError("Answer log blob is truncated.")
+
+    magic, format_version, flags, seed, n_people, n_attrs, version_len = _LOG_HEADER.unpack_from(blob)
+    if magic != LOG_MAGIC or format_version != LOG_FORMAT_VERSION:
+        raise ValueError(f"Unsupported answer log format: {magic!r} v{format_version}.")
+
+    offset = _LOG_HEADER.size
+    version = blob[offset:offset + version_len].decode("ascii")
+    if version != kb.version or n_people != len(kb.people) or n_attrs != len(kb.attrs):
+        raise StateVersionMismatch(f"Answer log was recorded for dataset version '{version}', but '{kb.version}' is loaded.")
+    offset += version_len
+    if flags & FLAG_DATASET_ID:
+        _, offset = _read_name(blob, offset)
+
+    events = _read_events(blob, offset, kb)
+    return events, seed if flags & FLAG_SEED else None
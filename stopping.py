@@ -0,0 +1,214 @@
+import os
+import json
+import math
+import asyncio
+import hashlib
+import argparse
+import itertools
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from knowledge_base import KnowledgeBase, get_knowledge_base
+from likelihood import fetch_outcomes, read_outcomes
+
+
+def _binary_entropy(p: float) -> float:
+    if p <= 0.0 or p >= 1.0:
+        return 0.0
+    return -p * math.log2(p) - (1 - p) * math.log2(1 - p)
+
+
+class StoppingPolicy:
+    """Decides when a game should guess instead of asking another question.
+
+    Costs are in units of one question. Guessing now is wrong with probability 1 - p1 (p1 being the
+    leader's posterior); a wrong guess costs `wrong_guess_cost` and the game then still needs about
+    the entropy of the remaining candidates in questions. Asking on costs about the entropy of the
+    whole posterior in questions (at least one), since a question yields at most one bit. The game
+    guesses as soon as guessing is no more expensive than asking on, provided it has asked
+    `min_questions` and the leader beats the runner-up by at least `min_gap`.
+    """
+
+    def __init__(self, question_cost: float = 1.0, wrong_guess_cost: float = 4.0, min_gap: float = 0.2, min_questions: int = 1):
+        self.question_cost = question_cost
+        self.wrong_guess_cost = wrong_guess_cost
+        self.min_gap = min_gap
+        self.min_questions = min_questions
+        digest = hashlib.sha1(json.dumps(self.knobs(), sort_keys=True).encode())
+        self.version = digest.hexdigest()[:12]
+
+    def knobs(self) -> Dict[str, Any]:
+        return {"question_cost": self.question_cost, "wrong_guess_cost": self.wrong_guess_cost, "min_gap": self.min_gap,
+                "min_questions": self.min_questions}
+
+    def expected_costs(self, p1: float, entropy: float) -> Tuple[float, float]:
+        """(expected cost of guessing the leader now, expected cost of asking until resolved)."""
+        # H = h(p1) + (1 - p1) * H_rest, so the entropy left after ruling out the leader follows without another pass
+        rest_entropy = max(0.0, entropy - _binary_entropy(p1)) / (1 - p1) if p1 < 1.0 else 0.0
+        guess = (1 - p1) * (self.wrong_guess_cost + self.question_cost * rest_entropy)
+        ask = self.question_cost * max(1.0, entropy)
+        return guess, ask
+
+    def should_guess(self, top: Sequence[Tuple[str, float]], entropy: float, n_questions: int) -> bool:
+        """Whether to guess top[0], given the top candidates by probability and the posterior's entropy in bits."""
+        if not top or n_questions < self.min_questions:
+            return False
+        p1 = top[0][1]
+        p2 = top[1][1] if len(top) > 1 else 0.0
+        if p1 - p2 < self.min_gap:
+            return False
+        guess, ask = self.expected_costs(p1, entropy)
+        return guess <= ask
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.knobs(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "StoppingPolicy":
+        with open(path, 'r') as f:
+            policy = cls(**json.load(f))
+        print(f"Loaded stopping policy {policy.version}: {policy.knobs()}\n")
+        return policy
+
+
+def get_stopping_policy(path: str, kb: KnowledgeBase) -> StoppingPolicy:
+    """Returns the policy at `path`, loaded once per knowledge base."""
+    return kb.derived(("stopping", os.path.abspath(path)), lambda kb: StoppingPolicy.load(path))
+
+
+def covers_game(outcome: Dict[str, Any]) -> Optional[bool]:
+    """Whether an outcome's answer events cover its whole game; None for records logged without a question count."""
+    questions_asked = outcome.get("questions_asked")
+    if questions_asked is None:
+        return None
+    return sum(1 for event in outcome.get("events", []) if event[0] == "answer") == questions_asked
+
+
+def evaluate(outcomes: Iterable[Dict[str, Any]], kb: KnowledgeBase, policy: Optional[StoppingPolicy], engine: str = "python",
+             question_cost: float = 1.0, wrong_guess_cost: float = 4.0, include_unverified: bool = False) -> Dict[str, Any]:
+    """Replays logged games of known characters and reports when `policy` (None: the threshold rule) would have guessed.
+
+    Each game's logged answers are applied in order, and after every answer the policy is asked
+    whether to guess. A correct guess ends the game. A wrong guess is counted, the character is ruled
+    out as the API would, and the replay continues with the logged answers. Logs only hold the
+    questions the live policy asked, so a game the policy would not have ended within its log counts
+    as ending with the log, which was a win. Costs use the question and wrong-guess costs given here,
+    so policies with different knobs are scored on the same scale.
+
+    Records whose events miss answers of their game would count as short, cheap wins and favour
+    aggressive policies, so they are skipped, as are records without a question count to check
+    against unless `include_unverified` is set.
+    """
+    # Imported here because algorithm builds on this module
+    from algorithm import Akinator
+
+    games = questions = logged_questions = wrong = first_correct = unresolved = skipped = 0
+    for outcome in outcomes:
+        target = outcome.get("target")
+        if target not in kb.person_index:
+            continue
+        covered = covers_game(outcome)
+        if covered is False or (covered is None and not include_unverified):
+            skipped += 1
+            continue
+        game = Akinator(knowledge_base=kb, engine=engine, stopping=policy)
+        answers = [event for event in outcome.get("events", []) if event[0] == "answer" and event[1] in kb.attr_index]
+        game_wrong = 0
+        ruled_out = set()
+        resolved = False
+        for event in outcome.get("events", []):
+            if event[0] == "mistake":
+                # Skipped when the policy already made (and was told off for) the same guess
+                if event[1] != target and event[1] not in ruled_out:
+                    ruled_out.add(event[1])
+                    game._apply_mistaken_guess(event[1])
+                continue
+            if event[1] not in kb.attr_index:
+                continue
+            game._apply_answer(event[1], event[2])
+            game._update_randomness()
+            while game._should_guess():
+                guess, _ = game._get_current_guess()
+                if guess == target:
+                    resolved = True
+                    break
+                game_wrong += 1
+                ruled_out.add(guess)
+                game._apply_mistaken_guess(guess)
+            if resolved:
+                break
+
+        games += 1
+        questions += game.n_questions_asked
+        logged_questions += len(answers)
+        wrong += game_wrong
+        first_correct += resolved and game_wrong == 0
+        unresolved += not resolved
+
+    if not games:
+        raise ValueError(f"No complete logged game has a character of this knowledge base ({skipped} incomplete or unverified skipped).")
+    return {
+        "policy": policy.knobs() if policy is not None else "threshold",
+        "games": games,
+        "skipped": skipped,
+        "questions_per_game": questions / games,
+        "logged_questions_per_game": logged_questions / games,
+        "wrong_guesses_per_game": wrong / games,
+        "first_guess_accuracy": first_correct / games,
+        "unresolved_share": unresolved / games,
+        "cost_per_game": (question_cost * questions + wrong_guess_cost * wrong) / games,
+    }
+
+
+def _floats(text: str) -> List[float]:
+    return [float(value) for value in text.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate guess-stopping policies offline against logged games.")
+    parser.add_argument("--dataset", default="data/characters_data.json")
+    parser.add_argument("--questions", default="data/questions.json")
+    parser.add_argument("--engine", default="python")
+    parser.add_argument("--outcomes", default=None, help="JSON lines file of {\"target\", \"events\"} records")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"), help="Read the game_outcomes table instead")
+    parser.add_argument("--question-cost", type=float, default=1.0, help="Cost of asking one more question")
+    parser.add_argument("--wrong-guess-cost", type=float, default=4.0, help="Cost of one wrong guess, in the same unit")
+    parser.add_argument("--grid-wrong-guess-cost", type=_floats, default=[2.0, 4.0, 8.0], help="Comma separated values to try")
+    parser.add_argument("--grid-min-gap", type=_floats, default=[0.0, 0.2, 0.4], help="Comma separated values to try")
+    parser.add_argument("--grid-min-questions", type=_floats, default=[1, 3, 5], help="Comma separated values to try")
+    parser.add_argument("--include-unverified", action="store_true", help="Also replay records logged without a question count")
+    parser.add_argument("--out", default=None, help="Save the cheapest policy here, e.g. data/stopping.json")
+    args = parser.parse_args()
+
+    kb = get_knowledge_base(args.dataset, args.questions)
+    if args.outcomes:
+        outcomes = read_outcomes(args.outcomes)
+    elif args.database_url:
+        outcomes = asyncio.run(fetch_outcomes(args.database_url, kb.version))
+    else:
+        parser.error("Either --outcomes or --database-url is required.")
+
+    costs = {"question_cost": args.question_cost, "wrong_guess_cost": args.wrong_guess_cost, "include_unverified": args.include_unverified}
+    baseline = evaluate(outcomes, kb, None, args.engine, **costs)
+    print(f"Replaying {baseline['games']} logged games; skipped {baseline['skipped']} whose events do not cover the whole game"
+          f"{'' if args.include_unverified else ' or that carry no question count'}.")
+    results = []
+    for wrong_guess_cost, min_gap, min_questions in itertools.product(args.grid_wrong_guess_cost, args.grid_min_gap, args.grid_min_questions):
+        policy = StoppingPolicy(args.question_cost, wrong_guess_cost, min_gap, int(min_questions))
+        results.append((evaluate(outcomes, kb, policy, args.engine, **costs), policy))
+    results.sort(key=lambda result: result[0]["cost_per_game"])
+
+    print(f"{'policy':<36} {'cost':>7} {'questions':>9} {'wrong':>6} {'first ok':>8} {'unresolved':>10}")
+    for report in [baseline] + [report for report, _ in results]:
+        knobs = report["policy"]
+        label = knobs if isinstance(knobs, str) else f"wrong={knobs['wrong_guess_cost']:g} gap={knobs['min_gap']:g} min_q={knobs['min_questions']}"
+        print(f"{label:<36} {report['cost_per_game']:>7.2f} {report['questions_per_game']:>9.2f} "
+              f"{report['wrong_guesses_per_game']:>6.3f} {report['first_guess_accuracy']:>8.3f} {report['unresolved_share']:>10.3f}")
+
+    if args.out:
+        best_report, best = results[0]
+        if best_report["cost_per_game"] < baseline["cost_per_game"]:
+            best.save(args.out)
+            print(f"Saved stopping policy {best.version} ({best_report['cost_per_game']:.2f} vs {baseline['cost_per_game']:.2f} per game) -> {args.out}")
+        else:
+            print(f"No policy beats the threshold rule ({baseline['cost_per_game']:.2f} per game); nothing saved.")
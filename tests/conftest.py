@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_registry import DatasetRegistry, DatasetSpec
+
+
+def _write_dataset(path, n_people: int = 48, n_attrs: int = 32, seed: int = 1):
+    """A small random dataset with 0/1 and fractional values, plus a few attributes held by one person only."""
+    rnd = random.Random(seed)
+    attrs = [f"trait_{i}" for i in range(n_attrs)]
+    people = []
+    for i in range(n_people):
+        values = {}
+        for attr in attrs:
+            roll = rnd.random()
+            if roll < 0.35:
+                values[attr] = 1
+            elif roll < 0.40:
+                values[attr] = 0.5
+            elif roll < 0.70:
+                values[attr] = 0
+        if i % 6 == 0:
+            values[f"unique_{i}"] = 1
+        people.append({"name": f"Person {i}", "attributes": values})
+    questions = {attr: f"Does your character have {attr}?" for attr in attrs}
+    questions.update({f"unique_{i}": f"Is your character number {i}?" for i in range(0, n_people, 6)})
+
+    dataset_path, questions_path = path / "characters_data.json", path / "questions.json"
+    dataset_path.write_text(json.dumps(people))
+    questions_path.write_text(json.dumps(questions))
+    return str(dataset_path), str(questions_path)
+
+
+@pytest.fixture
+def dataset_paths(tmp_path):
+    """Dataset and questions files of a test's own, free to modify."""
+    return _write_dataset(tmp_path)
+
+
+@pytest.fixture(scope="session")
+def specs(tmp_path_factory):
+    dataset_path, questions_path = _write_dataset(tmp_path_factory.mktemp("data"))
+    return {"default": DatasetSpec(dataset_path, questions_path)}
+
+
+@pytest.fixture(scope="session")
+def kb(specs):
+    return DatasetRegistry(specs).get("default")
+
+
+def _play(game, target: str, turns: int = 40):
+    """Plays a game against `target` answering truthfully; returns the questions and guesses in order and the final response."""
+    kb = game.kb
+    trace = []
+    response = game.start_game()
+    for _ in range(turns):
+        if response["status"] == "playing":
+            attr = response["attribute_key"]
+            trace.append(attr)
+            value = kb.people_attrs_map[target].get(attr, 0)
+            response = game.process_answer(attr, 0.75 if value == 0.5 else float(value))
+        elif response["status"] == "make_guess":
+            trace.append(("guess", response["guess"]))
+            if response["guess"] == target:
+                break
+            response = game.process_mistaken_guess(response["guess"])
+        else:
+            break
+    return trace, response
+
+
+@pytest.fixture(scope="session")
+def play_game():
+    return _play
+
+
+@pytest.fixture(scope="session")
+def api(specs):
+    """A client of the API serving `specs` from an in-memory session store; main reads its settings on first import."""
+    spec = specs["default"]
+    os.environ.update({
+        "SESSION_STORE": "memory", "DATASET_PATH": spec.dataset_path, "QUESTIONS_PATH": spec.questions_path,
+        "WORKER_MODE": "inline", "WARM_UP": "false",
+    })
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
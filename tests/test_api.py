@@ -0,0 +1,123 @@
+import uuid
+import asyncio
+
+import pytest
+
+
+def _answer(api, session_id, response, answer="yes", **overrides):
+    payload = {"session_id": session_id, "attribute_key": response["attribute_key"], "answer": answer,
+               "question_number": response["questions_asked"], **overrides}
+    return api.post("/questions", json=payload)
+
+
+def _stored(store, session_id):
+    return asyncio.run(store.get(uuid.UUID(session_id)))
+
+
+@pytest.fixture
+def game(api):
+    response = api.post("/start_game").json()
+    assert response["status"] == "playing"
+    return response["session_id"], response
+
+
+@pytest.fixture
+def main(api):
+    # Imported by the api fixture, once the settings are in the environment
+    import main
+    return main
+
+
+@pytest.fixture
+def store(main):
+    return asyncio.run(main.get_session_store())
+
+
+def test_retried_answer_returns_the_stored_response_without_playing(api, main, game, store, monkeypatch):
+    session_id, question = game
+    first = _answer(api, session_id, question)
+    assert first.status_code == 200
+    version = _stored(store, session_id).version
+
+    turns = []
+    monkeypatch.setattr(main.GAME_POOL, "call", lambda *args: turns.append(args))
+    retry = _answer(api, session_id, question)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert turns == []
+    assert _stored(store, session_id).version == version
+
+
+def test_retry_with_another_answer_is_a_conflict(api, game):
+    session_id, question = game
+    assert _answer(api, session_id, question).status_code == 200
+    assert _answer(api, session_id, question, answer="no").status_code == 409
+
+
+def test_stale_question_number_is_a_conflict(api, game):
+    session_id, question = game
+    second = _answer(api, session_id, question).json()
+    assert second["status"] == "playing"
+    # Answering the new question under the number of the one before it
+    response = _answer(api, session_id, second, question_number=question["questions_asked"])
+    assert response.status_code == 409
+    assert _answer(api, session_id, second).status_code == 200
+
+
+@pytest.mark.parametrize("rival_answer, status_code", [("yes", 200), ("no", 409)])
+def test_concurrent_writers_resolve_with_one_cas_failure(api, main, game, store, monkeypatch, rival_answer, status_code):
+    """Another replica saves a turn of the session while this request plays the same turn."""
+    session_id, question = game
+    rival_response = {}
+    real_play_turn, real_update = main.play_turn, store.update
+
+    async def racing_play_turn(sid, game, method, *args):
+        if method == "process_answer" and not rival_response:
+            rival = main.restore_game_session(sid, await store.get(sid))
+            request = {"question_number": question["questions_asked"], "attribute_key": question["attribute_key"],
+                       "answer": main.VALID_ANSWERS[rival_answer]}
+            response = await real_play_turn(sid, rival.game, method, args[0], request["answer"])
+            rival_response.update(await main.save_game_session(sid, rival, request, response, store))
+        return await real_play_turn(sid, game, method, *args)
+
+    writes = []
+
+    async def recording_update(*args, **kwargs):
+        writes.append(await real_update(*args, **kwargs))
+        return writes[-1]
+
+    monkeypatch.setattr(main, "play_turn", racing_play_turn)
+    monkeypatch.setattr(store, "update", recording_update)
+    response = _answer(api, session_id, question)
+
+    assert writes == [True, False]
+    assert response.status_code == status_code
+    if status_code == 200:
+        # The loser answers with the winner's stored response instead of overwriting it
+        assert response.json() == {"session_id": session_id, **rival_response}
+
+
+def test_batched_answers_match_single_answers(api, main, store):
+    # Twin sessions from the same stored row: one plays through /questions_batch, the other through /questions
+    pairs, questions = [], {}
+    for _ in range(4):
+        response = api.post("/start_game").json()
+        twin = str(uuid.uuid4())
+        assert asyncio.run(store.create(uuid.UUID(twin), _stored(store, response["session_id"])))
+        # Both start from the stored (float32) state rather than one from the cached game
+        main.SESSION_CACHE.discard(uuid.UUID(response["session_id"]))
+        pairs.append((response["session_id"], twin))
+        questions[response["session_id"]] = questions[twin] = response
+
+    for turn in range(6):
+        playing = [pair for pair in pairs if questions[pair[0]]["status"] == "playing"]
+        if not playing:
+            break
+        answers = {batched: ["yes", "no", "probably yes", "probably no"][(n + turn) % 4] for n, (batched, _) in enumerate(playing)}
+        turns = [{"session_id": batched, "attribute_key": questions[batched]["attribute_key"], "answer": answers[batched],
+                  "question_number": questions[batched]["questions_asked"]} for batched, _ in playing]
+        results = api.post("/questions_batch", json={"turns": turns}).json()["results"]
+        for (batched, twin), result in zip(playing, results):
+            single = _answer(api, twin, questions[twin], answer=answers[batched]).json()
+            assert {**result, "session_id": twin} == single
+            questions[batched], questions[twin] = result, single
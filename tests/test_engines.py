@@ -0,0 +1,45 @@
+import pytest
+
+from algorithm import Akinator
+
+pytest.importorskip("numpy")
+
+TARGETS = range(0, 48, 5)
+
+
+@pytest.fixture(scope="module")
+def reference(kb, play_game):
+    return {i: play_game(Akinator(knowledge_base=kb, seed=i), kb.people[i]) for i in TARGETS}
+
+
+@pytest.mark.parametrize("engine", ["numpy", "bitset", "incremental", "parallel"])
+def test_engine_matches_python_engine(kb, play_game, reference, engine):
+    for i in TARGETS:
+        trace, response = play_game(Akinator(knowledge_base=kb, engine=engine, seed=i), kb.people[i])
+        assert trace == reference[i][0], f"{engine} diverged on {kb.people[i]}"
+        assert response["status"] == reference[i][1]["status"]
+
+
+def test_bitset_storage_plays_like_dict_storage(dataset_paths, play_game):
+    dict_game = Akinator(*dataset_paths, seed=3)
+    bitset_game = Akinator(*dataset_paths, storage="bitset", engine="bitset", seed=3)
+    assert bitset_game.kb is not dict_game.kb and bitset_game.kb.bitsets is not None
+    target = dict_game.kb.people[12]
+    assert play_game(bitset_game, target) == play_game(dict_game, target)
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy", "bitset", "incremental"])
+def test_batched_answers_match_single_answers(kb, engine):
+    batched = [Akinator(knowledge_base=kb, engine=engine, seed=i) for i in TARGETS]
+    single = [Akinator(knowledge_base=kb, engine=engine, seed=i) for i in TARGETS]
+    responses = [game.start_game() for game in batched]
+    assert responses == [game.start_game() for game in single]
+    for turn in range(12):
+        playing = [i for i, response in enumerate(responses) if response["status"] == "playing"]
+        if not playing:
+            break
+        answers = [(responses[i]["attribute_key"], float((i + turn) % 2)) for i in playing]
+        for i, response in zip(playing, Akinator.process_answers([batched[i] for i in playing], answers)):
+            responses[i] = response
+            assert response == single[i].process_answer(*answers[playing.index(i)])
+            assert batched[i].get_state() == single[i].get_state()
@@ -0,0 +1,40 @@
+import os
+import json
+
+from algorithm import Akinator
+from knowledge_base import get_knowledge_base
+
+
+def test_games_share_one_knowledge_base(dataset_paths):
+    first = Akinator(*dataset_paths)
+    second = Akinator(*dataset_paths)
+    assert first.kb is second.kb
+    assert first.kb is get_knowledge_base(*dataset_paths)
+
+
+def test_touching_the_dataset_reloads_it(dataset_paths):
+    dataset_path, _ = dataset_paths
+    kb = get_knowledge_base(*dataset_paths)
+    stat = os.stat(dataset_path)
+    os.utime(dataset_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    reloaded = get_knowledge_base(*dataset_paths)
+    assert reloaded is not kb
+    # Same bytes, same version: games started before the touch still decode
+    assert reloaded.version == kb.version
+    assert get_knowledge_base(*dataset_paths) is reloaded
+
+
+def test_changed_dataset_gets_a_new_version_and_old_games_keep_theirs(dataset_paths):
+    dataset_path, _ = dataset_paths
+    game = Akinator(*dataset_paths)
+    with open(dataset_path) as f:
+        people = json.load(f)
+    people.append({"name": "Newcomer", "attributes": {"trait_0": 1}})
+    with open(dataset_path, "w") as f:
+        json.dump(people, f)
+
+    kb = get_knowledge_base(*dataset_paths)
+    assert kb.version != game.kb.version
+    assert "Newcomer" in kb.person_index and "Newcomer" not in game.kb.person_index
+    assert Akinator(*dataset_paths).kb is kb
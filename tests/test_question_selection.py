@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from algorithm import Akinator
+from attribute_index import PER_PERSON_MAX_CANDIDATES
+from knowledge_base import KnowledgeBase
+
+
+def _tied_kb(n_people: int) -> KnowledgeBase:
+    """People whose attributes tie on purpose: twin columns, a mirrored column and a few fractional values."""
+    rnd = random.Random(n_people)
+    records = []
+    for i in range(n_people):
+        values = {f"trait_{j}": int(rnd.random() < 0.3 + 0.05 * j) for j in range(8)}
+        values["twin_a"] = values["twin_b"] = i % 2
+        values["mirror"] = 1 - i % 2
+        values["rare"] = int(i % 9 == 0)
+        if i % 10 == 0:
+            values["fuzzy"] = 0.5
+        records.append({"name": f"Person {i}", "attributes": values})
+    attrs = sorted(records[0]["attributes"])
+    return KnowledgeBase.from_records(records, {attr: f"{attr}?" for attr in attrs})
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize("n_people", [40, PER_PERSON_MAX_CANDIDATES + 88])
+def test_bounded_scoring_picks_what_full_scoring_picks(engine, n_people):
+    if engine == "numpy":
+        pytest.importorskip("numpy")
+    kb = _tied_kb(n_people)
+    game = Akinator(knowledge_base=kb, engine=engine)
+    rnd = random.Random(11)
+    for _ in range(150):
+        # Repeated weights make exact gain ties common; zero weights drop candidates from the bounds.
+        # Games keep the probabilities normalized, which the support bounds rely on
+        weights = {name: rnd.choice([0.0, 1.0, 1.0, 2.0, rnd.random()]) for name in kb.people}
+        total = sum(weights.values())
+        game.probabilities = {name: weight / total for name, weight in weights.items()}
+        candidates = rnd.sample(kb.people, rnd.randint(2, n_people))
+        unasked = [attr for attr in kb.attrs if rnd.random() < 0.8]
+        picks = []
+        for prefilter in (True, False):
+            game.PREFILTER_ATTRIBUTES = prefilter
+            picks.append(game._calc_info_gain_subset(candidates, unasked))
+        assert picks[0] == picks[1]
+
+
+@pytest.mark.parametrize("prefilter", [True, False])
+def test_games_play_the_same_with_and_without_the_prefilter(kb, play_game, prefilter):
+    for i in range(0, 48, 7):
+        game = Akinator(knowledge_base=kb, seed=i)
+        game.PREFILTER_ATTRIBUTES = prefilter
+        reference = Akinator(knowledge_base=kb, seed=i)
+        reference.PREFILTER_ATTRIBUTES = not prefilter
+        assert play_game(game, kb.people[i]) == play_game(reference, kb.people[i])
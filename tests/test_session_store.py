@@ -0,0 +1,90 @@
+import uuid
+import asyncio
+
+import pytest
+
+import session_store
+from session_store import SessionRecord, create_session_store
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def run(request, tmp_path, clock):
+    """Runs a coroutine function against an opened store of each kind."""
+    def run(test):
+        async def main():
+            store = create_session_store(request.param, sqlite_path=str(tmp_path / "sessions.db"))
+            await store.open()
+            try:
+                return await test(store)
+            finally:
+                await store.close()
+        return asyncio.run(main())
+    return run
+
+
+def _record(version: int, state: bytes = b"state") -> SessionRecord:
+    return SessionRecord(None, state, version, f'{{"turn": {version}}}')
+
+
+def test_create_only_writes_new_sessions(run):
+    async def test(store):
+        session_id = uuid.uuid4()
+        assert await store.create(session_id, _record(1))
+        assert not await store.create(session_id, _record(1, b"other"))
+        assert await store.get(session_id) == _record(1)
+        assert await store.get(uuid.uuid4()) is None
+    run(test)
+
+
+def test_update_compares_and_swaps_the_version(run):
+    async def test(store):
+        session_id = uuid.uuid4()
+        assert not await store.update(session_id, _record(2), expected_version=1)
+        await store.create(session_id, _record(1))
+
+        assert await store.update(session_id, _record(2, b"first"), expected_version=1)
+        # A second writer that loaded version 1 as well loses
+        assert not await store.update(session_id, _record(2, b"second"), expected_version=1)
+        assert await store.get(session_id) == _record(2, b"first")
+        assert await store.update(session_id, _record(3), expected_version=None)
+
+        other = uuid.uuid4()
+        await store.create(other, _record(1))
+        written = await store.update_many([(session_id, _record(4), 3), (other, _record(2), 5)])
+        assert written == {session_id}
+        assert (await store.get(other)).version == 1
+    run(test)
+
+
+def test_delete_expired_removes_idle_sessions_oldest_first(run, clock):
+    async def test(store):
+        sessions = [uuid.uuid4() for _ in range(5)]
+        for session_id in sessions:
+            await store.create(session_id, _record(1))
+            clock.now += 10
+        # A write refreshes the last access of the oldest session
+        await store.update(sessions[0], _record(2), expected_version=1)
+        clock.now += 15
+
+        # Idle for more than 30s: sessions 1 to 3, last accessed 55s, 45s and 35s ago
+        assert await store.delete_expired(ttl=30, limit=2) == 2
+        assert await store.get(sessions[1]) is None and await store.get(sessions[2]) is None
+        assert await store.delete_expired(ttl=30, limit=2) == 1
+        assert await store.delete_expired(ttl=30, limit=2) == 0
+        assert [await store.get(session_id) is not None for session_id in sessions] == [True, False, False, False, True]
+    run(test)
@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import sql_dataset
+from knowledge_base import KnowledgeBaseCache
+from sql_dataset import SqlCatalog
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+QUESTIONS = {"trait_0": "Trait 0?"}
+
+
+class FakeCatalog:
+    """The characters table as {name: [updated_at, deleted, attributes]}, served through the SqlCatalog queries."""
+
+    def __init__(self, monkeypatch):
+        self.rows = {
+            f"Person {i:02d}": [T0 + timedelta(minutes=i), False, {f"trait_{j}": (0.5 if (i + j) % 7 == 0 else (i * j + j) % 2) for j in range(6) if (i + j) % 5}]
+            for i in range(40)
+        }
+        self.rows["Person 07"][2]["only_07"] = 1
+        self.now = max(row[0] for row in self.rows.values())
+        self.loads = 0
+        catalog = self
+
+        class Connection:
+            async def close(self):
+                pass
+
+        async def connect(url):
+            return Connection()
+
+        async def summary(self, connection):
+            return sum(1 for _, deleted, _ in catalog.rows.values() if not deleted), max(row[0] for row in catalog.rows.values())
+
+        async def stream(self, connection, since):
+            if since is None:
+                catalog.loads += 1
+            for name in sorted(catalog.rows):
+                updated_at, deleted, attributes = catalog.rows[name]
+                if since is None or updated_at > since:
+                    yield name, deleted, dict(attributes)
+
+        monkeypatch.setattr(sql_dataset.asyncpg, "connect", connect)
+        monkeypatch.setattr(SqlCatalog, "_summary", summary)
+        monkeypatch.setattr(SqlCatalog, "_stream", stream)
+
+    def touch(self, name, deleted=False, **attributes):
+        self.now += timedelta(minutes=1)
+        row = self.rows.setdefault(name, [self.now, False, {}])
+        row[0], row[1] = self.now, deleted
+        row[2].update(attributes)
+
+
+def _assert_same_base(kb, full):
+    assert kb.people == full.people
+    assert kb.attrs == full.attrs
+    assert kb.version == full.version
+    assert dict(kb.attr_index) == dict(full.attr_index)
+    for name in full.people:
+        assert dict(kb.people_attrs_map[name]) == dict(full.people_attrs_map[name])
+    if full.bitsets is not None:
+        assert kb.bitsets.yes == full.bitsets.yes
+        assert kb.bitsets.known == full.bitsets.known
+        assert kb.bitsets.fractional_bits == full.bitsets.fractional_bits
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    return FakeCatalog(monkeypatch)
+
+
+@pytest.mark.parametrize("storage", ["dict", "bitset"])
+def test_refresh_patches_changes_like_a_full_load(catalog, storage):
+    sql = SqlCatalog("postgresql://catalog")
+    kb, watermark = asyncio.run(sql.load(QUESTIONS, storage))
+    catalog.touch("Person 03", trait_0=1, new_trait=0.5)
+    catalog.touch("Aaron", trait_1=1)
+    catalog.touch("Person 20b", trait_2=0.5, trait_3=0)
+    catalog.touch("Zoe", trait_4=1)
+
+    refreshed, watermark = asyncio.run(sql.refresh(kb, watermark, QUESTIONS, storage))
+    _assert_same_base(refreshed, asyncio.run(sql.load(QUESTIONS, storage))[0])
+    assert "new_trait" in refreshed.attr_index
+    if storage == "dict":
+        # Unchanged people keep their rows instead of being copied
+        assert refreshed.people_attrs_map["Person 04"] is kb.people_attrs_map["Person 04"]
+    assert asyncio.run(sql.refresh(refreshed, watermark, QUESTIONS, storage))[0] is refreshed
+
+
+@pytest.mark.parametrize("storage", ["dict", "bitset"])
+def test_refresh_drops_deleted_people_and_their_last_attributes(catalog, storage):
+    sql = SqlCatalog("postgresql://catalog")
+    kb, watermark = asyncio.run(sql.load(QUESTIONS, storage))
+    catalog.touch("Person 07", deleted=True)
+    catalog.touch("Person 30", deleted=True)
+    catalog.touch("Person 31", trait_5=1)
+
+    refreshed, _ = asyncio.run(sql.refresh(kb, watermark, QUESTIONS, storage))
+    _assert_same_base(refreshed, asyncio.run(sql.load(QUESTIONS, storage))[0])
+    assert "Person 07" not in refreshed.person_index and "Person 30" not in refreshed.person_index
+    assert "only_07" not in refreshed.attr_index
+
+
+def test_bitset_refresh_past_the_block_limit_rebuilds_the_columns(catalog, monkeypatch):
+    monkeypatch.setattr(sql_dataset, "PATCH_MAX_BLOCKS", 1)
+    sql = SqlCatalog("postgresql://catalog")
+    kb, watermark = asyncio.run(sql.load(QUESTIONS, "bitset"))
+    catalog.touch("Person 05", deleted=True)
+    catalog.touch("Person 25b", trait_0=1)
+
+    refreshed, _ = asyncio.run(sql.refresh(kb, watermark, QUESTIONS, "bitset"))
+    _assert_same_base(refreshed, asyncio.run(sql.load(QUESTIONS, "bitset"))[0])
+
+
+def test_refresh_reloads_when_the_count_does_not_add_up(catalog):
+    sql = SqlCatalog("postgresql://catalog")
+    kb, watermark = asyncio.run(sql.load(QUESTIONS))
+    # A hard delete leaves no row for the refresh to see
+    del catalog.rows["Person 10"]
+    catalog.touch("Person 11", trait_0=0)
+    loads = catalog.loads
+
+    refreshed, _ = asyncio.run(sql.refresh(kb, watermark, QUESTIONS))
+    assert catalog.loads == loads + 1
+    assert "Person 10" not in refreshed.person_index
+    _assert_same_base(refreshed, asyncio.run(sql.load(QUESTIONS))[0])
+
+
+def test_cache_only_refreshes_in_the_background(catalog, tmp_path):
+    questions_path = tmp_path / "questions.json"
+    questions_path.write_text('{"trait_0": "Trait 0?"}')
+    cache = KnowledgeBaseCache()
+    kb = cache.get("postgresql://catalog", str(questions_path), "sql")
+    catalog.touch("Person 12", trait_0=1)
+    loads = catalog.loads
+
+    # Requests keep the loaded base and never wait for the catalog
+    assert cache.get("postgresql://catalog", str(questions_path), "sql") is kb
+    assert cache.refresh_sql() == 1
+    refreshed = cache.get("postgresql://catalog", str(questions_path), "sql")
+    assert refreshed is not kb and refreshed.people_attrs_map["Person 12"]["trait_0"] == 1
+    assert catalog.loads == loads
+    assert cache.refresh_sql() == 0
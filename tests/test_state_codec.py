@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from algorithm import Akinator
+from state_codec import FORMAT_VERSION, StateVersionMismatch, _HEADER, _dataset_id_bytes, read_dataset
+
+
+def _played_game(kb, seed=7):
+    game = Akinator(knowledge_base=kb, seed=seed)
+    response = game.start_game()
+    for answer in (1.0, 0.0, 0.75, 0.25):
+        response = game.process_answer(response["attribute_key"], answer)
+    game.process_mistaken_guess(kb.people[0])
+    return game
+
+
+def _assert_same_game(restored, game):
+    assert restored.events == game.events
+    assert restored.seed == game.seed
+    assert restored.n_questions_asked == game.n_questions_asked
+    assert restored.asked_attrs == game.asked_attrs
+    assert restored.RETRY == game.RETRY
+    for name in game.kb.people:
+        assert restored.probabilities[name] == pytest.approx(game.probabilities[name], abs=1e-6)
+
+
+@pytest.mark.parametrize("seed", [7, None])
+@pytest.mark.parametrize("compress", [True, False])
+def test_binary_state_round_trip(kb, seed, compress):
+    game = _played_game(kb, seed)
+    restored = Akinator(knowledge_base=kb)
+    restored.decode_state(game.encode_state(compress=compress))
+    _assert_same_game(restored, game)
+    assert restored.log_complete()
+
+
+def test_binary_state_float64_is_exact(kb):
+    game = _played_game(kb)
+    restored = Akinator(knowledge_base=kb)
+    restored.decode_state(game.encode_state(precision="float64"))
+    assert restored.probabilities == game.probabilities
+
+
+def test_answer_log_round_trip(kb):
+    game = _played_game(kb)
+    restored = Akinator(knowledge_base=kb)
+    restored.decode_log(game.encode_log())
+    _assert_same_game(restored, game)
+
+
+def test_json_state_round_trip(kb):
+    game = _played_game(kb)
+    restored = Akinator(knowledge_base=kb)
+    restored._load_state(json.loads(json.dumps(game.get_state())))
+    _assert_same_game(restored, game)
+
+
+def test_restored_game_plays_on_like_the_original(kb):
+    game = _played_game(kb)
+    restored = Akinator(knowledge_base=kb)
+    restored.decode_state(game.encode_state(precision="float64"))
+    assert restored.select_next_question() == game.select_next_question()
+
+
+def test_version_1_state_still_decodes_without_its_log(kb):
+    game = _played_game(kb)
+    blob = bytearray(game.encode_state(compress=False))
+    blob[3] = 1
+    # Version 1 payloads end after the asked-attribute bitmask
+    end = _HEADER.size + len(kb.version) + len(_dataset_id_bytes(kb)) + len(kb.people) * 4 + (len(kb.attrs) + 7) // 8
+    restored = Akinator(knowledge_base=kb)
+    restored.decode_state(bytes(blob[:end]))
+    assert restored.n_questions_asked == game.n_questions_asked
+    assert restored.events == []
+    assert not restored.log_complete()
+    with pytest.raises(ValueError):
+        restored.encode_log()
+    assert FORMAT_VERSION == 2
+
+
+def test_state_of_another_dataset_version_is_rejected(kb):
+    blob = bytearray(_played_game(kb).encode_state())
+    offset = _HEADER.size
+    blob[offset:offset + len(kb.version)] = b"0" * len(kb.version)
+    with pytest.raises(StateVersionMismatch):
+        Akinator(knowledge_base=kb).decode_state(bytes(blob))
+
+
+@pytest.mark.parametrize("encode", ["encode_state", "encode_log"])
+def test_blobs_name_their_dataset(kb, encode):
+    assert read_dataset(getattr(_played_game(kb), encode)()) == ("default", kb.version)
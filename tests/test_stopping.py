@@ -0,0 +1,45 @@
+import pytest
+
+from algorithm import Akinator
+from stopping import StoppingPolicy, covers_game, evaluate
+
+
+@pytest.fixture(scope="module")
+def outcomes(kb, play_game):
+    """Won games as confirm_guess logs them."""
+    logged = []
+    for i in range(0, 48, 4):
+        game = Akinator(knowledge_base=kb, seed=i)
+        _, response = play_game(game, kb.people[i])
+        if response["status"] == "make_guess" and response["guess"] == kb.people[i]:
+            logged.append({"target": kb.people[i], "events": list(game.events), "questions_asked": game.n_questions_asked})
+    assert len(logged) >= 4
+    return logged
+
+
+def _truncated(outcome):
+    # A game restored from a state without its log: the early answers are missing
+    answers = [n for n, event in enumerate(outcome["events"]) if event[0] == "answer"]
+    return {**outcome, "events": outcome["events"][answers[1] + 1:]}
+
+
+@pytest.mark.parametrize("policy", [None, StoppingPolicy()])
+def test_evaluate_skips_games_its_logs_do_not_cover(kb, outcomes, policy):
+    complete = evaluate(outcomes, kb, policy)
+    assert complete["games"] == len(outcomes) and complete["skipped"] == 0
+
+    incomplete = [_truncated(outcome) for outcome in outcomes[:3]]
+    assert [covers_game(outcome) for outcome in incomplete] == [False] * 3
+    mixed = evaluate(incomplete + outcomes, kb, policy)
+    assert mixed == {**complete, "skipped": 3}
+
+    with pytest.raises(ValueError):
+        evaluate(incomplete, kb, policy)
+
+
+def test_evaluate_only_counts_unverified_games_when_asked(kb, outcomes):
+    unverified = [{key: value for key, value in outcome.items() if key != "questions_asked"} for outcome in outcomes]
+    assert covers_game(unverified[0]) is None
+    with pytest.raises(ValueError):
+        evaluate(unverified, kb, None)
+    assert evaluate(unverified, kb, None, include_unverified=True) == evaluate(outcomes, kb, None)
@@ -0,0 +1,60 @@
+import json
+import asyncio
+
+import pytest
+
+from algorithm import Akinator
+from worker_pool import GamePool
+
+
+def _restored(game):
+    """The game as a request restores it from a stored state that holds no answer log."""
+    state = json.loads(json.dumps(game.get_state()))
+    state["events"] = []
+    restored = Akinator(knowledge_base=game.kb, seed=game.seed)
+    restored._load_state(state)
+    return restored
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_turn_on_state_restored_game_keeps_its_progress(kb, specs, mode):
+    async def run():
+        pool = GamePool(mode, workers=2, timeout=30.0, initargs=(specs, "dict", "python"))
+        pool.start()
+        try:
+            game = Akinator(knowledge_base=kb, seed=3)
+            response = await pool.call(game, "start_game")
+            for answer in (1.0, 0.0, 1.0):
+                response = await pool.call(game, "process_answer", response["attribute_key"], answer)
+
+            restored = _restored(game)
+            expected = _restored(game).process_answer(response["attribute_key"], 0.0)
+            played = await pool.call(restored, "process_answer", response["attribute_key"], 0.0)
+            return restored, played, expected
+        finally:
+            pool.shutdown()
+
+    restored, played, expected = asyncio.run(run())
+    assert restored.n_questions_asked == 4
+    assert played == expected
+
+
+def test_process_turns_match_inline_turns(kb, specs, play_game):
+    async def run(mode):
+        pool = GamePool(mode, workers=2, timeout=30.0, initargs=(specs, "dict", "python"))
+        pool.start()
+        try:
+            game = Akinator(knowledge_base=kb, seed=11)
+            target = kb.people[11]
+            trace = []
+            response = await pool.call(game, "start_game")
+            while response["status"] == "playing" and len(trace) < 40:
+                attr = response["attribute_key"]
+                trace.append(attr)
+                value = kb.people_attrs_map[target].get(attr, 0)
+                response = await pool.call(game, "process_answer", attr, 0.75 if value == 0.5 else float(value))
+            return trace, response["status"]
+        finally:
+            pool.shutdown()
+
+    assert asyncio.run(run("process")) == asyncio.run(run("inline"))
@@ -0,0 +1,260 @@
+import time
+import asyncio
+import weakref
+from contextlib import AsyncExitStack
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Literal, Mapping, Optional, Tuple
+
+from algorithm import Akinator
+from dataset_registry import DatasetRegistry, DatasetSpec
+from knowledge_base import SQL_REFRESH_INTERVAL, KnowledgeBase, start_sql_refresh
+from likelihood import get_likelihood_model
+from metrics import capture, observe_stage, replay
+from opening_book import get_opening_book
+from state_codec import StateVersionMismatch, read_dataset
+from stopping import get_stopping_policy
+
+# Turns of the synthetic game that warms the question selector before real traffic
+WARM_UP_TURNS = 3
+
+# Per-process game factory of the process pool, set up once by _init_worker
+_WORKER_CONFIG: Optional[Tuple] = None
+_WORKER_DATASETS: Optional[DatasetRegistry] = None
+
+
+def _init_worker(specs: Mapping[str, DatasetSpec], storage: str, engine: str, lookahead_depth: int = 0, max_loaded: int = 4,
+                 retain_versions: int = 2, preload: Tuple[str, ...] = (), stopping_path: Optional[str] = None,
+                 sql_refresh_interval: float = SQL_REFRESH_INTERVAL):
+    global _WORKER_CONFIG, _WORKER_DATASETS
+    _WORKER_CONFIG = (engine, lookahead_depth, stopping_path)
+    _WORKER_DATASETS = DatasetRegistry(specs, storage, max_loaded, retain_versions)
+    # Each process holds its own SQL bases, so each refreshes them off its request path
+    if any(spec.dataset_type == "sql" for spec in specs.values()):
+        start_sql_refresh(sql_refresh_interval)
+    # Parse the knowledge bases (and build the engines) before the first game arrives
+    for dataset_id in preload:
+        _worker_game(_WORKER_DATASETS.get(dataset_id))
+
+
+def _worker_game(kb: KnowledgeBase) -> Akinator:
+    engine, lookahead_depth, stopping_path = _WORKER_CONFIG
+    spec = _WORKER_DATASETS.spec(kb.dataset_id)
+    book = get_opening_book(spec.opening_book_path, kb) if spec.opening_book_path else None
+    likelihood = get_likelihood_model(spec.likelihood_path, kb) if spec.likelihood_path else None
+    stopping = get_stopping_policy(stopping_path, kb) if stopping_path else None
+    return Akinator(knowledge_base=kb, engine=engine, opening_book=book, lookahead_depth=lookahead_depth, likelihood=likelihood,
+                    stopping=stopping)
+
+
+def warm_up_game(game: Akinator, turns: int = WARM_UP_TURNS) -> Akinator:
+    """Plays a few turns of a throwaway game, so engines, indexes and caches are built before the first player's turn."""
+    response = game.start_game()
+    for turn in range(turns):
+        if response.get("status") != "playing":
+            break
+        response = game.process_answer(response["attribute_key"], float(turn % 2))
+    return game
+
+
+def _warm_worker(dataset_ids: Tuple[str, ...]) -> int:
+    for dataset_id in dataset_ids:
+        warm_up_game(_worker_game(_WORKER_DATASETS.get(dataset_id)))
+    return len(dataset_ids)
+
+
+def _turn_state(game: Akinator) -> bytes:
+    # The full state (posterior, answer log and seed), so games restored without a complete log travel intact
+    return game.encode_state(compress=False, precision="float64")
+
+
+def _run_in_worker(dataset_id: str, state: bytes, method: str, args: Tuple, submitted: float) -> Tuple[Dict[str, Any], bytes, List[Tuple]]:
+    """Rebuilds the game from its binary state, runs one turn and ships back the response, the new state
+    and the metrics observed along the way."""
+    with capture() as observations:
+        observe_stage("pool_wait", time.perf_counter() - submitted)
+        _, version = read_dataset(state)
+        kb = _WORKER_DATASETS.find(dataset_id, version)
+        if kb is None:
+            # A version this worker never loaded (the game started before a reload); the caller plays it
+            raise StateVersionMismatch(f"Worker does not hold version '{version}' of dataset '{dataset_id}'.")
+        game = _worker_game(kb)
+        game.decode_state(state)
+        response = getattr(game, method)(*args)
+    return response, _turn_state(game), observations
+
+
+def _run_in_thread(game: Akinator, method: str, args: Tuple, submitted: float) -> Dict[str, Any]:
+    observe_stage("pool_wait", time.perf_counter() - submitted)
+    return getattr(game, method)(*args)
+
+
+def _process_answers_in_thread(games: List[Akinator], answers: List[Tuple[str, float]], submitted: float) -> List[Dict[str, Any]]:
+    observe_stage("pool_wait", time.perf_counter() - submitted)
+    return Akinator.process_answers(games, answers)
+
+
+def _heuristic_turn(game: Akinator, method: str, args: Tuple) -> Dict[str, Any]:
+    game.heuristic = True
+    try:
+        return getattr(game, method)(*args)
+    finally:
+        game.heuristic = False
+
+
+def _discard(future: "asyncio.Future"):
+    # Retrieves the result of an abandoned turn, so its errors are not reported as never retrieved
+    if not future.cancelled():
+        future.exception()
+
+
+class GamePool:
+    """Runs game turns (start_game, process_answer, process_mistaken_guess) off the event loop.
+
+    "thread" mode runs turns on the game instance in a thread pool. "process" mode sends the game's binary
+    state to worker processes that hold their own copy of the knowledge base and loads the returned state.
+    "inline" keeps the old behaviour. Workers find the game's dataset by the id on its knowledge base; a
+    turn of a dataset version a worker does not hold is played inline on the game instead. At most `max_pending` turns wait for the pool; beyond that, or when a
+    turn does not get a result within `timeout` seconds, the turn is answered with the game's cheap
+    heuristic question selection on a spare thread instead. A process turn that timed out still counts
+    as pending until its worker finishes it. Time from submitting a turn to it starting on a worker is
+    recorded as the "pool_wait" stage.
+    """
+
+    def __init__(self, mode: Literal["inline", "thread", "process"] = "thread", workers: int = 4,
+                 max_pending: int = 64, timeout: float = 2.0, initargs: Tuple = ()):
+        if mode not in ("inline", "thread", "process"):
+            raise ValueError("Unsupported worker mode. Use 'inline', 'thread' or 'process'.")
+
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.initargs = initargs
+        self.metrics: Dict[str, int] = {"calls": 0, "fallbacks": 0, "saturated": 0, "timeouts": 0, "stale_inline": 0}
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        # Turns of one game never run concurrently
+        self._game_locks: "weakref.WeakKeyDictionary[Akinator, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    def start(self):
+        if self._executor is not None or self.mode == "inline":
+            return
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=self.initargs)
+        else:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="akinator")
+        self._slots = asyncio.Semaphore(self.workers)
+
+    async def warm_up(self, dataset_ids: Tuple[str, ...]):
+        """Starts every worker process and plays a synthetic game of each dataset on it.
+
+        Process pools only fork their workers when turns arrive, so without this the first players pay
+        for the fork, the knowledge base load and the engine build. Threads share the parent's warm
+        games, so other modes have nothing to do.
+        """
+        if self.mode != "process" or self._executor is None:
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _warm_worker, dataset_ids) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.metrics, "mode": self.mode, "workers": self.workers, "pending": self._pending}
+
+    async def call(self, game: Akinator, method: str, *args) -> Dict[str, Any]:
+        """Runs game.<method>(*args) on the pool and returns its response; the game is updated in place."""
+        self.metrics["calls"] += 1
+        if self._executor is None:
+            return getattr(game, method)(*args)
+
+        lock = self._game_locks.setdefault(game, asyncio.Lock())
+        async with lock:
+            if self._pending >= self.max_pending:
+                self.metrics["saturated"] += 1
+                return await self._fallback(game, method, args)
+
+            if self.mode == "process":
+                return await self._call_process(game, method, args)
+            self._pending += 1
+            try:
+                return await self._call_thread(game, method, args)
+            finally:
+                self._pending -= 1
+
+    async def call_batch(self, games: List[Akinator], answers: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+        """Akinator.process_answers for distinct games, holding every game's turn lock."""
+        if self._executor is None:
+            self.metrics["calls"] += len(games)
+            return Akinator.process_answers(games, answers)
+        if self.mode == "process":
+            # Games travel as answer logs, so a batch is just its turns spread over the workers
+            return list(await asyncio.gather(*(self.call(game, "process_answer", *answer) for game, answer in zip(games, answers))))
+
+        self.metrics["calls"] += len(games)
+        submitted = time.perf_counter()
+        async with AsyncExitStack() as stack:
+            # Acquired in a fixed order so overlapping batches cannot deadlock
+            for game in sorted(games, key=id):
+                await stack.enter_async_context(self._game_locks.setdefault(game, asyncio.Lock()))
+            async with self._slots:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, _process_answers_in_thread, games, answers, submitted)
+
+    async def _call_thread(self, game: Akinator, method: str, args: Tuple) -> Dict[str, Any]:
+        # A running thread cannot be abandoned without leaving the game half updated, so the timeout
+        # only bounds the wait for a free worker
+        submitted = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            return await self._fallback(game, method, args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, _run_in_thread, game, method, args, submitted)
+        finally:
+            self._slots.release()
+
+    async def _call_process(self, game: Akinator, method: str, args: Tuple) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(_run_in_worker, game.kb.dataset_id, _turn_state(game), method, args, time.perf_counter())
+        # Counted until the worker is done with the turn, even once the caller has stopped waiting for it
+        self._pending += 1
+        future.add_done_callback(lambda _: self._turn_done(loop))
+        result = asyncio.wrap_future(future)
+        done, _ = await asyncio.wait({result}, timeout=self.timeout)
+        if not done:
+            # Only cancels a turn still waiting for a worker; a running one finishes and is discarded
+            future.cancel()
+            result.add_done_callback(_discard)
+            # The game itself was never touched, so it can still take the cheap path
+            self.metrics["timeouts"] += 1
+            return await self._fallback(game, method, args)
+        try:
+            response, state, observations = result.result()
+        except StateVersionMismatch:
+            self.metrics["stale_inline"] += 1
+            return await asyncio.to_thread(getattr(game, method), *args)
+
+        game.decode_state(state)
+        replay(observations)
+        return response
+
+    def _turn_done(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The event loop closed with the pool still running turns
+            pass
+
+    def _release(self):
+        self._pending -= 1
+
+    async def _fallback(self, game: Akinator, method: str, args: Tuple) -> Dict[str, Any]:
+        self.metrics["fallbacks"] += 1
+        # Off the event loop too: the heuristic turn is cheaper, not free
+        return await asyncio.to_thread(_heuristic_turn, game, method, args)